@@ -2,11 +2,13 @@
 Source package for backend functionality
 """
 import os
-from flask import Flask, send_from_directory
-from flask_cors import CORS
-from .routes import status, supervisorroute, knowledge
 
-def create_app():
+def create_app(warm_up: bool = None):
+    # Flask och routes importeras här så att `import src.model...` förblir snabbt
+    from flask import Flask, send_from_directory
+    from flask_cors import CORS
+    from .routes import status, supervisorroute, knowledge, gitwebhook
+
     app = Flask(__name__)
 
     CORS(app)
@@ -15,6 +17,14 @@ def create_app():
     app.register_blueprint(status.bp)
     app.register_blueprint(supervisorroute.bp)
     app.register_blueprint(knowledge.bp)
+    app.register_blueprint(gitwebhook.bp)
+
+    # Ladda modell, vector store och agenter i bakgrunden i stället för vid första förfrågan
+    if warm_up is None:
+        warm_up = os.getenv("BACKEND_WARMUP", "0") == "1"
+    if warm_up:
+        from .model.warmup import start_warm_up
+        start_warm_up(setup=supervisorroute.get_supervisor)
 
     # Serve React frontend from frontend/dist
     @app.route("/", defaults={"path": ""})
@@ -3,22 +3,27 @@
 import subprocess
 import os
 import re
-import ast
 from .base_agent import BaseAgent
 from ..llm_client import LLMClient
-from ..utils.github_indexer import GitHubIndexer, create_github_indexer
-from typing import Dict, List, Optional
+from ..utils.github_indexer import GitHubIndexer, create_repo_indexer
+from ..utils.github_client import create_github_client
+from ..lifecycle import Lifecycle
+from ..utils.repo_watcher import create_repo_watcher
+from ..utils.path_index import PathIndex
+from ..utils.symbol_table import SymbolTable
+from ..utils.context_builder import ContextBuilder, count_tokens
+from ..utils.diff_summarizer import DiffSummarizer
+from ..vector_store.code_index import CodeIndex, chunk_file, chunk_text
+from ..vector_store.sharded_store import code_shard_name
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 import json
 from pathlib import Path
-from ..utils.github_indexer import create_github_indexer
 from ..llm_client import LLMClient
 import asyncio
-import aiohttp
-import requests
 import logging
 
 class GitAgent(BaseAgent):
-    def __init__(self, llm: LLMClient):
+    def __init__(self, llm: LLMClient, lifecycle: Optional[Lifecycle] = None):
         super().__init__("GitAgent")
         self.llm = llm
         self.debug = True
@@ -34,8 +39,30 @@ class GitAgent(BaseAgent):
         self.github_token = os.getenv("GITHUB_AGENT_TOKEN")
         self.repo_name = os.getenv("GITHUB_REPO_NAME")
         self.repo_owner = os.getenv("GITHUB_REPO_OWNER")
-        self.github_indexer = create_github_indexer()
+        self.github_indexer = create_repo_indexer()
+        # GitHub-API:t (PR:er, commits) går via samma klient som indexeraren om den har en
+        self.github = getattr(self.github_indexer, "client", None) or create_github_client()
+        # Satt när indexeraren läser från en lokal klon (GIT_LOCAL_REPO_PATH)
+        self.repo_path = getattr(self.github_indexer, "repo_path", None)
         self.file_index = {}
+        # Härledda index (symboler, embeddings) registrerar sig här för att få ändringar
+        self._index_listeners: List[Callable[[List[str], List[str]], None]] = []
+        self.watcher = None
+        self.path_index = PathIndex()
+        self.symbols = SymbolTable()
+        self.add_index_listener(lambda changed, removed: self.path_index.update(self.file_index, changed, removed))
+        self.add_index_listener(lambda changed, removed: self.symbols.update(
+            self.file_index, self.github_indexer.file_shas, changed, removed
+        ))
+        # Kodsökningen byggs vid första sökningen och hålls sedan uppdaterad per blob
+        self.code_index = CodeIndex(self.symbols, name=code_shard_name(self.repo_name or "local"))
+        self.add_index_listener(lambda changed, removed: self.code_index.update(
+            self.file_index, self.github_indexer.file_shas, changed, removed
+        ))
+        self.diff_summarizer = DiffSummarizer(llm)
+        # Initieringen (hela indexeringen) körs en gång även vid samtidiga första förfrågningar
+        self.lifecycle = lifecycle or Lifecycle()
+        self.lifecycle.register("git_agent", self.initialize)
 
     def log(self, message: str):
         if self.debug:
@@ -45,7 +72,97 @@ class GitAgent(BaseAgent):
         """Initierar agenten genom att hämta repository-data."""
         self.logger.info("Initializing GitAgent...")
         self.file_index = await self.github_indexer.index_repo()
+        self.path_index.build(self.file_index)
+        # Symboltabellerna sparas i samma store som filindexet
+        self.symbols.store = getattr(self.github_indexer, "store", None)
+        self.code_index.store = self.symbols.store
+        self.symbols.build(self.file_index, self.github_indexer.file_shas)
         self.logger.info(f"Initialized with {len(self.file_index)} files")
+        self.start_watching()
+
+    async def ensure_initialized(self):
+        """Initierar agenten om det inte redan är gjort; samtidiga anrop delar på samma initiering."""
+        await self.lifecycle.ensure("git_agent")
+
+    def add_index_listener(self, listener: Callable[[List[str], List[str]], None]):
+        """Registrerar en callback(changed, removed) som anropas när file_index ändras."""
+        self._index_listeners.append(listener)
+
+    def _publish_index(self, file_index, previous_shas: Dict[str, str]) -> Tuple[List[str], List[str]]:
+        """Byter till ett nytt file_index och meddelar lyssnarna vilka filer som ändrats."""
+        self.file_index = file_index
+        current = self.github_indexer.file_shas
+        changed = [path for path, sha in current.items() if previous_shas.get(path) != sha]
+        removed = [path for path in previous_shas if path not in current]
+        if changed or removed:
+            self.log(f"Index updated: {len(changed)} changed, {len(removed)} removed")
+            for listener in list(self._index_listeners):
+                try:
+                    listener(changed, removed)
+                except Exception as e:
+                    self.logger.error(f"Indexlyssnare misslyckades: {str(e)}")
+        return changed, removed
+
+    async def _publish_index_async(self, file_index, previous_shas: Dict[str, str]) -> Tuple[List[str], List[str]]:
+        """Som _publish_index men i en tråd, så att lyssnarna (t.ex. kodindexets
+        embeddings) inte blockerar event loopen."""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self._publish_index, file_index, previous_shas)
+
+    async def refresh_index(self) -> Tuple[List[str], List[str]]:
+        """Uppdaterar indexet inkrementellt och returnerar (ändrade, borttagna) sökvägar."""
+        previous = dict(self.github_indexer.file_shas)
+        file_index = await self.github_indexer.index_repo(force_refresh=True)
+        return await self._publish_index_async(file_index, previous)
+
+    def apply_file_changes(self, paths: Iterable[str]) -> Tuple[List[str], List[str]]:
+        """Tillämpar ändringar från watchern fil för fil (anropas i watcherns tråd)."""
+        previous = dict(self.github_indexer.file_shas)
+        file_index = self.github_indexer.update_paths(paths)
+        return self._publish_index(file_index, previous)
+
+    async def apply_push(self, payload: dict) -> dict:
+        """Tillämpar en GitHub push-händelse på indexet.
+
+        Med GitHub-API:t hämtas bara filerna som push:en rör; övriga
+        indexerare gör en inkrementell refresh.
+        """
+        branch = getattr(self.github_indexer, "branch", None)
+        if branch and payload.get("ref") != f"refs/heads/{branch}":
+            return {"status": "ignored", "reason": f"push to {payload.get('ref')}"}
+
+        await self.ensure_initialized()
+
+        changed_paths, removed_paths = [], []
+        for commit in payload.get("commits", []):
+            for path in commit.get("added", []) + commit.get("modified", []):
+                changed_paths.append(path)
+                if path in removed_paths:
+                    removed_paths.remove(path)
+            for path in commit.get("removed", []):
+                removed_paths.append(path)
+                if path in changed_paths:
+                    changed_paths.remove(path)
+
+        if hasattr(self.github_indexer, "update_files") and (changed_paths or removed_paths):
+            previous = dict(self.github_indexer.file_shas)
+            file_index = await self.github_indexer.update_files(changed_paths, removed_paths, ref=payload.get("after"))
+            changed, removed = await self._publish_index_async(file_index, previous)
+        else:
+            changed, removed = await self.refresh_index()
+        return {"status": "updated", "changed": changed, "removed": removed}
+
+    def start_watching(self) -> bool:
+        """Startar bevakning av en lokal arbetskatalog om GIT_WATCH=1."""
+        if self.watcher is not None or not hasattr(self.github_indexer, "update_paths"):
+            return False
+        self.watcher = create_repo_watcher(self.repo_path, self.apply_file_changes)
+        return self.watcher is not None
+
+    def stop_watching(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
 
     def can_handle(self, task: str) -> bool:
         """Kontrollera om agenten kan hantera uppgiften."""
@@ -76,9 +193,7 @@ class GitAgent(BaseAgent):
         self.log(f"Handling task: {task}")
         
         # Initiera om nödvändigt
-        if not hasattr(self, '_initialized'):
-            await self.initialize()
-            self._initialized = True
+        await self.ensure_initialized()
             
         # Ta bort git: prefix om det finns
         if task.startswith("git:"):
@@ -120,12 +235,19 @@ class GitAgent(BaseAgent):
    - git: projektöversikt
    - git: struktur
 
-5. Kombinerade kommandon:
+5. Sök i koden med naturligt språk:
+   - git: search [fråga]
+   - git: sök [fråga]
+
+6. Kombinerade kommandon:
    - git: explain [filnamn] and review PR #[nummer]
 
 Tips: Du kan skriva kommandona på både svenska och engelska!"""
             }
 
+        if task_lower.startswith(("search ", "sök ")):
+            return await self.search_code(task.split(None, 1)[1])
+
         # Kontrollera först om det är en projektöversikt som efterfrågas
         if any(keyword in task_lower for keyword in ["project overview", "visa översikt", "projektöversikt", "struktur"]):
             return await self.project_overview()
@@ -150,6 +272,29 @@ Tips: Du kan skriva kommandona på både svenska och engelska!"""
                 "content": "Kunde inte hantera git-kommandot. Prova 'git: help' för att se tillgängliga kommandon."
             }
 
+    async def search_code(self, query: str, top_k: int = 5) -> dict:
+        """Semantisk sökning i koden via kodindexet (byggs vid första anropet)."""
+        loop = asyncio.get_event_loop()
+        if not self.code_index.built:
+            self.log("Building code index...")
+            await loop.run_in_executor(None, self.code_index.build, self.file_index, self.github_indexer.file_shas)
+
+        hits = await loop.run_in_executor(None, self.code_index.search, query, top_k, 0.0, self.file_index)
+        if not hits:
+            return {"source": self.name, "content": f"Hittade ingen kod som matchar '{query}'"}
+
+        results = []
+        for number, hit in enumerate(hits, 1):
+            results.append(
+                f"{number}. {hit['path']}:{hit['start']}-{hit['end']} ({hit['symbol']}, score {hit['score']:.2f})\n"
+                f"```\n{hit.get('content', '')}\n```"
+            )
+        return {
+            "source": self.name,
+            "content": f"Kod som matchar '{query}':\n\n" + "\n\n".join(results),
+            "hits": hits
+        }
+
     async def review_pull_request(self, task: str) -> dict:
         """Granskar en pull request."""
         self.logger.info("Starting pull request review...")
@@ -171,44 +316,27 @@ Tips: Du kan skriva kommandona på både svenska och engelska!"""
         
         self.logger.info(f"Reviewing PR #{pr_number}")
         
-        # Hämta PR-information från GitHub
-        headers = {
-            "Authorization": f"token {os.getenv('GITHUB_AGENT_TOKEN')}",
-            "Accept": "application/vnd.github.v3+json"
-        }
-        
-        # Hämta PR-detaljer
-        pr_url = f"https://api.github.com/repos/{os.getenv('GITHUB_REPO_OWNER')}/{os.getenv('GITHUB_REPO_NAME')}/pulls/{pr_number}"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(pr_url, headers=headers) as response:
-                if response.status != 200:
-                    self.logger.error(f"Kunde inte hämta pull request #{pr_number}. Status: {response.status}")
-                    return {
-                        "source": self.name,
-                        "content": f"Kunde inte hämta pull request #{pr_number}"
-                    }
-                
-                pr_data = await response.json()
-                
-            # Hämta ändringar
-            files_url = f"{pr_url}/files"
-            async with session.get(files_url, headers=headers) as response:
-                if response.status != 200:
-                    self.logger.error(f"Kunde inte hämta ändringar för PR #{pr_number}. Status: {response.status}")
-                    return {
-                        "source": self.name,
-                        "content": f"Kunde inte hämta ändringar för PR #{pr_number}"
-                    }
-                
-                files_data = await response.json()
+        # PR-detaljer och alla sidor med ändrade filer hämtas parallellt
+        async with self.github.session():
+            pr_data, files_data = await asyncio.gather(
+                self.github.get_json(f"pulls/{pr_number}"),
+                self.github.get_paginated(f"pulls/{pr_number}/files")
+            )
+        if pr_data is None:
+            self.logger.error(f"Kunde inte hämta pull request #{pr_number}")
+            return {
+                "source": self.name,
+                "content": f"Kunde inte hämta pull request #{pr_number}"
+            }
+        if files_data is None:
+            self.logger.error(f"Kunde inte hämta ändringar för PR #{pr_number}")
+            return {
+                "source": self.name,
+                "content": f"Kunde inte hämta ändringar för PR #{pr_number}"
+            }
         
-        # Skapa en sammanfattning av ändringarna
-        changes_summary = []
-        for file in files_data:
-            changes_summary.append(f"Fil: {file['filename']}")
-            changes_summary.append(f"Status: {file['status']}")
-            changes_summary.append(f"Ändringar: +{file['additions']} -{file['deletions']}")
-            changes_summary.append("---")
+        # Stora PR:er sammanfattas per fil och hunk innan granskningen
+        changes_summary = await self.diff_summarizer.summarize(files_data)
         
         # Skapa prompt för LLM
         prompt = f"""Granska följande pull request:
@@ -217,7 +345,7 @@ Titel: {pr_data['title']}
 Beskrivning: {pr_data['body']}
 
 Ändringar:
-{chr(10).join(changes_summary)}
+{changes_summary}
 
 Ge konstruktiv feedback på:
 1. Kodkvalitet
@@ -231,8 +359,7 @@ Var specifik och hänvisa till specifika rader eller filer där det är relevant
         review_text = await self.llm.query(prompt)
         self.logger.info("Received review response from LLM")
 
-        # Posta kommentaren till GitHub med en ny session
-        comments_url = f"{pr_url}/reviews"
+        # Posta kommentaren till GitHub
         review_payload = {
             "body": review_text,
             "event": "COMMENT",
@@ -240,21 +367,19 @@ Var specifik och hänvisa till specifika rader eller filer där det är relevant
         }
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(comments_url, headers=headers, json=review_payload) as response:
-                    if response.status == 200:
-                        self.logger.info("Successfully posted review to GitHub")
-                        return {
-                            "source": self.name,
-                            "content": f"Granskning postad till PR #{pr_number}:\n\n{review_text}"
-                        }
-                    else:
-                        error_text = await response.text()
-                        self.logger.error(f"Failed to post review to GitHub. Status: {response.status}, Error: {error_text}")
-                        return {
-                            "source": self.name,
-                            "content": f"Kunde inte posta granskningen till GitHub. Status: {response.status}\n\nGranskningstext:\n{review_text}"
-                        }
+            response = await self.github.post_json(f"pulls/{pr_number}/reviews", review_payload)
+            if response.status == 200:
+                self.logger.info("Successfully posted review to GitHub")
+                return {
+                    "source": self.name,
+                    "content": f"Granskning postad till PR #{pr_number}:\n\n{review_text}"
+                }
+            else:
+                self.logger.error(f"Failed to post review to GitHub. Status: {response.status}, Error: {response.data}")
+                return {
+                    "source": self.name,
+                    "content": f"Kunde inte posta granskningen till GitHub. Status: {response.status}\n\nGranskningstext:\n{review_text}"
+                }
         except Exception as e:
             self.logger.error(f"Error posting review to GitHub: {str(e)}")
             return {
@@ -282,11 +407,8 @@ Var specifik och hänvisa till specifika rader eller filer där det är relevant
             }
             
         # Hitta filen i indexet
-        file_content = None
-        for path, content in self.file_index.items():
-            if filename in path:
-                file_content = content
-                break
+        file_path = self.path_index.find_file(filename)
+        file_content = self.file_index.get(file_path) if file_path else None
                 
         if not file_content:
             return {
@@ -294,13 +416,17 @@ Var specifik och hänvisa till specifika rader eller filer där det är relevant
                 "content": f"Kunde inte hitta filen {filename}"
             }
             
+        # Kodindexsökningen och tokenräkningen körs i en tråd, som i search_code
+        loop = asyncio.get_event_loop()
+        context = await loop.run_in_executor(None, self._build_file_context, file_path, file_content, filename)
+
         # Skapa en prompt för LLM
         prompt = f"""
         Förklara följande kodfil:
         
         Fil: {filename}
         Innehåll:
-        {file_content}
+        {context}
         
         Förklaringen ska innehålla:
         1. Filens huvudsyfte och funktion
@@ -326,36 +452,23 @@ Var specifik och hänvisa till specifika rader eller filer där det är relevant
         self.logger.info(f"Förklarar fil: {filename}")
         
         # Hitta filen i indexet
-        file_content = None
-        file_path = None
-        for path, content in self.file_index.items():
-            if filename in path:
-                file_content = content
-                file_path = path
-                break
+        file_path = self.path_index.find_file(filename)
+        file_content = self.file_index.get(file_path) if file_path else None
         
         if not file_content:
             self.logger.error(f"Kunde inte hitta filen {filename}")
             return f"Kunde inte hitta filen {filename}"
 
-        # Hitta relaterade filer baserat på imports och referenser
-        related_files = self._find_related_files(file_content)
-        
-        # Skapa en sammanfattning av relaterade filer
-        related_files_summary = "\n".join([
-            f"- {path}: {self._get_file_summary(content)}"
-            for path, content in related_files.items()
-        ])
+        # Filen, relaterade filer och anropare packas inom tokenbudgeten. Kodindexsökningen
+        # och tokenräkningen körs i en tråd, som i search_code
+        loop = asyncio.get_event_loop()
+        context = await loop.run_in_executor(None, self._build_file_context, file_path, file_content, filename)
 
         # Skapa prompt för LLM
         prompt = f"""Förklara följande kodfil och dess kopplingar till andra filer:
 
 Fil: {file_path}
-Innehåll:
-{file_content}
-
-Relaterade filer:
-{related_files_summary}
+{context}
 
 Förklaringen ska innehålla:
 1. Filens huvudsyfte och funktion
@@ -371,6 +484,62 @@ Var pedagogisk men teknisk i förklaringen."""
         self.logger.info("Fick förklaringssvar från LLM")
         return response
 
+    def _build_file_context(self, file_path: str, content: str, query: Optional[str] = None,
+                            budget: Optional[int] = None) -> str:
+        """Bygger promptkontext för en fil inom en tokenbudget (GIT_CONTEXT_TOKENS).
+
+        Kandidaterna rangordnas: målfilen (hel om den får plats, annars per
+        symbol), importerade filer, anropare i andra filer och semantiska
+        träffar från kodindexet. Det som inte får plats ersätts av filens
+        sammanfattning eller symbolens signatur.
+        """
+        builder = ContextBuilder(budget) if budget else ContextBuilder()
+        summary = self._get_file_summary(content, file_path)
+
+        if count_tokens(content) <= builder.budget // 2:
+            builder.add(f"Fil: {file_path}", content, 100, summary)
+        else:
+            table = self.symbols.file_symbols(file_path)
+            for chunk in chunk_file(content, table):
+                text = chunk_text(content, chunk)
+                signature = (text.strip().splitlines() or [""])[0] + " ..."
+                builder.add(f"{file_path}:{chunk['start']}-{chunk['end']} ({chunk['symbol']})", text, 90, signature)
+
+        for path, related in self._find_related_files(content).items():
+            if path != file_path:
+                builder.add(f"Relaterad fil: {path}", self._get_file_summary(related, path), 60)
+
+        table = self.symbols.file_symbols(file_path) or {"symbols": []}
+        seen = set()
+        for symbol in table["symbols"]:
+            for caller_path, qualname in self.symbols.callers(symbol["name"]):
+                if caller_path == file_path or (caller_path, qualname) in seen or len(seen) >= 10:
+                    continue
+                seen.add((caller_path, qualname))
+                caller_table = self.symbols.file_symbols(caller_path) or {"symbols": []}
+                caller = next((s for s in caller_table["symbols"] if s["qualname"] == qualname), None)
+                caller_content = self.file_index.get(caller_path)
+                if caller is None or caller_content is None:
+                    continue
+                text = chunk_text(caller_content, {"start": caller["lineno"], "end": caller["end_lineno"]})
+                builder.add(
+                    f"Anropare: {caller_path} ({qualname})", text, 40,
+                    f"{qualname} anropar {symbol['name']}"
+                )
+
+        # Semantiska träffar bara om kodindexet redan är byggt (se search_code)
+        if query and self.code_index.built:
+            for hit in self.code_index.search(query, 5, 0.5, self.file_index):
+                if hit["path"] != file_path and hit.get("content"):
+                    builder.add(f"Liknande kod: {hit['path']} ({hit['symbol']})", hit["content"], 30)
+
+        context = builder.build()
+        self.log(
+            f"Context for {file_path}: {builder.used}/{builder.budget} tokens, "
+            f"{len(builder.summarized)} summarized, {len(builder.dropped)} dropped"
+        )
+        return context
+
     def _find_related_files(self, content: str) -> dict:
         """Hittar filer som är relaterade till den givna filen baserat på imports och referenser."""
         self.logger.debug("Hittar relaterade filer")
@@ -387,19 +556,22 @@ Var pedagogisk men teknisk i förklaringen."""
         for pattern in import_patterns:
             matches = re.findall(pattern, content)
             for match in matches:
-                # Konvertera import-sökväg till filnamn
-                potential_file = match.replace('.', '/') + '.py'
-                # Hitta filen i indexet
-                for path, file_content in self.file_index.items():
-                    if potential_file in path:
-                        related_files[path] = file_content
-                        break
+                # Slå upp modulen i indexets modulkarta
+                path = self.path_index.resolve_module(match)
+                if path and path in self.file_index:
+                    related_files[path] = self.file_index[path]
         
         return related_files
 
-    def _get_file_summary(self, content: str) -> str:
+    def _get_file_summary(self, content: str, path: Optional[str] = None) -> str:
         """Skapar en kort sammanfattning av en fil."""
-        # Hitta klasser och funktioner
+        # Python-filer finns redan i symboltabellen
+        if path is not None:
+            summary = self.symbols.summary(path)
+            if summary is not None:
+                return summary
+
+        # Övriga filer: hitta klasser och funktioner med reguljära uttryck
         classes = re.findall(r'class\s+(\w+)', content)
         functions = re.findall(r'def\s+(\w+)', content)
         
@@ -420,12 +592,10 @@ Var pedagogisk men teknisk i förklaringen."""
         """Returnerar en översikt över projektstrukturen."""
         try:
             # Initiera om nödvändigt
-            if not hasattr(self, '_initialized'):
-                await self.initialize()
-                self._initialized = True
+            await self.ensure_initialized()
 
-            # Uppdatera GitHub-indexet med force_refresh
-            self.file_index = await self.github_indexer.index_repo(force_refresh=True)
+            # Uppdatera indexet inkrementellt
+            await self.refresh_index()
             
             if not self.file_index:
                 return {
@@ -478,48 +648,28 @@ Var pedagogisk men teknisk i förklaringen."""
         print("[GitAgent] File index refreshed from GitHub and cached.")
 
     def explain_function(self, function_name: str) -> str:
-            for path, content in self.file_index.items():
-                try:
-                    tree = ast.parse(content)
-                    for node in ast.walk(tree):
-                        if isinstance(node, ast.FunctionDef) and node.name == function_name:
-                            # Get full source code lines
-                            lines = content.splitlines()
-                            start_line = node.lineno - 1
-                            end_line = getattr(node, 'end_lineno', start_line + 1)
-
-                            # Extract function code block
-                            function_code = "\n".join(lines[start_line:end_line])
-
-                            prompt = (
-                                f"Here's a Python function called `{function_name}` from the file `{path}`:\n\n"
-                                f"```python\n{function_code.strip()}\n```\n\n"
-                                "Please explain in detail what this function does."
-                            )
-                            return self.llm.query(prompt)
-                except SyntaxError:
-                    continue
-
-            return f"Function `{function_name}` not found in indexed files."
+            matches = self.symbols.find(function_name)
+            if not matches:
+                return f"Function `{function_name}` not found in indexed files."
+
+            path, symbol = matches[0]
+            # Get full source code lines
+            lines = self.file_index[path].splitlines()
+            function_code = "\n".join(lines[symbol["lineno"] - 1:symbol["end_lineno"]])
+
+            prompt = (
+                f"Here's a Python function called `{function_name}` from the file `{path}`:\n\n"
+                f"```python\n{function_code.strip()}\n```\n\n"
+                "Please explain in detail what this function does."
+            )
+            return self.llm.query(prompt)
     
     def list_all_functions(self) -> list[dict]:
-        functions = []
-
-        for path, content in self.file_index.items():
-            try:
-                tree = ast.parse(content)
-                for node in ast.walk(tree):
-                    if isinstance(node, ast.FunctionDef):
-                        functions.append({
-                            "name": node.name,
-                            "path": path
-                        })
-            except SyntaxError:
-                continue
-
-        return functions
+        return self.symbols.functions()
 
     def _get_latest_commit_diff(self) -> str:
+        if self.repo_path is None:
+            return "[GitAgent Error] Could not retrieve commit diff: no local repository configured (GIT_LOCAL_REPO_PATH)"
         try:
             result = subprocess.run(
                 ["git", "show", "--stat", "--unified=1"],
@@ -577,42 +727,40 @@ Var pedagogisk men teknisk i förklaringen."""
     async def analyze_commit(self, commit_hash: str) -> str:
         """Analyserar en specifik commit."""
         self.logger.info(f"Analyserar commit: {commit_hash}")
-        
-        headers = {
-            "Authorization": f"token {os.getenv('GITHUB_AGENT_TOKEN')}",
-            "Accept": "application/vnd.github.v3+json"
-        }
-        
-        # Hämta commit-information från GitHub
-        commit_url = f"https://api.github.com/repos/{os.getenv('GITHUB_REPO_OWNER')}/{os.getenv('GITHUB_REPO_NAME')}/commits/{commit_hash}"
-        
+
+        # Uppgiften kan vara en hel mening, plocka ut själva hashen
+        match = re.search(r'\b[0-9a-f]{7,40}\b', commit_hash)
+        if match:
+            commit_hash = match.group(0)
+
+        if hasattr(self.github_indexer, "get_commit"):
+            # Lokal klon: läs commit och diff direkt från disk
+            loop = asyncio.get_event_loop()
+            commit_data = await loop.run_in_executor(None, self.github_indexer.get_commit, commit_hash)
+            if commit_data is None:
+                self.logger.error(f"Kunde inte hitta commit {commit_hash} i den lokala klonen")
+                return f"Kunde inte hämta commit {commit_hash}"
+            return await self._analyze_commit_data(commit_hash, commit_data)
+
+        # En enda hämtning ger både metadata och ändrade filer (alla sidor)
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(commit_url, headers=headers) as response:
-                    if response.status != 200:
-                        self.logger.error(f"Kunde inte hämta commit {commit_hash}. Status: {response.status}")
-                        return f"Kunde inte hämta commit {commit_hash}"
-                    
-                    commit_data = await response.json()
-                
-                # Hämta ändringar för denna commit
-                async with session.get(f"{commit_url}", headers=headers) as response:
-                    if response.status != 200:
-                        self.logger.error(f"Kunde inte hämta ändringar för commit {commit_hash}")
-                        return f"Kunde inte hämta ändringar för commit {commit_hash}"
-                    
-                    changes_data = await response.json()
-        
-            # Skapa en sammanfattning av ändringarna
-            files_changed = changes_data.get('files', [])
-            changes_summary = []
-            for file in files_changed:
-                changes_summary.append(f"Fil: {file['filename']}")
-                changes_summary.append(f"Ändringar: +{file.get('additions', 0)} -{file.get('deletions', 0)}")
-                if file.get('patch'):
-                    changes_summary.append("Ändringar:")
-                    changes_summary.append(file['patch'])
-                changes_summary.append("---")
+            commit_data = await self.github.get_commit(commit_hash)
+        except Exception as e:
+            error_msg = f"Ett fel uppstod vid analys av commit {commit_hash}: {str(e)}"
+            self.logger.error(error_msg)
+            return error_msg
+        if commit_data is None:
+            self.logger.error(f"Kunde inte hämta commit {commit_hash}")
+            return f"Kunde inte hämta commit {commit_hash}"
+
+        return await self._analyze_commit_data(commit_hash, commit_data)
+
+    async def _analyze_commit_data(self, commit_hash: str, commit_data: dict) -> str:
+        """Låter LLM:en analysera en commit i GitHub-API:ts format."""
+        try:
+            # Patcharna skickas hela om de ryms, annars sammanfattade per fil och hunk
+            files_changed = commit_data.get('files', [])
+            changes_summary = await self.diff_summarizer.summarize(files_changed)
             
             # Skapa prompt för LLM
             prompt = f"""Analysera följande commit:
@@ -623,7 +771,7 @@ Datum: {commit_data['commit']['author']['date']}
 Meddelande: {commit_data['commit']['message']}
 
 Ändringar:
-{chr(10).join(changes_summary)}
+{changes_summary}
 
 Ge en detaljerad analys som inkluderar:
 1. Sammanfattning av ändringarna
@@ -658,7 +806,7 @@ Var specifik och teknisk i analysen."""
 
         # Skapa en sammanfattning av filerna
         files_summary = "\n\n".join([
-            f"=== {path} ===\n{self._get_file_summary(content)}"
+            f"=== {path} ===\n{self._get_file_summary(content, path)}"
             for path, content in relevant_files.items()
         ])
 
@@ -689,16 +837,13 @@ Var teknisk och specifik i analysen."""
         # Om det är en specifik fil, hitta den exakt
         if "visa filen" in query.lower():
             filename = query.replace("visa filen", "").strip()
-            for path, content in self.file_index.items():
-                if filename in path:
-                    relevant_files[path] = content
-                    break
+            path = self.path_index.find_file(filename)
+            if path and path in self.file_index:
+                relevant_files[path] = self.file_index[path]
         else:
-            # Annars, hitta alla relevanta filer baserat på söktermen
-            query_lower = query.lower()
-            for path, content in self.file_index.items():
-                if query_lower in path.lower() or query_lower in content.lower():
-                    relevant_files[path] = content
+            # Annars, hitta alla relevanta filer via tokenindexet
+            for path in self.path_index.search(query, self.file_index):
+                relevant_files[path] = self.file_index[path]
         
         self.logger.debug(f"Hittade {len(relevant_files)} relevanta filer")
         return relevant_files
@@ -717,7 +862,7 @@ Var teknisk och specifik i analysen."""
 
         # Skapa en sammanfattning av filerna
         files_summary = "\n\n".join([
-            f"=== {path} ===\n{self._get_file_summary(content)}"
+            f"=== {path} ===\n{self._get_file_summary(content, path)}"
             for path, content in relevant_files.items()
         ])
 
@@ -1,21 +1,33 @@
 # src/model/agents/research_agent.py
 import os
-from typing import Dict, List
+import asyncio
+from typing import Dict, List, Optional, Tuple
 from ..base_agent import BaseAgent
 from ..llm_client import LLMClient
 from src.model.tools.internet_search import search_duckduckgo
-from src.model.utils.mongo_client import find_research, save_research, collection, vector_store
+from src.model.utils.mongo_client import find_research, find_research_scored, save_research, get_collection, get_vector_store
 from src.model.utils.embedding import get_embedding_from_llm
 from src.model.utils.chunking import chunk_text
+from src.model.vector_store.sharded_store import RESEARCH_SHARD
 import uuid
 from datetime import datetime
 import json
 
+# Hedgad hämtning: cache och webbsökning startas samtidigt
+RESEARCH_HEDGED = os.getenv("RESEARCH_HEDGED", "1") == "1"
+# Så länge (sekunder) cacheträffen får ta innan vi bara väntar på webben
+RESEARCH_CACHE_DEADLINE = float(os.getenv("RESEARCH_CACHE_DEADLINE", "1.5"))
+# Cacheträffar med minst denna likhet avbryter webbsökningen
+RESEARCH_CONFIDENT_SCORE = float(os.getenv("RESEARCH_CONFIDENT_SCORE", "0.92"))
+
 class ResearchAgent(BaseAgent):
     def __init__(self, llm: LLMClient):
         super().__init__("ResearchAgent")
         self.llm = llm
         self.debug = True
+        self.hedged = RESEARCH_HEDGED
+        self.cache_deadline = RESEARCH_CACHE_DEADLINE
+        self.confident_score = RESEARCH_CONFIDENT_SCORE
 
     def log(self, message: str):
         if self.debug:
@@ -40,8 +52,11 @@ class ResearchAgent(BaseAgent):
         task_lower = task.lower()
         return any(keyword in task_lower for keyword in research_keywords)
 
-    async def handle(self, task: str) -> dict:
-        """Hantera en forskningsuppgift"""
+    async def handle(self, task: str, force_internet: bool = False) -> dict:
+        """Hantera en forskningsuppgift.
+
+        force_internet hoppar över cachen, t.ex. när en cacheträff bedömts som irrelevant.
+        """
         try:
             # Rensa prefix och extra mellanslag
             task = task.replace("research:", "").replace("sök:", "").replace("hitta:", "").strip()
@@ -49,27 +64,51 @@ class ResearchAgent(BaseAgent):
             # Logga den rensade uppgiften
             self.log(f"Handling task: {task}")
             
-            # Sök först i databasen
-            self.log(f"Searching database for: {task}")
-            db_result = await find_research(task)
-            
-            if db_result:
-                self.log(f"Found results in database")
-                return {
-                    "source": "database",
-                    "content": db_result
-                }
-            
-            # Om inget hittades i databasen, sök på internet
-            self.log("No results in database, searching internet...")
-            search_results = await search_duckduckgo(task)
-            
+            if force_internet:
+                self.log("Skipping database, searching internet...")
+                cache_hit, search_results = None, await search_duckduckgo(task)
+            elif self.hedged:
+                cache_hit, search_results = await self._hedged_retrieve(task)
+                if search_results is None:
+                    self.log(f"Found confident results in database (score {cache_hit['score']:.3f})")
+                    return {
+                        "source": "database",
+                        "content": cache_hit["content"],
+                        "score": cache_hit["score"]
+                    }
+            else:
+                # Sök först i databasen
+                self.log(f"Searching database for: {task}")
+                db_result = await find_research(task)
+
+                if db_result:
+                    self.log(f"Found results in database")
+                    return {
+                        "source": "database",
+                        "content": db_result
+                    }
+
+                # Om inget hittades i databasen, sök på internet
+                self.log("No results in database, searching internet...")
+                cache_hit, search_results = None, await search_duckduckgo(task)
+
             if not search_results:
+                if cache_hit:
+                    # Webben gav inget men cachen hade en (mindre säker) träff
+                    return {
+                        "source": "database",
+                        "content": cache_hit["content"],
+                        "score": cache_hit["score"]
+                    }
                 return {
                     "source": "error",
                     "content": "Kunde inte hitta någon information om detta ämne."
                 }
-            
+
+            if cache_hit:
+                # Slå ihop: den sparade researchen blir ett av underlagen
+                search_results = [f"Tidigare sparad research (likhet {cache_hit['score']:.2f}):\n{cache_hit['content']}"] + list(search_results)
+
             # Filtrera och sammanfatta resultaten
             self.log("Filtrerar och sammanfattar sökresultat...")
             filtered_results = await self._filter_and_summarize_results(search_results, task)
@@ -96,6 +135,44 @@ class ResearchAgent(BaseAgent):
                 "content": f"Ett fel uppstod: {str(e)}"
             }
 
+    async def _hedged_retrieve(self, task: str) -> Tuple[Optional[dict], Optional[List[str]]]:
+        """Kör cacheuppslag och webbsökning samtidigt.
+
+        Returnerar (cacheträff, webbresultat). Kommer en färsk träff med hög
+        likhet inom cache_deadline avbryts webbsökningen och webbresultatet
+        blir None. Annars väntar vi in webben, så en cachemiss kostar
+        max(cache, webb) i stället för summan.
+        """
+        self.log(f"Searching database and internet concurrently for: {task}")
+        cache_task = asyncio.ensure_future(find_research_scored(task))
+        web_task = asyncio.ensure_future(search_duckduckgo(task))
+
+        try:
+            await asyncio.wait({cache_task}, timeout=self.cache_deadline)
+            cache_hit = self._task_result(cache_task)
+            if cache_hit and cache_hit["score"] >= self.confident_score:
+                web_task.cancel()
+                return cache_hit, None
+
+            search_results = await web_task
+            if not cache_task.done():
+                # Cachen hann inte klart före webben, vänta inte längre
+                self.log("Database lookup missed the deadline, using internet results only")
+                cache_task.cancel()
+            cache_hit = self._task_result(cache_task)
+            if cache_hit and cache_hit["score"] >= self.confident_score:
+                return cache_hit, None
+            return cache_hit, search_results
+        finally:
+            for pending in (cache_task, web_task):
+                if not pending.done():
+                    pending.cancel()
+
+    def _task_result(self, task: asyncio.Future) -> Optional[dict]:
+        if not task.done() or task.cancelled() or task.exception() is not None:
+            return None
+        return task.result()
+
     async def _filter_and_summarize_results(self, results: List[Dict], query: str) -> str:
         """Filtrerar och sammanfattar sökresultat."""
         self.log("Filtrerar och sammanfattar sökresultat...")
@@ -144,6 +221,8 @@ Svara på svenska och var pedagogisk men teknisk."""
         self.log(f"Saving research for query: {query}")
         partition_id = str(uuid.uuid4())
         chunks = chunk_text(result)
+        collection = get_collection()
+        vector_store = get_vector_store()
         
         try:
             # Skapa en embedding för hela query först
@@ -186,7 +265,7 @@ Svara på svenska och var pedagogisk men teknisk."""
                 )
             
             self.log("Reindexing vector store after adding new entries...")
-            vector_store.reindex()
+            vector_store.reindex(RESEARCH_SHARD)
             
         except Exception as e:
             self.log(f"Error saving to database: {str(e)}")
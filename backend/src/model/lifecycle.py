@@ -0,0 +1,156 @@
+# src/model/lifecycle.py
+"""Livscykel för backendens komponenter (agenter, modell, vector store).
+
+Varje komponent registreras med en init-funktion och initieras exakt en
+gång: den första som anropar ensure() kör initieringen och alla andra –
+även förfrågningar i andra trådar med egna event loops – väntar på samma
+resultat. Misslyckas initieringen kan nästa anrop försöka igen.
+Tillståndet visas på /status.
+"""
+
+import asyncio
+import inspect
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+PENDING = "pending"
+INITIALIZING = "initializing"
+READY = "ready"
+FAILED = "failed"
+
+class _Component:
+    __slots__ = ("name", "init", "state", "error", "seconds", "done", "lock")
+
+    def __init__(self, name: str, init: Callable):
+        self.name = name
+        self.init = init
+        self.state = PENDING
+        self.error: Optional[str] = None
+        self.seconds: Optional[float] = None
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+
+class Lifecycle:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._components: Dict[str, _Component] = {}
+
+    def register(self, name: str, init: Callable):
+        """Registrerar en komponent. init kan vara synkron (körs i en tråd) eller asynkron.
+
+        Om namnet redan finns med en annan init-funktion ersätts komponenten
+        och initieras på nytt vid nästa ensure(), men bara om den inte redan
+        håller på att initieras eller är klar. Annars behålls den befintliga
+        så att t.ex. en andra GitAgent inte startar om hela indexeringen.
+        """
+        with self._lock:
+            component = self._components.get(name)
+            if component is None:
+                self._components[name] = _Component(name, init)
+            elif component.init != init and component.state in (PENDING, FAILED):
+                self._components[name] = _Component(name, init)
+
+    def state(self, name: str) -> Optional[str]:
+        component = self._components.get(name)
+        return component.state if component else None
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return all(component.state == READY for component in self._components.values())
+
+    def status(self) -> dict:
+        with self._lock:
+            components = list(self._components.values())
+        return {
+            "ready": all(component.state == READY for component in components),
+            "components": {
+                component.name: {
+                    "state": component.state,
+                    "seconds": round(component.seconds, 3) if component.seconds is not None else None,
+                    "error": component.error
+                }
+                for component in components
+            }
+        }
+
+    async def ensure(self, name: str):
+        """Initierar komponenten om det inte redan är gjort, eller väntar på pågående initiering."""
+        with self._lock:
+            component = self._components.get(name)
+        if component is None:
+            raise KeyError(f"Unknown component '{name}'")
+        if component.state == READY:
+            return
+
+        with component.lock:
+            owner = component.state in (PENDING, FAILED)
+            if owner:
+                component.state = INITIALIZING
+                component.error = None
+                component.done.clear()
+
+        if not owner:
+            if not component.done.is_set():
+                # Vänta utan att blockera den här event loopen
+                await asyncio.get_running_loop().run_in_executor(None, component.done.wait)
+            if component.state == FAILED:
+                raise RuntimeError(f"Initialization of {name} failed: {component.error}")
+            return
+
+        print(f"[Lifecycle] Initializing {name}...")
+        start = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(component.init):
+                await component.init()
+            else:
+                result = await asyncio.get_running_loop().run_in_executor(None, component.init)
+                if inspect.isawaitable(result):
+                    await result
+        except BaseException as e:
+            # Även avbrutna initieringar släpper väntande anrop
+            component.state = FAILED
+            component.error = str(e) or e.__class__.__name__
+            component.done.set()
+            print(f"[Lifecycle] {name} failed: {str(e)}")
+            raise
+        component.seconds = time.perf_counter() - start
+        component.state = READY
+        component.done.set()
+        print(f"[Lifecycle] {name} ready in {component.seconds:.2f}s")
+
+    async def ensure_all(self, names: Optional[Iterable[str]] = None) -> Dict[str, Optional[str]]:
+        """Initierar komponenterna parallellt. Returnerar namn -> felmeddelande (None om klar)."""
+        with self._lock:
+            names = list(names) if names is not None else list(self._components)
+        results = await asyncio.gather(*(self.ensure(name) for name in names), return_exceptions=True)
+        return {name: str(result) if isinstance(result, Exception) else None for name, result in zip(names, results)}
+
+    def start(self, names: Optional[Iterable[str]] = None, setup: Optional[Callable[[], None]] = None) -> threading.Thread:
+        """Initierar komponenterna i en bakgrundstråd, t.ex. när appen startar.
+
+        setup körs först i tråden och kan registrera fler komponenter.
+        """
+        def run():
+            try:
+                if setup is not None:
+                    setup()
+                asyncio.run(self.ensure_all(names))
+            except Exception as e:
+                print(f"[Lifecycle] Background initialization failed: {str(e)}")
+
+        thread = threading.Thread(target=run, name="lifecycle-warmup", daemon=True)
+        thread.start()
+        return thread
+
+_lifecycle: Optional[Lifecycle] = None
+_lifecycle_lock = threading.Lock()
+
+def get_lifecycle() -> Lifecycle:
+    """Returnerar processens delade Lifecycle."""
+    global _lifecycle
+    with _lifecycle_lock:
+        if _lifecycle is None:
+            _lifecycle = Lifecycle()
+        return _lifecycle
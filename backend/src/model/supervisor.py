@@ -3,16 +3,23 @@ from src.model.agents.research_agent import ResearchAgent
 from src.model.agents.git_agent import GitAgent
 from src.model.llm_client import LLMClient
 from src.model.base_agent import BaseAgent
+from src.model.lifecycle import Lifecycle, get_lifecycle
+from src.model.utils.relevance import RelevanceValidator, get_relevance_validator
 from typing import Dict, List, Optional
 import os
 import asyncio
 
 class SupervisorAgent(BaseAgent):
-    def __init__(self, llm: LLMClient):
+    def __init__(self, llm: LLMClient, lifecycle: Optional[Lifecycle] = None,
+                 relevance: Optional[RelevanceValidator] = None):
         super().__init__("SupervisorAgent")
         self.llm = llm
-        self.git_agent = GitAgent(llm)
+        # Agenterna registrerar sin initiering i den delade livscykeln (se /status)
+        self.lifecycle = lifecycle or get_lifecycle()
+        self.git_agent = GitAgent(llm, lifecycle=self.lifecycle)
         self.research_agent = ResearchAgent(llm)
+        # Cacheträffar bedöms lokalt, språkmodellen frågas bara i det osäkra bandet
+        self.relevance = relevance or get_relevance_validator()
         self.agents = {
             "GitAgent": self.git_agent,
             "ResearchAgent": self.research_agent
@@ -24,9 +31,12 @@ class SupervisorAgent(BaseAgent):
             print(f"[SupervisorAgent][DEBUG] {message}")
 
     async def initialize(self):
-        """Initierar alla agenter."""
+        """Initierar alla registrerade komponenter parallellt (en gång, delat mellan förfrågningar)."""
         self.log("Initializing SupervisorAgent...")
-        await self.git_agent.initialize()
+        errors = await self.lifecycle.ensure_all()
+        failed = {name: error for name, error in errors.items() if error}
+        if failed:
+            self.log(f"Initialization failed for: {failed}")
         self.log("SupervisorAgent initialized")
 
     def can_handle(self, task: str) -> bool:
@@ -38,10 +48,8 @@ class SupervisorAgent(BaseAgent):
         """Hanterar en uppgift genom att delegera till rätt agent."""
         self.log(f"Handling task: {task}")
         
-        # Initiera om nödvändigt
-        if not hasattr(self, '_initialized'):
-            await self.initialize()
-            self._initialized = True
+        # Agenterna initierar sig själva vid behov (se GitAgent.ensure_initialized),
+        # så en research-fråga väntar inte på att repot indexeras
         
         # Säkerställ att task är en sträng
         if not isinstance(task, str):
@@ -120,14 +128,14 @@ class SupervisorAgent(BaseAgent):
             if agent.can_handle(task):
                 self.log(f"Delegating to {agent.name} via keyword match")
                 result = await agent.handle(task, **kwargs)
-                return self._validate_semantic_match(task, result)
+                return await self._validate_semantic_match(task, result)
                 
         # Om ingen agent kan hantera det direkt, använd LLM för routing
         selected = await self.decide_agent(task)
         if selected:
             self.log(f"Delegating to {selected.name} via LLM decision")
             result = await selected.handle(task, **kwargs)
-            return self._validate_semantic_match(task, result)
+            return await self._validate_semantic_match(task, result)
             
         # Om ingen agent kunde hantera uppgiften
         return {
@@ -135,33 +143,57 @@ class SupervisorAgent(BaseAgent):
             "content": "Kunde inte hantera uppgiften. Ange ett giltigt kommando."
         }
 
-    def _validate_semantic_match(self, task: str, result):
+    async def _validate_semantic_match(self, task: str, result):
         # Om resultatet inte är en dictionary, returnera det direkt.
         if not isinstance(result, dict):
             return result
 
         source = result.get("source", "")
         # Validera både för legacy result (source=="database") och semantiska matchningar.
-        if source.startswith("semantic match:") or source == "database":
-            # Använd ett prompt som beskriver att vi har hittat ett cachat svar och be LLM om en bekräftelse
-            content = result.get("content", "")[:500]  # Förhandsvisning av innehållet
-            prompt = (
-                f"A cached research entry was found for the query '{task}':\n\n"
-                f"Content Preview:\n{content}\n\n"
-                "Is this cached content relevant to the current question? Respond only YES or NO."
-            )
-            self.log("Validating cached research entry via LLM...")
-            verdict = self.llm.query(prompt).strip().lower()
-            self.log(f"Semantic match validation verdict: {verdict}")
-            if "yes" in verdict:
-                return result
-            else:
-                self.log("Cached result rejected by LLM, forcing internet search.")
-                research_agent = next((a for a in self.agents.values() if a.name == "ResearchAgent"), None)
-                if research_agent:
-                    return research_agent.handle(task, force_internet=True)
-                return {"source": "supervisor", "content": "No relevant cached information and internet search is unavailable."}
-        return result
+        if not (source.startswith("semantic match:") or source == "database"):
+            return result
+
+        # Cross-encodern och loggfilen är synkrona, så de körs utanför event loopen
+        loop = asyncio.get_running_loop()
+        assessment = await loop.run_in_executor(None, self.relevance.assess, task, result)
+        self.log(f"Cached entry relevance {assessment['score']:.3f}: {assessment['decision']}")
+        label = None
+        if assessment["decision"] == "uncertain" or assessment["audit"]:
+            label = await self._llm_relevance_verdict(task, result)
+        await loop.run_in_executor(None, self.relevance.record, assessment, label)
+
+        if label is not None:
+            relevant = label
+        elif assessment["decision"] == "uncertain":
+            # Språkmodellen svarade inte, välj den närmaste tröskeln
+            relevant = assessment["score"] >= (self.relevance.accept + self.relevance.reject) / 2
+        else:
+            relevant = assessment["decision"] == "accept"
+        if relevant:
+            return result
+
+        self.log("Cached result rejected, forcing internet search.")
+        research_agent = next((a for a in self.agents.values() if a.name == "ResearchAgent"), None)
+        if research_agent:
+            return await research_agent.handle(task, force_internet=True)
+        return {"source": "supervisor", "content": "No relevant cached information and internet search is unavailable."}
+
+    async def _llm_relevance_verdict(self, task: str, result: dict) -> Optional[bool]:
+        """Frågar språkmodellen om en cacheträff är relevant. None om anropet misslyckas."""
+        content = str(result.get("content", ""))[:500]  # Förhandsvisning av innehållet
+        prompt = (
+            f"A cached research entry was found for the query '{task}':\n\n"
+            f"Content Preview:\n{content}\n\n"
+            "Is this cached content relevant to the current question? Respond only YES or NO."
+        )
+        self.log("Validating cached research entry via LLM...")
+        try:
+            verdict = (await self.llm.query(prompt, max_tokens=5, temperature=0.0)).strip().lower()
+        except Exception as e:
+            self.log(f"LLM validation failed: {str(e)}")
+            return None
+        self.log(f"Semantic match validation verdict: {verdict}")
+        return "yes" in verdict
 
     def get_selected_agent(self, task: str) -> str:
         """Returnerar namnet på den agent som skulle hantera en specifik uppgift."""
@@ -1,42 +1,76 @@
 # src/model/tools/internet_search.py
 
-import requests
-from duckduckgo_search import DDGS
-from bs4 import BeautifulSoup
-import urllib.parse
-import time
+import os
 import asyncio
-from typing import List
-
-print("init")
-HEADERS = {
-    "User-Agent": (
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/114.0.0.0 Safari/537.36"
-    )
-}
-
-async def search_duckduckgo(query: str, max_results: int = 5) -> List[str]:
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from src.model.tools.page_fetcher import fetch_pages
+from src.model.utils.fetch_cache import get_fetch_cache, search_key
+
+# Antal av de översta träffarna vars sidor hämtas och läses (0 = bara snippets)
+SEARCH_FETCH_PAGES = int(os.getenv("SEARCH_FETCH_PAGES", "3"))
+
+# Egen pool så att blockerande DDGS-anrop inte tar trådar från embeddingarna
+_search_executor: Optional[ThreadPoolExecutor] = None
+_search_executor_lock = threading.Lock()
+
+def _get_search_executor() -> ThreadPoolExecutor:
+    global _search_executor
+    if _search_executor is None:
+        with _search_executor_lock:
+            if _search_executor is None:
+                _search_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ddgs")
+    return _search_executor
+
+async def search_duckduckgo(query: str, max_results: int = 5, fetch_pages_count: Optional[int] = None) -> List[str]:
     """
     Asynkron funktion för att söka med DuckDuckGo.
+
+    De fetch_pages_count första träffarnas sidor hämtas parallellt och deras
+    brödtext läggs till efter snippeten, så att sammanfattningen bygger på
+    mer än DuckDuckGos korta utdrag. Både sökresultat och sidor cachas
+    (se fetch_cache.py), så en upprepad fråga kan besvaras utan nätverk.
     """
-    try:
-        # Kör den synkrona DuckDuckGo-sökningen i en separat tråd för att inte blockera
-        loop = asyncio.get_event_loop()
-        results = await loop.run_in_executor(None, lambda: _sync_search_duckduckgo(query, max_results))
-        return results
-    except Exception as e:
-        print(f"[DuckDuckGoSearch] Error: {e}")
-        return [f"[Search Error] {e}"]
-
-def _sync_search_duckduckgo(query: str, max_results: int = 5) -> List[str]:
+    fetch_count = SEARCH_FETCH_PAGES if fetch_pages_count is None else fetch_pages_count
+    cache = get_fetch_cache()
+    key = search_key(query, max_results)
+    loop = asyncio.get_running_loop()
+    # Cachens SQLite-anrop körs också i en tråd så att event loopen inte blockeras
+    results = await loop.run_in_executor(None, cache.get_json, key) if cache else None
+    if results is None:
+        try:
+            # Kör den synkrona DuckDuckGo-sökningen i en separat tråd för att inte blockera
+            results = await loop.run_in_executor(_get_search_executor(), _sync_search_duckduckgo, query, max_results)
+        except Exception as e:
+            print(f"[DuckDuckGoSearch] Error: {e}")
+            return [f"[Search Error] {e}"]
+        if cache and results:
+            await loop.run_in_executor(None, cache.put_json, key, results, "search")
+    else:
+        print(f"[DuckDuckGoSearch] Using cached results for: {query}")
+
+    pages = {}
+    if fetch_count > 0 and results:
+        urls = [r["href"] for r in results[:fetch_count] if r.get("href")]
+        try:
+            pages = {page["url"]: page for page in await fetch_pages(urls) if page["text"]}
+        except Exception as e:
+            # Snippets räcker om sidhämtningen fallerar
+            print(f"[DuckDuckGoSearch] Page fetch failed: {e}")
+    return [_format_result(r, pages.get(r.get("href"))) for r in results]
+
+def _format_result(result: Dict, page: Optional[Dict] = None) -> str:
+    text = f"{result['title']} - {result['body']}\n{result['href']}"
+    if page:
+        text += f"\n\n{page['text']}"
+    return text
+
+def _sync_search_duckduckgo(query: str, max_results: int = 5) -> List[Dict]:
     """
-    Synkron hjälpfunktion för DuckDuckGo-sökning.
+    Synkron hjälpfunktion för DuckDuckGo-sökning. Returnerar rådata (title, body, href).
     """
+    from duckduckgo_search import DDGS
+
     with DDGS() as ddgs:
-        results = ddgs.text(query, max_results=max_results)
-        return [
-            f"{r['title']} - {r['body']}\n{r['href']}"
-            for r in results
-        ]
\ No newline at end of file
+        return list(ddgs.text(query, max_results=max_results) or [])
@@ -0,0 +1,275 @@
+# src/model/tools/page_fetcher.py
+"""Hämtar sökträffarnas sidor parallellt och plockar ut brödtexten.
+
+Alla sidor hämtas samtidigt över en gemensam aiohttp-session med tak för
+antal anslutningar totalt och per värd, en total timeout och en maxstorlek
+per svar. HTML-tolkningen körs i en trådpool så att event loopen inte
+blockeras. Parsern väljs efter vad som finns installerat: selectolax,
+lxml eller BeautifulSoup. Med en FetchCache läses färska sidor från disk
+och inaktuella förnyas med en villkorlig förfrågan.
+"""
+
+import os
+import re
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import aiohttp
+from src.model.utils.fetch_cache import FetchCache, get_fetch_cache, url_key
+
+PAGE_FETCH_CONCURRENCY = int(os.getenv("PAGE_FETCH_CONCURRENCY", "8"))
+PAGE_FETCH_PER_HOST = int(os.getenv("PAGE_FETCH_PER_HOST", "2"))
+PAGE_FETCH_TIMEOUT = float(os.getenv("PAGE_FETCH_TIMEOUT", "8"))
+PAGE_FETCH_MAX_BYTES = int(os.getenv("PAGE_FETCH_MAX_BYTES", str(2 * 1024 * 1024)))
+PAGE_TEXT_CHARS = int(os.getenv("PAGE_TEXT_CHARS", "4000"))
+PAGE_EXTRACT_WORKERS = int(os.getenv("PAGE_EXTRACT_WORKERS", "4"))
+# "auto" väljer den snabbaste installerade parsern
+PAGE_PARSER = os.getenv("PAGE_PARSER", "auto").lower()
+
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/114.0.0.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,text/plain;q=0.9,*/*;q=0.5"
+}
+
+TEXT_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+# Element som nästan aldrig innehåller sidans huvudtext
+BOILERPLATE_TAGS = ("script", "style", "noscript", "nav", "header", "footer", "aside", "form", "svg", "iframe")
+# Element som brukar innehålla huvudtexten, i prioritetsordning
+MAIN_TAGS = ("article", "main")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def get_extract_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=PAGE_EXTRACT_WORKERS, thread_name_prefix="page-extract")
+    return _executor
+
+def clean_text(text: str, max_chars: int = PAGE_TEXT_CHARS) -> str:
+    """Slår ihop blanksteg, tar bort tomma rader och kortar till max_chars."""
+    lines = (re.sub(r"\s+", " ", line).strip() for line in text.splitlines())
+    cleaned = "\n".join(line for line in lines if line)
+    if len(cleaned) > max_chars:
+        cleaned = cleaned[:max_chars].rsplit(" ", 1)[0] + " …"
+    return cleaned
+
+def _extract_selectolax(html: str) -> Tuple[str, str]:
+    from selectolax.parser import HTMLParser
+
+    tree = HTMLParser(html)
+    title_node = tree.css_first("title")
+    title = title_node.text(strip=True) if title_node else ""
+    for node in tree.css(",".join(BOILERPLATE_TAGS)):
+        node.decompose()
+    root = next((node for node in (tree.css_first(tag) for tag in MAIN_TAGS) if node is not None), None)
+    root = root or tree.body or tree.root
+    return title, root.text(separator="\n") if root is not None else ""
+
+def _extract_lxml(html: str) -> Tuple[str, str]:
+    import lxml.html
+
+    document = lxml.html.document_fromstring(html)
+    title = (document.findtext(".//title") or "").strip()
+    for element in document.xpath("|".join(f"//{tag}" for tag in BOILERPLATE_TAGS)):
+        element.drop_tree()
+    root = next((found[0] for found in (document.xpath(f"//{tag}") for tag in MAIN_TAGS) if found), None)
+    root = root if root is not None else document
+    return title, "\n".join(root.itertext())
+
+def _extract_bs4(html: str) -> Tuple[str, str]:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    title = soup.title.get_text(strip=True) if soup.title else ""
+    for element in soup(list(BOILERPLATE_TAGS)):
+        element.decompose()
+    root = next((found for found in (soup.find(tag) for tag in MAIN_TAGS) if found is not None), None)
+    root = root or soup.body or soup
+    return title, root.get_text("\n")
+
+_PARSERS = {
+    "selectolax": ("selectolax", _extract_selectolax),
+    "lxml": ("lxml", _extract_lxml),
+    "bs4": ("bs4", _extract_bs4)
+}
+_parser = None
+
+def _load_parser():
+    """Väljer parser enligt PAGE_PARSER, eller den första installerade vid "auto"."""
+    import importlib
+
+    names = [PAGE_PARSER] if PAGE_PARSER in _PARSERS else list(_PARSERS)
+    for name in names:
+        module, extract = _PARSERS[name]
+        try:
+            importlib.import_module(module)
+            print(f"[PageFetcher] Using {name} for text extraction")
+            return extract
+        except ImportError:
+            continue
+    print("[PageFetcher] No HTML parser installed, stripping tags with regex")
+    return _extract_regex
+
+def _extract_regex(html: str) -> Tuple[str, str]:
+    title = re.search(r"<title[^>]*>(.*?)</title>", html, re.I | re.S)
+    body = re.sub(r"<(%s)\b.*?</\1>" % "|".join(BOILERPLATE_TAGS), " ", html, flags=re.I | re.S)
+    body = re.sub(r"<[^>]+>", "\n", body)
+    return (title.group(1).strip() if title else ""), body
+
+def extract_text(html: str, max_chars: int = PAGE_TEXT_CHARS) -> Tuple[str, str]:
+    """Returnerar (titel, rensad brödtext) för ett HTML-dokument."""
+    global _parser
+    if _parser is None:
+        _parser = _load_parser()
+    try:
+        title, text = _parser(html)
+    except Exception as e:
+        print(f"[PageFetcher] Parser failed, falling back to regex: {str(e)}")
+        title, text = _extract_regex(html)
+    return title, clean_text(text, max_chars)
+
+class PageFetcher:
+    """Hämtar och extraherar flera sidor samtidigt.
+
+    Attribut:
+        concurrency (int): Max antal samtidiga anslutningar totalt
+        per_host (int): Max antal samtidiga anslutningar per värd
+        timeout (float): Total tidsgräns per sida i sekunder
+        max_bytes (int): Så mycket av varje svar som läses
+        max_chars (int): Max antal tecken extraherad text per sida
+        cache (FetchCache): Valfri cache för hämtade sidor
+    """
+
+    def __init__(
+        self,
+        concurrency: int = PAGE_FETCH_CONCURRENCY,
+        per_host: int = PAGE_FETCH_PER_HOST,
+        timeout: float = PAGE_FETCH_TIMEOUT,
+        max_bytes: int = PAGE_FETCH_MAX_BYTES,
+        max_chars: int = PAGE_TEXT_CHARS,
+        cache: Optional[FetchCache] = None
+    ):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+        self.cache = cache
+        self.debug = True
+
+    def log(self, message: str):
+        if self.debug:
+            print(f"[PageFetcher][DEBUG] {message}")
+
+    async def fetch_all(self, urls: List[str]) -> List[Dict]:
+        """Hämtar alla sidor samtidigt. Returnerar en post per url i samma ordning.
+
+        Varje post är {"url", "title", "text", "error"}; misslyckade sidor får
+        tom text och ett felmeddelande i stället för att avbryta de andra.
+        """
+        if not urls:
+            return []
+        # En session per anrop: Flask-routerna kör varje förfrågan i en ny event loop
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=HEADERS) as session:
+            return list(await asyncio.gather(*(self.fetch(session, url) for url in urls)))
+
+    async def fetch(self, session: aiohttp.ClientSession, url: str) -> Dict:
+        page = {"url": url, "title": "", "text": "", "error": None}
+        loop = asyncio.get_running_loop()
+        # SQLite-anropen körs i en tråd så att event loopen inte blockeras
+        cached = await loop.run_in_executor(None, self.cache.get, url_key(url)) if self.cache else None
+        try:
+            if cached is not None and cached.fresh:
+                body, content_type = cached.data, cached.content_type or "text/html"
+            else:
+                body, content_type = await self._download(session, url, cached)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            page["error"] = str(e) or e.__class__.__name__
+            self.log(f"Could not fetch {url}: {page['error']}")
+            return page
+
+        mime_type = content_type.split(";")[0].strip().lower()
+        charset = re.search(r"charset=\"?([\w.:-]+)", content_type, re.I)
+        try:
+            html = body.decode(charset.group(1) if charset else "utf-8", errors="replace")
+        except LookupError:
+            html = body.decode("utf-8", errors="replace")
+
+        if mime_type == "text/plain":
+            page["text"] = clean_text(html, self.max_chars)
+        else:
+            page["title"], page["text"] = await loop.run_in_executor(
+                get_extract_executor(), extract_text, html, self.max_chars
+            )
+        self.log(f"Fetched {url}: {len(body)} bytes, {len(page['text'])} chars of text")
+        return page
+
+    async def _download(self, session: aiohttp.ClientSession, url: str, cached=None) -> Tuple[bytes, str]:
+        """Läser högst max_bytes av svaret och returnerar (innehåll, Content-Type).
+
+        Finns en inaktuell cachepost skickas dess ETag/Last-Modified, och ett
+        304-svar ger det cachade innehållet. Svar som kortats till max_bytes
+        cachas inte, eftersom posten annars skulle se ut som hela sidan.
+        Kastar ValueError för svar som inte är text.
+        """
+        loop = asyncio.get_running_loop()
+        key = url_key(url)
+        headers = cached.validators() if cached is not None else {}
+        async with session.get(url, headers=headers, allow_redirects=True) as response:
+            if response.status == 304 and cached is not None:
+                ttl = self.cache.ttl_for(cached.content_type, response.headers.get("Cache-Control"))
+                if ttl is None:
+                    await loop.run_in_executor(None, self.cache.delete, key)
+                else:
+                    await loop.run_in_executor(
+                        None, self.cache.refresh, key, ttl,
+                        response.headers.get("ETag"), response.headers.get("Last-Modified")
+                    )
+                return cached.data, cached.content_type or "text/html"
+            if response.status != 200:
+                raise ValueError(f"HTTP {response.status}")
+            content_type = response.headers.get("Content-Type", "text/html")
+            mime_type = content_type.split(";")[0].strip().lower()
+            if mime_type not in TEXT_CONTENT_TYPES:
+                raise ValueError(f"unsupported content type {mime_type}")
+
+            body = bytearray()
+            truncated = False
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                body.extend(chunk)
+                if len(body) >= self.max_bytes:
+                    # Resten av sidan behövs inte för en sammanfattning
+                    truncated = len(body) > self.max_bytes or not response.content.at_eof()
+                    break
+            body = bytes(body[:self.max_bytes])
+
+            if self.cache is not None and not truncated:
+                ttl = self.cache.ttl_for(content_type, response.headers.get("Cache-Control"))
+                if ttl is not None:
+                    await loop.run_in_executor(
+                        None, self.cache.put, key, body, content_type, ttl,
+                        response.headers.get("ETag"), response.headers.get("Last-Modified")
+                    )
+            return body, content_type
+
+_fetcher: Optional[PageFetcher] = None
+
+def get_page_fetcher() -> PageFetcher:
+    global _fetcher
+    if _fetcher is None:
+        _fetcher = PageFetcher(cache=get_fetch_cache())
+    return _fetcher
+
+async def fetch_pages(urls: List[str]) -> List[Dict]:
+    """Hämtar och extraherar sidorna med den delade PageFetcher-konfigurationen."""
+    return await get_page_fetcher().fetch_all(urls)
@@ -1,14 +1,15 @@
-from src.model.utils.embedding import tokenizer  # återanvänd tokenizer från embedding.py
+from src.model.utils.embedding import get_tokenizer  # återanvänd tokenizer från embedding.py
 
 def chunk_text(text: str, max_tokens: int = 100):
+    tokenizer = get_tokenizer()
     sentences = text.split(". ")
     chunks = []
     current_chunk = []
 
     for sentence in sentences:
         current_chunk.append(sentence.strip())
-        tokenized = tokenizer(" ".join(current_chunk), return_tensors="pt", truncation=False)
-        if tokenized.input_ids.shape[1] > max_tokens:
+        tokenized = tokenizer(" ".join(current_chunk), truncation=False)
+        if len(tokenized["input_ids"]) > max_tokens:
             current_chunk.pop()
             chunks.append(". ".join(current_chunk) + ".")
             current_chunk = [sentence.strip()]
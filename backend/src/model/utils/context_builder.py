@@ -0,0 +1,117 @@
+# src/model/utils/context_builder.py
+"""Tokenbudgeterad sammansättning av kontext till LLM-prompter.
+
+Kandidater (målfilens kodbitar, importerade filer, anropare, semantiska
+träffar) rangordnas efter prioritet och packas girigt tills budgeten är
+slut. En kandidat som inte får plats ersätts av sin sammanfattning om
+en sådan finns, annars hoppas den över.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+GIT_CONTEXT_TOKENS = int(os.getenv("GIT_CONTEXT_TOKENS", "6000"))
+# "auto" = tiktoken om det är installerat, annars embeddingmodellens tokenizer
+CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", "auto").lower()
+TIKTOKEN_ENCODING = os.getenv("TIKTOKEN_ENCODING", "cl100k_base")
+
+_counter = None
+_counter_lock = threading.Lock()
+_counts: "OrderedDict[str, int]" = OrderedDict()
+_COUNT_CACHE_SIZE = 4096
+
+def _load_counter():
+    if CONTEXT_TOKENIZER in ("auto", "tiktoken"):
+        try:
+            import tiktoken
+            encoding = tiktoken.get_encoding(TIKTOKEN_ENCODING)
+            return lambda text: len(encoding.encode(text, disallowed_special=()))
+        except Exception as e:
+            print(f"[ContextBuilder] tiktoken unavailable ({str(e)}), falling back")
+
+    if CONTEXT_TOKENIZER in ("auto", "tiktoken", "bert"):
+        try:
+            from src.model.utils.embedding import get_tokenizer
+            tokenizer = get_tokenizer()
+            return lambda text: len(tokenizer(text, add_special_tokens=False, truncation=False)["input_ids"])
+        except Exception as e:
+            print(f"[ContextBuilder] Tokenizer unavailable ({str(e)}), estimating tokens from length")
+
+    # Grov uppskattning när ingen tokenizer kan laddas
+    return lambda text: (len(text) + 3) // 4
+
+def count_tokens(text: str) -> int:
+    """Räknar tokens i text med den konfigurerade tokenizern (resultatet cachas per text)."""
+    global _counter
+    if not text:
+        return 0
+    with _counter_lock:
+        if text in _counts:
+            _counts.move_to_end(text)
+            return _counts[text]
+        if _counter is None:
+            _counter = _load_counter()
+    count = _counter(text)
+    with _counter_lock:
+        _counts[text] = count
+        if len(_counts) > _COUNT_CACHE_SIZE:
+            _counts.popitem(last=False)
+    return count
+
+class ContextBuilder:
+    """Samlar kandidatsnuttar och packar dem inom en tokenbudget.
+
+    Attribut:
+        budget (int): Max antal tokens för hela kontexten
+        used (int): Antal tokens i senaste build()
+        dropped (List[str]): Etiketter för kandidater som inte fick plats alls
+        summarized (List[str]): Etiketter där sammanfattningen användes
+    """
+
+    def __init__(self, budget: int = GIT_CONTEXT_TOKENS, count=count_tokens):
+        self.budget = budget
+        self.count = count
+        self.candidates: List[dict] = []
+        self.used = 0
+        self.dropped: List[str] = []
+        self.summarized: List[str] = []
+
+    def add(self, label: str, text: str, priority: float, summary: Optional[str] = None):
+        """Lägger till en kandidat. Högre prioritet packas först, lika prioritet i tilläggsordning."""
+        if not text and not summary:
+            return
+        self.candidates.append({
+            "label": label,
+            "text": text or "",
+            "priority": priority,
+            "summary": summary,
+            "order": len(self.candidates)
+        })
+
+    def pack(self) -> List[dict]:
+        """Väljer snuttar girigt och returnerar dem i prioritetsordning med vald text."""
+        self.used = 0
+        self.dropped = []
+        self.summarized = []
+        selected = []
+        for candidate in sorted(self.candidates, key=lambda c: (-c["priority"], c["order"])):
+            header = f"### {candidate['label']}\n"
+            for text, summarized in ((candidate["text"], False), (candidate["summary"], True)):
+                if not text:
+                    continue
+                tokens = self.count(header + text)
+                if self.used + tokens <= self.budget:
+                    self.used += tokens
+                    selected.append(dict(candidate, content=text))
+                    if summarized:
+                        self.summarized.append(candidate["label"])
+                    break
+            else:
+                self.dropped.append(candidate["label"])
+        return selected
+
+    def build(self) -> str:
+        """Returnerar den packade kontexten som text."""
+        return "\n\n".join(f"### {snippet['label']}\n{snippet['content']}" for snippet in self.pack())
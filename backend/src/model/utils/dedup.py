@@ -0,0 +1,191 @@
+# src/model/utils/dedup.py
+"""Dubblettkontroll när research och dokument sparas.
+
+Varje chunk får ett innehållshash (exakta dubbletter) och en MinHash-
+signatur över ordparen (nästan identisk text). Signaturen delas i band
+(LSH) som lagras i dokumentet; texter med hög Jaccard-likhet delar nästan
+alltid minst ett band, så kandidaterna hittas med en indexerad $in-fråga
+i stället för att jämföra mot alla chunks. Kandidaterna verifieras sedan
+mot den uppskattade likheten. SimHash med få bitars avstånd fungerar bra
+för hela webbsidor men är för känslig för korta chunks.
+
+En chunk som redan finns sparas utan egen embedding och pekar i stället
+på originalets hash via duplicate_of. Den hamnar därmed inte i FAISS-
+indexet och ingen embedding behöver beräknas för den. Tas originalet
+bort flyttas embeddingen över till en av dubbletterna (promote_duplicates).
+"""
+
+import hashlib
+import os
+import re
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "1") == "1"
+# Uppskattad Jaccard-likhet (ordpar) från vilken två texter räknas som nästan identiska
+DEDUP_SIMILARITY = float(os.getenv("DEDUP_SIMILARITY", "0.8"))
+# Kortare texter än så jämförs bara exakt
+DEDUP_MIN_TOKENS = int(os.getenv("DEDUP_MIN_TOKENS", "8"))
+
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 16
+MINHASH_ROWS = MINHASH_PERMUTATIONS // MINHASH_BANDS
+
+# Fasta permutationer (a * x + b) mod p så att signaturer kan jämföras mellan körningar
+_PRIME = 4294967311
+_rng = np.random.RandomState(20240601)
+_A = _rng.randint(1, 2 ** 31, size=MINHASH_PERMUTATIONS).astype(np.uint64)
+_B = _rng.randint(0, 2 ** 31, size=MINHASH_PERMUTATIONS).astype(np.uint64)
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+def content_hash(text: str) -> str:
+    """Hash av texten med normaliserade blanksteg."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+def _shingles(tokens: List[str]) -> set:
+    if len(tokens) < 2:
+        return set(tokens)
+    return {f"{tokens[i]} {tokens[i + 1]}" for i in range(len(tokens) - 1)}
+
+def minhash(text: str) -> Optional[np.ndarray]:
+    """MinHash-signatur (uint32) över textens ordpar, eller None för för korta texter."""
+    tokens = re.findall(r"\w+", text.casefold())
+    if len(tokens) < DEDUP_MIN_TOKENS:
+        return None
+    digests = b"".join(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest() for s in _shingles(tokens))
+    values = np.frombuffer(digests, dtype=np.uint32).astype(np.uint64)
+    permuted = (values[:, None] * _A[None, :] + _B[None, :]) % _PRIME
+    return permuted.min(axis=0).astype(np.uint32)
+
+def minhash_bands(signature: np.ndarray) -> List[str]:
+    rows = signature.reshape(MINHASH_BANDS, MINHASH_ROWS)
+    return [f"{band}:{hashlib.blake2b(row.tobytes(), digest_size=8).hexdigest()}" for band, row in enumerate(rows)]
+
+def similarity(a: Optional[str], b: Optional[str]) -> float:
+    """Uppskattad Jaccard-likhet mellan två hex-kodade signaturer."""
+    if not a or not b or len(a) != len(b):
+        return 0.0
+    left = np.frombuffer(bytes.fromhex(a), dtype=np.uint32)
+    right = np.frombuffer(bytes.fromhex(b), dtype=np.uint32)
+    return float(np.mean(left == right))
+
+def fingerprint(text: str) -> Dict:
+    """Fälten som sparas per chunk: content_hash, minhash (hex) och minhash_bands."""
+    signature = minhash(text)
+    return {
+        "content_hash": content_hash(text),
+        "minhash": signature.tobytes().hex() if signature is not None else None,
+        "minhash_bands": minhash_bands(signature) if signature is not None else []
+    }
+
+def _is_near(a: Optional[str], b: Optional[str]) -> bool:
+    return similarity(a, b) >= DEDUP_SIMILARITY
+
+def plan_chunks(collection, chunks: List[str], scope: Optional[dict] = None) -> List[Dict]:
+    """Avgör vilka chunks som behöver en egen embedding.
+
+    Returnerar en post per chunk med chunk, fingerprint-fälten och
+    duplicate_of (hash för chunken vars embedding återanvänds, eller None).
+    scope begränsar jämförelsen, t.ex. till en shards query_filter, så att
+    en dubblett alltid ligger i samma shard som originalet.
+    """
+    plan = [dict(fingerprint(chunk), chunk=chunk, duplicate_of=None) for chunk in chunks]
+    if not DEDUP_ENABLED or not plan:
+        return plan
+
+    scope = dict(scope or {})
+    indexed = {"embedding": {"$exists": True}, **scope}
+    hashes = list({entry["content_hash"] for entry in plan})
+    existing_hashes = {
+        doc["content_hash"]
+        for doc in collection.find({"content_hash": {"$in": hashes}, **indexed}, {"content_hash": 1})
+    }
+    bands = list({band for entry in plan for band in entry["minhash_bands"]})
+    candidates = []
+    if bands:
+        candidates = [
+            (doc["content_hash"], doc.get("minhash"))
+            for doc in collection.find({"minhash_bands": {"$in": bands}, **indexed}, {"content_hash": 1, "minhash": 1})
+        ]
+
+    seen = {}
+    for entry in plan:
+        digest = entry["content_hash"]
+        if digest in existing_hashes or digest in seen:
+            entry["duplicate_of"] = digest
+        else:
+            near = next((c for c, value in candidates if _is_near(entry["minhash"], value)), None)
+            near = near or next((c for c, value in seen.items() if _is_near(entry["minhash"], value)), None)
+            entry["duplicate_of"] = near
+        if entry["duplicate_of"] is None:
+            seen[digest] = entry["minhash"]
+    return plan
+
+def chunk_fields(entry: Dict) -> Dict:
+    """Dedup-fälten som läggs i chunkens Mongo-dokument."""
+    fields = {key: entry[key] for key in ("content_hash", "minhash", "minhash_bands")}
+    if entry["duplicate_of"] is not None:
+        fields["duplicate_of"] = entry["duplicate_of"]
+    return fields
+
+def partition_fields(content: str) -> Dict:
+    """Fingerprint för ett helt svar, sparas på varje chunk i partitionen."""
+    signature = minhash(content)
+    return {
+        "partition_hash": content_hash(content),
+        "partition_minhash": signature.tobytes().hex() if signature is not None else None,
+        "partition_bands": minhash_bands(signature) if signature is not None else []
+    }
+
+def find_duplicate_partition(collection, content: str, scope: Optional[dict] = None) -> Optional[str]:
+    """Returnerar partition_id för ett redan sparat svar som är (nästan) identiskt med content."""
+    if not DEDUP_ENABLED:
+        return None
+    fields = partition_fields(content)
+    scope = dict(scope or {})
+    exact = collection.find_one({"partition_hash": fields["partition_hash"], **scope}, {"partition_id": 1})
+    if exact:
+        return exact["partition_id"]
+    if not fields["partition_bands"]:
+        return None
+    for doc in collection.find(
+        {"partition_bands": {"$in": fields["partition_bands"]}, **scope},
+        {"partition_id": 1, "partition_minhash": 1}
+    ):
+        if _is_near(fields["partition_minhash"], doc.get("partition_minhash")):
+            return doc["partition_id"]
+    return None
+
+def find_duplicate_document(collection, document_hash: str, scope: Optional[dict] = None) -> Optional[Dict]:
+    """Returnerar en chunk ur ett redan uppladdat dokument med samma innehållshash."""
+    if not DEDUP_ENABLED:
+        return None
+    return collection.find_one({"document_hash": document_hash, **dict(scope or {})}, {"partition_id": 1})
+
+def promote_duplicates(collection, removed_docs: Iterable[Dict]) -> int:
+    """Ger dubbletter av borttagna chunks en egen embedding. Returnerar antal flyttade."""
+    promoted = 0
+    for doc in removed_docs:
+        digest = doc.get("content_hash")
+        if not digest or not doc.get("embedding"):
+            continue
+        if collection.find_one({"content_hash": digest, "embedding": {"$exists": True}}):
+            # Ett annat original med samma innehåll finns kvar
+            continue
+        orphan = collection.find_one({"duplicate_of": digest})
+        if orphan is None:
+            continue
+        collection.update_one(
+            {"_id": orphan["_id"]},
+            {"$set": {"embedding": doc["embedding"]}, "$unset": {"duplicate_of": ""}}
+        )
+        collection.update_many({"duplicate_of": digest}, {"$set": {"duplicate_of": orphan["content_hash"]}})
+        promoted += 1
+    return promoted
+
+def ensure_indexes(collection):
+    """Index för dubblettfrågorna. create_index är idempotent i Mongo."""
+    for field in ("content_hash", "minhash_bands", "duplicate_of", "partition_hash", "partition_bands", "document_hash"):
+        collection.create_index(field)
@@ -0,0 +1,198 @@
+# src/model/utils/diff_summarizer.py
+"""Map-reduce-sammanfattning av stora diffar (commits och pull requests).
+
+Små diffar skickas som de är. Större diffar delas per fil och per hunk
+till bitar som ryms i DIFF_CHUNK_TOKENS, bitarna sammanfattas parallellt
+(högst DIFF_SUMMARY_CONCURRENCY samtidiga LLM-anrop) och sammanfattningarna
+slås ihop per fil och vid behov i flera nivåer tills de ryms i budgeten.
+Filsammanfattningar cachas per patch-hash, så att en PR som granskas igen
+bara sammanfattar filer vars diff har ändrats.
+"""
+
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Callable, List, Optional
+from src.model.utils.context_builder import GIT_CONTEXT_TOKENS, count_tokens
+
+DIFF_CHUNK_TOKENS = int(os.getenv("DIFF_CHUNK_TOKENS", "1500"))
+DIFF_SUMMARY_CONCURRENCY = int(os.getenv("DIFF_SUMMARY_CONCURRENCY", "4"))
+DIFF_SUMMARY_CACHE_SIZE = int(os.getenv("DIFF_SUMMARY_CACHE_SIZE", "1024"))
+
+def split_hunks(patch: str) -> List[str]:
+    """Delar en unified diff i hunks (varje hunk börjar med @@)."""
+    hunks, current = [], []
+    for line in patch.splitlines():
+        if line.startswith("@@") and current:
+            hunks.append("\n".join(current))
+            current = []
+        current.append(line)
+    if current:
+        hunks.append("\n".join(current))
+    return hunks
+
+def _split_lines(text: str, max_tokens: int, count: Callable[[str], int]) -> List[str]:
+    if count(text) <= max_tokens:
+        return [text]
+    parts, current, current_tokens = [], [], 0
+    for line in text.splitlines():
+        tokens = count(line) + 1
+        if current and current_tokens + tokens > max_tokens:
+            parts.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += tokens
+    if current:
+        parts.append("\n".join(current))
+    return parts
+
+def split_patch(patch: str, max_tokens: int = DIFF_CHUNK_TOKENS, count: Callable[[str], int] = count_tokens) -> List[str]:
+    """Packar en fils hunks i bitar om högst max_tokens; för stora hunks delas per rad."""
+    pieces, current, current_tokens = [], [], 0
+    for hunk in split_hunks(patch):
+        for part in _split_lines(hunk, max_tokens, count):
+            tokens = count(part)
+            if current and current_tokens + tokens > max_tokens:
+                pieces.append("\n".join(current))
+                current, current_tokens = [], 0
+            current.append(part)
+            current_tokens += tokens
+    if current:
+        pieces.append("\n".join(current))
+    return pieces
+
+def file_header(file: dict) -> str:
+    header = f"Fil: {file['filename']}"
+    if file.get("status"):
+        header += f" ({file['status']})"
+    return f"{header}\nÄndringar: +{file.get('additions', 0)} -{file.get('deletions', 0)}"
+
+class DiffSummarizer:
+    """Sammanfattar diffar i GitHub-API:ts format (listor av {"filename", "patch", ...}).
+
+    Attribut:
+        llm: Klient med en asynkron query(prompt)
+        concurrency (int): Max antal samtidiga LLM-anrop per sammanfattning
+        chunk_tokens (int): Max antal tokens per bit som skickas till LLM:en
+        budget (int): Tokens som hela ändringsavsnittet får uppta i slutprompten
+    """
+
+    def __init__(
+        self,
+        llm,
+        concurrency: int = DIFF_SUMMARY_CONCURRENCY,
+        chunk_tokens: int = DIFF_CHUNK_TOKENS,
+        budget: int = GIT_CONTEXT_TOKENS,
+        cache_size: int = DIFF_SUMMARY_CACHE_SIZE,
+        count: Callable[[str], int] = count_tokens
+    ):
+        self.llm = llm
+        self.concurrency = concurrency
+        self.chunk_tokens = chunk_tokens
+        self.budget = budget
+        self.cache_size = cache_size
+        self.count = count
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+
+    @staticmethod
+    def cache_key(file: dict) -> str:
+        patch = file.get("patch") or ""
+        return hashlib.sha256(f"{file['filename']}\0{patch}".encode("utf-8")).hexdigest()
+
+    def _cached(self, key: str) -> Optional[str]:
+        summary = self._cache.get(key)
+        if summary is not None:
+            self._cache.move_to_end(key)
+        return summary
+
+    def _remember(self, key: str, summary: str):
+        self._cache[key] = summary
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _query(self, semaphore: asyncio.Semaphore, prompt: str) -> str:
+        async with semaphore:
+            return await self.llm.query(prompt)
+
+    async def summarize_file(self, file: dict, semaphore: asyncio.Semaphore) -> str:
+        """Sammanfattar en fils patch: en bit direkt, flera bitar parallellt och sedan ihopslagna."""
+        key = self.cache_key(file)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        pieces = split_patch(file["patch"], self.chunk_tokens, self.count)
+        partials = await asyncio.gather(*(
+            self._query(semaphore, (
+                f"Sammanfatta kortfattat vad följande ändringar i {file['filename']} gör"
+                f"{f' (del {number} av {len(pieces)})' if len(pieces) > 1 else ''}. "
+                f"Nämn ändrade funktioner och eventuella buggar eller risker.\n\n{piece}"
+            ))
+            for number, piece in enumerate(pieces, 1)
+        ))
+        if len(partials) == 1:
+            summary = partials[0]
+        else:
+            summary = await self._reduce(
+                [f"Del {number}: {partial}" for number, partial in enumerate(partials, 1)],
+                semaphore,
+                f"Slå ihop följande delsammanfattningar av ändringarna i {file['filename']} till en sammanfattning."
+            )
+        self._remember(key, summary)
+        return summary
+
+    async def _reduce(self, summaries: List[str], semaphore: asyncio.Semaphore, instruction: str) -> str:
+        """Slår ihop sammanfattningar, i flera nivåer om de inte ryms i en bit."""
+        while True:
+            groups, current, current_tokens = [], [], 0
+            for summary in summaries:
+                tokens = self.count(summary)
+                if current and current_tokens + tokens > self.chunk_tokens:
+                    groups.append(current)
+                    current, current_tokens = [], 0
+                current.append(summary)
+                current_tokens += tokens
+            if current:
+                groups.append(current)
+
+            reduced = await asyncio.gather(*(
+                self._query(semaphore, f"{instruction}\n\n" + "\n\n".join(group)) for group in groups
+            ))
+            if len(reduced) == 1 or len(reduced) >= len(summaries):
+                return "\n\n".join(reduced)
+            summaries = list(reduced)
+
+    async def summarize(self, files: List[dict]) -> str:
+        """Returnerar ändringsavsnittet till en analysprompt.
+
+        Om alla patchar ryms i budgeten returneras de oförändrade (ett enda
+        LLM-anrop räcker), annars en sammanfattning per fil.
+        """
+        full = "\n---\n".join(
+            f"{file_header(file)}\n{file['patch']}" if file.get("patch") else file_header(file)
+            for file in files
+        )
+        if self.count(full) <= self.budget:
+            return full
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        with_patch = [file for file in files if file.get("patch")]
+        print(f"[DiffSummarizer] Summarizing {len(with_patch)} files in parallel (limit {self.concurrency})")
+        summaries = await asyncio.gather(*(self.summarize_file(file, semaphore) for file in with_patch))
+        by_name = {file["filename"]: summary for file, summary in zip(with_patch, summaries)}
+
+        sections = [
+            f"{file_header(file)}\nSammanfattning: {by_name[file['filename']]}"
+            if file["filename"] in by_name else file_header(file)
+            for file in files
+        ]
+        combined = "\n---\n".join(sections)
+        if self.count(combined) <= self.budget:
+            return combined
+        return await self._reduce(
+            sections, semaphore,
+            "Slå ihop följande sammanfattningar av filändringar till en kortare sammanfattning. "
+            "Behåll filnamn, viktiga ändringar och risker."
+        )
@@ -1,10 +1,43 @@
-from transformers import AutoTokenizer, AutoModel
-import torch
 import asyncio
+import threading
+import numpy as np
+import os
 
-# Load once
-tokenizer = AutoTokenizer.from_pretrained("KBLab/bert-base-swedish-cased")
-model = AutoModel.from_pretrained("KBLab/bert-base-swedish-cased")
+MODEL_NAME = "KBLab/bert-base-swedish-cased"
+
+# "torch" (standard) eller "onnx", se onnx_embedding.py
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+
+# Tokenizer och modell laddas först när de behövs (eller via warm_up)
+_tokenizer = None
+_model = None
+_load_lock = threading.Lock()
+
+def get_tokenizer():
+    global _tokenizer
+    if _tokenizer is None:
+        with _load_lock:
+            if _tokenizer is None:
+                from transformers import AutoTokenizer
+                _tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    return _tokenizer
+
+def get_model():
+    global _model
+    if _model is None:
+        with _load_lock:
+            if _model is None:
+                from transformers import AutoModel
+                _model = AutoModel.from_pretrained(MODEL_NAME)
+    return _model
+
+def __getattr__(name: str):
+    # Bakåtkompatibilitet för `embedding.tokenizer` och `embedding.model`
+    if name == "tokenizer":
+        return get_tokenizer()
+    if name == "model":
+        return get_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 async def get_embedding_from_llm(text: str) -> list[float]:
     # Kör den synkrona beräkningen i en separat tråd
@@ -12,6 +45,13 @@ async def get_embedding_from_llm(text: str) -> list[float]:
     return await loop.run_in_executor(None, _compute_embedding, text)
 
 def _compute_embedding(text: str) -> list[float]:
+    if EMBEDDING_BACKEND == "onnx":
+        return _compute_embeddings([text])[0].tolist()
+
+    import torch
+
+    tokenizer = get_tokenizer()
+    model = get_model()
     inputs = tokenizer(
         text,
         return_tensors="pt",
@@ -33,3 +73,51 @@ def _compute_embedding(text: str) -> list[float]:
     mean_pooled = summed / count
 
     return mean_pooled.tolist()
+
+def _compute_embeddings(texts: list[str]) -> np.ndarray:
+    # Batchad variant av _compute_embedding, returnerar en (n, dim) float32-matris
+    if EMBEDDING_BACKEND == "onnx":
+        from src.model.utils.onnx_embedding import get_onnx_embedder
+        return get_onnx_embedder().embed(texts)
+    return _compute_embeddings_torch(texts)
+
+def _compute_embeddings_torch(texts: list[str]) -> np.ndarray:
+    import torch
+
+    tokenizer = get_tokenizer()
+    model = get_model()
+    inputs = tokenizer(
+        texts,
+        return_tensors="pt",
+        truncation=True,
+        padding=True,
+        max_length=512
+    )
+
+    with torch.no_grad():
+        outputs = model(**inputs)
+
+    # Mean pooling per text, utfyllnadstokens maskas bort
+    token_embeddings = outputs.last_hidden_state
+    mask = inputs["attention_mask"].unsqueeze(-1).to(token_embeddings.dtype)
+    summed = torch.sum(token_embeddings * mask, dim=1)
+    count = torch.clamp(mask.sum(dim=1), min=1e-9)
+    mean_pooled = summed / count
+
+    return mean_pooled.numpy().astype(np.float32)
+
+def embedding_dim() -> int:
+    """Returnerar vektordimensionen utan att ladda modellvikterna."""
+    if _model is not None:
+        return _model.config.hidden_size
+    from transformers import AutoConfig
+    return AutoConfig.from_pretrained(MODEL_NAME).hidden_size
+
+def warm_up_embeddings():
+    """Laddar tokenizer och modell (eller ONNX-sessionen) i förväg."""
+    get_tokenizer()
+    if EMBEDDING_BACKEND == "onnx":
+        from src.model.utils.onnx_embedding import get_onnx_embedder
+        get_onnx_embedder()
+    else:
+        get_model()
@@ -0,0 +1,158 @@
+# src/model/utils/embedding_pool.py
+"""Processpool för embeddingberäkningar.
+
+Arbetarna startas via forkserver. Forkservern laddar modellen en gång
+(embedding_preload.py) och forkar sedan arbetarna, så att alla delar
+vikterna copy-on-write i stället för att ladda var sin kopia. En vanlig
+fork från huvudprocessen går inte: har den redan kört inferens ärver
+arbetarna torchs OpenMP/MKL-trådpooler i ett trasigt tillstånd och kan
+låsa sig. Där forkserver saknas används spawn, och då laddar varje
+arbetare modellen själv i sin initializer. Varje arbetare skriver sina
+vektorer direkt till en shared memory-buffert som huvudprocessen äger,
+så inga Python-listor behöver picklas tillbaka.
+"""
+
+import os
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, resource_tracker
+from typing import List, Optional
+import numpy as np
+from src.model.utils.embedding import (
+    embedding_dim,
+    warm_up_embeddings,
+    _compute_embeddings
+)
+
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "0"))
+EMBEDDING_TORCH_THREADS = int(os.getenv("EMBEDDING_TORCH_THREADS", "1"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+# Importeras i forkservern innan arbetarna forkas
+PRELOAD_MODULE = "src.model.utils.embedding_preload"
+
+def _init_worker(torch_threads: int):
+    """Körs en gång i varje arbetsprocess: sätter trådantalet och laddar modellen.
+
+    Med forkserver är modellen redan laddad (ärvd från forkservern) och
+    warm_up_embeddings gör ingenting.
+    """
+    import torch
+    torch.set_num_threads(torch_threads)
+    warm_up_embeddings()
+
+def _embed_into_shared_memory(texts: List[str], shm_name: str) -> int:
+    """Beräknar embeddings och skriver dem till huvudprocessens buffert."""
+    vectors = _compute_embeddings(texts)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        target = np.ndarray(vectors.shape, dtype=np.float32, buffer=shm.buf)
+        target[:] = vectors
+    finally:
+        shm.close()
+    return len(texts)
+
+class EmbeddingPool:
+    """En pool av processer som beräknar embeddings parallellt.
+
+    Attribut:
+        workers (int): Antal arbetsprocesser
+        torch_threads (int): Antal intra-op-trådar för torch per arbetare
+        batch_size (int): Antal texter per uppgift som skickas till en arbetare
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        torch_threads: int = EMBEDDING_TORCH_THREADS,
+        batch_size: int = EMBEDDING_BATCH_SIZE
+    ):
+        self.workers = workers
+        self.torch_threads = torch_threads
+        self.batch_size = batch_size
+        self.dim = embedding_dim()
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Startar arbetsprocesserna om de inte redan körs."""
+        with self._lock:
+            if self._executor is not None:
+                return
+
+            # Trackern måste startas före arbetarna så att alla processer delar den
+            resource_tracker.ensure_running()
+
+            # Aldrig fork: huvudprocessen kan redan ha kört inferens med egna trådpooler
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+                # Gäller bara om forkservern inte redan startats av någon annan
+                context.set_forkserver_preload([PRELOAD_MODULE])
+            else:
+                context = multiprocessing.get_context("spawn")
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self.torch_threads,)
+            )
+            print(f"[EmbeddingPool] Started {self.workers} workers with {self.torch_threads} torch threads each")
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Beräknar embeddings för texts och returnerar en (n, dim) matris."""
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+
+        self.start()
+        jobs = []
+        try:
+            for start in range(0, len(texts), self.batch_size):
+                batch = texts[start:start + self.batch_size]
+                shm = shared_memory.SharedMemory(create=True, size=len(batch) * self.dim * 4)
+                future = self._executor.submit(_embed_into_shared_memory, batch, shm.name)
+                jobs.append((shm, len(batch), future))
+
+            results = []
+            for shm, count, future in jobs:
+                future.result()
+                view = np.ndarray((count, self.dim), dtype=np.float32, buffer=shm.buf)
+                results.append(view.copy())
+                del view
+            return np.concatenate(results)
+        finally:
+            for shm, _, _ in jobs:
+                shm.close()
+                shm.unlink()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+_pool: Optional[EmbeddingPool] = None
+_pool_lock = threading.Lock()
+
+def get_embedding_pool() -> Optional[EmbeddingPool]:
+    """Returnerar den delade poolen, eller None om EMBEDDING_WORKERS är 0."""
+    global _pool
+    if EMBEDDING_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = EmbeddingPool(EMBEDDING_WORKERS)
+        return _pool
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    """Synkron batch-embedding, via processpoolen om den är konfigurerad."""
+    if not texts:
+        return np.zeros((0, embedding_dim()), dtype=np.float32)
+    pool = get_embedding_pool()
+    if pool is not None:
+        return pool.embed(texts)
+    return _compute_embeddings(texts)
+
+async def embed_texts_async(texts: List[str]) -> np.ndarray:
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, embed_texts, texts)
@@ -0,0 +1,16 @@
+# src/model/utils/embedding_preload.py
+"""Laddar embeddingmodellen vid import, i embeddingpoolens forkserver.
+
+Modulen ges till multiprocessing.set_forkserver_preload (se
+embedding_pool.py). Forkservern laddar då vikterna en gång innan den
+forkar arbetarna, så att de delar minnet copy-on-write. Forkservern kör
+aldrig inferens, så torchs trådpooler är inte startade när den forkar.
+"""
+
+from src.model.utils.embedding import warm_up_embeddings
+
+try:
+    warm_up_embeddings()
+except Exception as e:
+    # Forkservern får inte dö av ett laddningsfel; arbetarna laddar då själva
+    print(f"[EmbeddingPool][ERROR] Could not preload embedding model: {str(e)}")
@@ -0,0 +1,228 @@
+# src/model/utils/fetch_cache.py
+"""Beständig cache för webbsökningar och hämtade sidor.
+
+Sökresultat lagras under den normaliserade frågan och sidor under den
+normaliserade url:en, zlib-komprimerat i SQLite. Sidor sparas med ETag
+och Last-Modified så att inaktuella poster kan förnyas med en villkorlig
+förfrågan (304) i stället för att laddas ner igen. Livslängden tas från
+svarets Cache-Control om den finns, annars från en standard-TTL per
+innehållstyp. Databasen hålls under en maxstorlek genom att de poster som
+använts minst nyligen tas bort först.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Optional, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+FETCH_CACHE_ENABLED = os.getenv("FETCH_CACHE_ENABLED", "1") == "1"
+FETCH_CACHE_PATH = os.getenv("FETCH_CACHE_PATH", "data/fetch_cache.sqlite")
+FETCH_CACHE_MAX_BYTES = int(os.getenv("FETCH_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+
+# Standardlivslängd i sekunder när svaret inte säger något annat
+DEFAULT_TTLS = {
+    "search": 6 * 3600,
+    "text/html": 24 * 3600,
+    "application/xhtml+xml": 24 * 3600,
+    "text/plain": 24 * 3600,
+    "default": 3600
+}
+
+def _parse_ttls(value: str) -> Dict[str, float]:
+    """Läser t.ex. "search=3600,text/html=86400" från FETCH_CACHE_TTLS."""
+    ttls = dict(DEFAULT_TTLS)
+    for item in value.split(","):
+        if "=" in item:
+            kind, seconds = item.split("=", 1)
+            ttls[kind.strip().lower()] = float(seconds)
+    return ttls
+
+FETCH_CACHE_TTLS = _parse_ttls(os.getenv("FETCH_CACHE_TTLS", ""))
+
+# Spårningsparametrar som inte ändrar sidans innehåll
+TRACKING_PARAMS = re.compile(r"^(utm_\w+|fbclid|gclid|mc_cid|mc_eid|ref_src)$", re.I)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    content_type TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+"""
+
+def normalize_query(query: str) -> str:
+    """Gör nästan identiska frågor lika: skiftläge, blanksteg och avslutande skiljetecken."""
+    return re.sub(r"\s+", " ", query.casefold()).strip().rstrip("?!.").strip()
+
+def search_key(query: str, max_results: int) -> str:
+    return f"search:{max_results}:{normalize_query(query)}"
+
+def url_key(url: str) -> str:
+    """Normaliserar en url: gemener i schema och värd, utan fragment och spårningsparametrar."""
+    parts = urlsplit(url.strip())
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not TRACKING_PARAMS.match(k))
+    netloc = parts.netloc.lower()
+    if (parts.scheme == "http" and netloc.endswith(":80")) or (parts.scheme == "https" and netloc.endswith(":443")):
+        netloc = netloc.rsplit(":", 1)[0]
+    return "url:" + urlunsplit((parts.scheme.lower(), netloc, parts.path or "/", urlencode(query), ""))
+
+def parse_cache_control(header: Optional[str]) -> Dict[str, Optional[str]]:
+    directives = {}
+    for item in (header or "").split(","):
+        name, _, value = item.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"') or None
+    return directives
+
+class CachedEntry:
+    __slots__ = ("data", "content_type", "etag", "last_modified", "expires_at")
+
+    def __init__(self, data: bytes, content_type: Optional[str], etag: Optional[str],
+                 last_modified: Optional[str], expires_at: float):
+        self.data = data
+        self.content_type = content_type
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    def validators(self) -> Dict[str, str]:
+        """Headers för en villkorlig förfrågan som förnyar posten."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+class FetchCache:
+    def __init__(self, db_path: Union[str, Path] = FETCH_CACHE_PATH, max_bytes: int = FETCH_CACHE_MAX_BYTES,
+                 ttls: Optional[Dict[str, float]] = None):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttls = dict(ttls or FETCH_CACHE_TTLS)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def ttl_for(self, content_type: Optional[str], cache_control: Optional[str] = None) -> Optional[float]:
+        """Livslängd för ett svar. None betyder att svaret inte får sparas (no-store)."""
+        directives = parse_cache_control(cache_control)
+        if "no-store" in directives or "private" in directives:
+            return None
+        if "no-cache" in directives:
+            # Får sparas men måste förnyas före varje användning
+            return 0
+        for name in ("s-maxage", "max-age"):
+            value = directives.get(name)
+            if value and value.isdigit():
+                return float(value)
+        kind = (content_type or "").split(";")[0].strip().lower()
+        return self.ttls.get(kind, self.ttls["default"])
+
+    def get(self, key: str) -> Optional[CachedEntry]:
+        """Returnerar posten även om den är inaktuell; se CachedEntry.fresh."""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT data, content_type, etag, last_modified, expires_at FROM entries WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return CachedEntry(zlib.decompress(row[0]), row[1], row[2], row[3], row[4])
+
+    def put(self, key: str, data: bytes, content_type: Optional[str] = None, ttl: Optional[float] = None,
+            etag: Optional[str] = None, last_modified: Optional[str] = None):
+        if ttl is None:
+            ttl = self.ttl_for(content_type)
+        now = time.time()
+        compressed = zlib.compress(data)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(key, content_type, etag, last_modified, stored_at, expires_at, accessed_at, size, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, content_type, etag, last_modified, now, now + ttl, now, len(compressed), compressed)
+            )
+            self._evict()
+
+    def refresh(self, key: str, ttl: float, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """Förlänger en post efter ett 304-svar."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE entries SET expires_at = ?, accessed_at = ?, "
+                "etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) WHERE key = ?",
+                (now + ttl, now, etag, last_modified, key)
+            )
+
+    def delete(self, key: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def get_json(self, key: str):
+        """Returnerar sparad JSON om den fortfarande är färsk."""
+        entry = self.get(key)
+        if entry is None or not entry.fresh:
+            return None
+        return json.loads(entry.data.decode("utf-8"))
+
+    def put_json(self, key: str, value, kind: str = "default"):
+        self.put(key, json.dumps(value).encode("utf-8"), "application/json", ttl=self.ttls.get(kind, self.ttls["default"]))
+
+    def size(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _evict(self):
+        """Tar bort de minst nyligen använda posterna tills databasen ryms i max_bytes."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Rensa ner till 90 % så att inte varje ny post utlöser en rensning
+        target = self.max_bytes * 0.9
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+            if total <= target:
+                break
+            doomed.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+
+_cache: Optional[FetchCache] = None
+_cache_lock = threading.Lock()
+
+def get_fetch_cache() -> Optional[FetchCache]:
+    """Returnerar den delade cachen, eller None om FETCH_CACHE_ENABLED=0."""
+    global _cache
+    if not FETCH_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = FetchCache()
+    return _cache
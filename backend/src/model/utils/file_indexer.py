@@ -1,13 +1,34 @@
 # src/model/utils/file_indexer.py
 import os
-import json
-from typing import Dict
-import ast
+import re
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
 from pathlib import Path
+from src.model.utils.file_store import FileStore, LazyFileIndex
 
 EXCLUDED_DIRS = {".git", ".venv", "__pycache__", "node_modules", "data"}
 EXCLUDED_FILES = {".env"}
-CACHE_FILE = "data/file_index.json"
+CACHE_FILE = ".file_index_cache.sqlite"
+
+IGNORE_DIRS = {'.git', '__pycache__', 'node_modules', 'venv', '.env', '.pytest_cache', 'data'}
+IGNORE_EXTENSIONS = ('.pyc', '.pyo', '.pyd', '.so', '.dll', '.exe', '.json', '.cache',
+                     '.sqlite', '.sqlite-wal', '.sqlite-shm')
+
+# Antal trådar som läser ändrade filer parallellt
+FILE_INDEX_WORKERS = int(os.getenv("FILE_INDEX_WORKERS", str(min(32, (os.cpu_count() or 1) * 4))))
+
+# Binärfiler känns igen på de första byten i stället för på ett misslyckat decode
+SNIFF_BYTES = 8000
+BINARY_SIGNATURES = (
+    b"\x89PNG", b"\xff\xd8\xff", b"GIF87a", b"GIF89a", b"%PDF", b"PK\x03\x04",
+    b"\x7fELF", b"\x1f\x8b", b"BZh", b"\xfd7zXZ", b"7z\xbc\xaf", b"\x00asm",
+    b"SQLite format 3"
+)
+
+def is_binary(head: bytes) -> bool:
+    """Avgör från filens början om den är binär (känd signatur eller NUL-byte, som git)."""
+    return head.startswith(BINARY_SIGNATURES) or b"\0" in head[:SNIFF_BYTES]
 
 def load_gitignore_patterns(repo_path: str) -> list:
     gitignore_path = os.path.join(repo_path, ".gitignore")
@@ -20,78 +41,249 @@ def load_gitignore_patterns(repo_path: str) -> list:
                     patterns.append(line)
     return patterns
 
+def _glob_to_regex(glob: str) -> str:
+    """Översätter ett gitignore-glob till ett reguljärt uttryck."""
+    out = []
+    i = 0
+    while i < len(glob):
+        c = glob[i]
+        if glob.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if glob.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[" and "]" in glob[i + 1:]:
+            end = glob.index("]", i + 1)
+            chars = glob[i + 1:end]
+            if chars.startswith("!"):
+                chars = "^" + chars[1:]
+            out.append("[" + chars.replace("\\", "\\\\") + "]")
+            i = end + 1
+            continue
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+class GitignoreMatcher:
+    """Matchar sökvägar mot .gitignore-regler med gits glob-semantik.
+
+    Stöder negation (!), kataloger (avslutande /), förankrade mönster (med /)
+    och **. Den sista matchande regeln avgör.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.rules = []
+        for pattern in patterns:
+            negate = pattern.startswith("!")
+            if negate:
+                pattern = pattern[1:]
+            dir_only = pattern.endswith("/")
+            pattern = pattern.rstrip("/")
+            if not pattern:
+                continue
+            if "/" in pattern:
+                regex = "^" + _glob_to_regex(pattern.lstrip("/")) + "$"
+            else:
+                regex = "^(?:.*/)?" + _glob_to_regex(pattern) + "$"
+            self.rules.append((re.compile(regex), negate, dir_only))
+
+    def matches(self, path: str, is_dir: bool = False) -> bool:
+        ignored = False
+        for regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(path):
+                ignored = not negate
+        return ignored
 
 def is_ignored(path: str, patterns: list) -> bool:
     parts = path.split(os.sep)
-    
+
     if any(part in EXCLUDED_DIRS for part in parts):
         return True
     if os.path.basename(path) in EXCLUDED_FILES:
         return True
-    for pattern in patterns:
-        if pattern in path:
+    matcher = GitignoreMatcher(patterns)
+    # En fil är ignorerad om den själv eller någon av dess kataloger matchar
+    for i in range(1, len(parts)):
+        if matcher.matches("/".join(parts[:i]), is_dir=True):
             return True
-    return False
+    return matcher.matches("/".join(parts))
+
+def is_indexable(rel_path: str, matcher: GitignoreMatcher, is_dir: bool = False) -> bool:
+    """Samma filtrering som scan_tree, för en enskild relativ sökväg."""
+    parts = rel_path.split("/")
+    if any(part in IGNORE_DIRS for part in (parts if is_dir else parts[:-1])):
+        return False
+    if not is_dir and (parts[-1] in EXCLUDED_FILES or parts[-1].endswith(IGNORE_EXTENSIONS)):
+        return False
+    for i in range(1, len(parts)):
+        if matcher.matches("/".join(parts[:i]), is_dir=True):
+            return False
+    return not matcher.matches(rel_path, is_dir=is_dir)
+
+def scan_tree(repo_path: str, matcher: GitignoreMatcher, start: str = "") -> Dict[str, Tuple[int, int, int]]:
+    """Går igenom trädet med os.scandir och returnerar path -> (mtime_ns, size, inode).
+
+    Ignorerade kataloger beskärs direkt så att de aldrig listas. Med start
+    gås bara en underkatalog igenom, sökvägarna är fortfarande relativa repot.
+    """
+    result = {}
+    pending = [start]
+    while pending:
+        rel_dir = pending.pop()
+        try:
+            entries = os.scandir(os.path.join(repo_path, rel_dir))
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in IGNORE_DIRS and not matcher.matches(rel_path, is_dir=True):
+                            pending.append(rel_path)
+                        continue
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    if entry.name in EXCLUDED_FILES or entry.name.endswith(IGNORE_EXTENSIONS):
+                        continue
+                    if matcher.matches(rel_path):
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                result[rel_path] = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+    return result
+
+def read_text_file(path: str) -> Tuple[Optional[str], bool]:
+    """Läser en fil och returnerar (innehåll, binär). Binärfiler läses inte färdigt."""
+    with open(path, "rb") as f:
+        head = f.read(SNIFF_BYTES)
+        if is_binary(head):
+            return None, True
+        data = head + f.read()
+    try:
+        return data.decode("utf-8"), False
+    except UnicodeDecodeError:
+        return None, True
+
+class LocalFileIndexer:
+    """Inkrementell indexering av en lokal katalog.
+
+    Filer vars (mtime, storlek, inode) är oförändrade sedan förra körningen
+    läses inte om; ändrade filer läses parallellt på en trådpool och
+    resultatet skrivs till en FileStore.
+    """
+
+    def __init__(self, repo_path: str, cache_file: Optional[str] = None, workers: int = FILE_INDEX_WORKERS):
+        self.repo_path = repo_path
+        self.store = FileStore(cache_file or Path(repo_path) / CACHE_FILE)
+        self.workers = max(1, workers)
+        self.file_shas: Dict[str, str] = {}
+
+    def _read(self, rel_path: str) -> Tuple[Optional[str], bool]:
+        try:
+            return read_text_file(os.path.join(self.repo_path, rel_path))
+        except OSError:
+            # Försvunnen eller otillgänglig fil, försök igen nästa gång
+            return None, False
+
+    def _read_all(self, paths: List[str]) -> List[Tuple[Optional[str], bool]]:
+        if len(paths) <= 1 or self.workers == 1:
+            return [self._read(path) for path in paths]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(self._read, paths))
+
+    def _apply(self, current: Dict[str, Tuple[int, int, int]], previous: Dict[str, tuple], removed: Iterable[str]):
+        changed = [path for path, stat in current.items() if previous.get(path, ())[:3] != stat]
+        removed = list(removed)
+        if not changed and not removed:
+            return
+
+        updates = {}
+        for path, (content, binary) in zip(changed, self._read_all(changed)):
+            if content is None and not binary:
+                continue
+            updates[path] = {"sha": None, "content": content, "stat": (*current[path], binary)}
+        self.store.update(updates, removed)
+
+    def _publish(self) -> LazyFileIndex:
+        index = self.store.index()
+        self.file_shas = {path: index.sha(path) for path in index}
+        return index
+
+    def refresh(self) -> LazyFileIndex:
+        """Indexerar om katalogen och läser bara filer vars stat ändrats."""
+        matcher = GitignoreMatcher(load_gitignore_patterns(self.repo_path))
+        current = scan_tree(self.repo_path, matcher)
+        previous = self.store.stats()
+        self._apply(current, previous, (set(previous) | set(self.store.shas())) - set(current))
+        return self._publish()
+
+    def update_paths(self, paths: Iterable[str]) -> LazyFileIndex:
+        """Uppdaterar enskilda filer eller kataloger (relativa sökvägar), t.ex. från en watcher.
+
+        Nya och ändrade filer läses in, borttagna tas bort ur indexet. Om
+        .gitignore ändrats görs en vanlig refresh eftersom vilka filer som
+        ska indexeras kan ha ändrats.
+        """
+        paths = set(paths)
+        if ".gitignore" in paths:
+            return self.refresh()
+
+        matcher = GitignoreMatcher(load_gitignore_patterns(self.repo_path))
+        previous = self.store.stats()
+        known = set(previous) | set(self.store.shas())
+        current = {}
+        removed = set()
+        for rel_path in paths:
+            full_path = os.path.join(self.repo_path, rel_path)
+            if os.path.isdir(full_path):
+                if is_indexable(rel_path, matcher, is_dir=True):
+                    current.update(scan_tree(self.repo_path, matcher, start=rel_path))
+                continue
+            try:
+                stat = os.stat(full_path)
+            except OSError:
+                # Borttagen fil eller katalog
+                removed |= {path for path in known if path == rel_path or path.startswith(rel_path + "/")}
+                continue
+            if is_indexable(rel_path, matcher):
+                current[rel_path] = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+        self._apply(current, previous, removed)
+        return self._publish()
+
+    def index(self, force_refresh: bool = False) -> LazyFileIndex:
+        if len(self.store) and not force_refresh:
+            return self._publish()
+        return self.refresh()
+
+    async def index_repo(self, force_refresh: bool = False) -> LazyFileIndex:
+        """Samma gränssnitt som GitHubIndexer, indexeringen körs i en tråd."""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self.index, force_refresh)
 
 def index_repo_files(repo_path: str, force_refresh: bool = False) -> Dict[str, str]:
     """
     Indexerar alla filer i ett repository och returnerar en dictionary med filvägar som nycklar
     och filinnehåll som värden.
-    
+
     Args:
         repo_path: Sökväg till repositoryt
-        force_refresh: Om True, tvingar en ny indexering även om cache finns
-        
+        force_refresh: Om True, indexeras katalogen om. Bara filer vars mtime,
+            storlek eller inode ändrats läses på nytt.
+
     Returns:
-        Dictionary med filvägar och innehåll
+        Läsvy med filvägar och innehåll, innehållet läses från cachen vid åtkomst
     """
-    cache_file = Path(repo_path) / ".file_index_cache.json"
-    
-    # Om cache finns och vi inte tvingar refresh, ladda från cache
-    if cache_file.exists() and not force_refresh:
-        try:
-            with open(cache_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            # Om cache-filen är korrupt eller inte kan läsas, fortsätt med ny indexering
-            pass
-    
-    file_index = {}
-    ignore_dirs = {'.git', '__pycache__', 'node_modules', 'venv', '.env', '.pytest_cache', 'data'}
-    ignore_extensions = {'.pyc', '.pyo', '.pyd', '.so', '.dll', '.exe', '.json', '.cache'}
-    
-    # Ladda .gitignore-mönster
-    gitignore_patterns = load_gitignore_patterns(repo_path)
-    
-    for root, dirs, files in os.walk(repo_path):
-        # Filtrera bort ignorerade mappar
-        dirs[:] = [d for d in dirs if d not in ignore_dirs]
-        
-        for file in files:
-            file_path = os.path.join(root, file)
-            rel_path = os.path.relpath(file_path, repo_path)
-            
-            # Kontrollera om filen ska ignoreras
-            if is_ignored(rel_path, gitignore_patterns):
-                continue
-                
-            # Kontrollera filändelse
-            if any(rel_path.endswith(ext) for ext in ignore_extensions):
-                continue
-                
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    file_index[rel_path] = content
-            except (UnicodeDecodeError, PermissionError):
-                # Hoppa över binära filer och filer vi inte har tillgång till
-                continue
-    
-    # Spara till cache
-    try:
-        with open(cache_file, 'w', encoding='utf-8') as f:
-            json.dump(file_index, f, ensure_ascii=False, indent=2)
-    except (IOError, OSError) as e:
-        print(f"Warning: Could not save file index cache: {e}")
-    
-    return file_index
\ No newline at end of file
+    return LocalFileIndexer(repo_path).index(force_refresh=force_refresh)
@@ -0,0 +1,227 @@
+# src/model/utils/file_store.py
+"""Innehållsadresserad fillagring i SQLite.
+
+Ersätter de stora JSON-cacharna för filindexen. Varje fil lagras som
+path -> blob-SHA, och innehållet lagras zlib-komprimerat en gång per SHA
+så att identiska filer delar samma blob. Innehållet läses först när det
+behövs (se LazyFileIndex) och ändringar skrivs per fil.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import zlib
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Union
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    sha TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stats (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    binary INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS derived (
+    kind TEXT NOT NULL,
+    sha TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (kind, sha)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def git_blob_sha(data: bytes) -> str:
+    """Beräknar samma blob-SHA som git/GitHub för ett filinnehåll."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+class FileStore:
+    def __init__(self, db_path: Union[str, Path]):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row and row[0] is not None else default
+
+    def set_meta(self, **values: Optional[str]):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                values.items()
+            )
+
+    def shas(self) -> Dict[str, str]:
+        """Returnerar path -> blob-SHA för alla filer utan att läsa innehållet."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT path, sha FROM files"))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def stats(self) -> Dict[str, tuple]:
+        """Returnerar path -> (mtime_ns, size, inode, binary) från senaste indexeringen."""
+        with self._lock:
+            return {
+                row[0]: (row[1], row[2], row[3], bool(row[4]))
+                for row in self._conn.execute("SELECT path, mtime_ns, size, inode, binary FROM stats")
+            }
+
+    def read_blob(self, sha: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM blobs WHERE sha = ?", (sha,)).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+    def read(self, path: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT blobs.data FROM files JOIN blobs ON blobs.sha = files.sha WHERE files.path = ?",
+                (path,)
+            ).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+    def get_derived(self, kind: str, shas: Iterable[str]) -> Dict[str, str]:
+        """Returnerar sha -> data för härledd information (t.ex. symboltabeller) om blobbar."""
+        shas = list(shas)
+        result = {}
+        with self._lock:
+            # SQLite har en gräns för antalet parametrar per fråga
+            for start in range(0, len(shas), 500):
+                batch = shas[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                result.update(self._conn.execute(
+                    f"SELECT sha, data FROM derived WHERE kind = ? AND sha IN ({placeholders})",
+                    (kind, *batch)
+                ))
+        return result
+
+    def put_derived(self, kind: str, values: Dict[str, str]):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO derived (kind, sha, data) VALUES (?, ?, ?)",
+                ((kind, sha, data) for sha, data in values.items())
+            )
+
+    def _write_blob(self, sha: str, content: str):
+        data = content.encode("utf-8")
+        self._conn.execute(
+            "INSERT OR IGNORE INTO blobs (sha, size, data) VALUES (?, ?, ?)",
+            (sha, len(data), zlib.compress(data))
+        )
+
+    def put(self, path: str, content: str, sha: Optional[str] = None):
+        """Skriver en enskild fil. SHA:n beräknas från innehållet om den saknas."""
+        self.update({path: {"sha": sha, "content": content}})
+
+    def remove(self, path: str):
+        self.update({}, removed=[path])
+
+    def update(self, files: Dict[str, dict], removed: Iterable[str] = ()):
+        """Skriver ändrade filer och tar bort filer i en transaktion.
+
+        Args:
+            files: path -> {"sha", "content", "stat"}. Poster utan "content"
+                anger att filen är oförändrad, och "stat" är en valfri
+                (mtime_ns, size, inode, binary) för lokala filer.
+            removed: Sökvägar som ska tas bort ur indexet
+        """
+        with self._lock, self._conn:
+            for path, entry in files.items():
+                if entry.get("stat") is not None:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO stats (path, mtime_ns, size, inode, binary) VALUES (?, ?, ?, ?, ?)",
+                        (path, *entry["stat"])
+                    )
+                    if entry["stat"][3]:
+                        # Binära filer har bara stat-information, inget innehåll
+                        self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+                        continue
+                content = entry.get("content")
+                if content is None:
+                    continue
+                sha = entry.get("sha") or git_blob_sha(content.encode("utf-8"))
+                self._write_blob(sha, content)
+                self._conn.execute("INSERT OR REPLACE INTO files (path, sha) VALUES (?, ?)", (path, sha))
+            removed = list(removed)
+            self._conn.executemany("DELETE FROM files WHERE path = ?", ((path,) for path in removed))
+            self._conn.executemany("DELETE FROM stats WHERE path = ?", ((path,) for path in removed))
+            self._prune()
+
+    def sync(self, files: Dict[str, dict]):
+        """Gör storen identisk med files: skriver ändringar och tar bort filer som försvunnit."""
+        with self._lock:
+            known = {row[0] for row in self._conn.execute("SELECT path FROM files UNION SELECT path FROM stats")}
+        removed = known - set(files)
+        self.update(files, removed)
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM files")
+            self._conn.execute("DELETE FROM stats")
+            self._conn.execute("DELETE FROM meta")
+            self._prune()
+
+    def _prune(self):
+        # Blobbar (och härledd information) som ingen fil längre pekar på
+        self._conn.execute("DELETE FROM blobs WHERE sha NOT IN (SELECT sha FROM files)")
+        self._conn.execute("DELETE FROM derived WHERE sha NOT IN (SELECT sha FROM files)")
+
+    def index(self) -> "LazyFileIndex":
+        return LazyFileIndex(self)
+
+class LazyFileIndex(Mapping):
+    """Läsvy path -> innehåll som hämtar filinnehållet från storen först vid åtkomst.
+
+    Sökvägar och SHA:er läses in direkt; innehållet läses och packas upp
+    per fil, så minnesanvändningen beror inte på repots storlek.
+    """
+
+    def __init__(self, store: FileStore):
+        self._store = store
+        self._shas = store.shas()
+
+    def __getitem__(self, path: str) -> str:
+        sha = self._shas[path]
+        content = self._store.read_blob(sha)
+        if content is None:
+            # Bloben har ersatts sedan vyn skapades, läs filens aktuella innehåll
+            content = self._store.read(path)
+        if content is None:
+            raise KeyError(path)
+        return content
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._shas)
+
+    def __len__(self) -> int:
+        return len(self._shas)
+
+    def __contains__(self, path) -> bool:
+        return path in self._shas
+
+    def sha(self, path: str) -> Optional[str]:
+        return self._shas.get(path)
@@ -0,0 +1,360 @@
+# src/model/utils/github_client.py
+"""Delad klient för GitHub-API:t.
+
+Alla anrop mot api.github.com går via GitHubClient så att headers,
+rate limit, ETag-cache och sidhantering finns på ett ställe:
+
+- Link-headern följs vid paginering och när sista sidan är känd hämtas
+  resterande sidor parallellt.
+- X-RateLimit-Remaining/Reset läses från varje svar; när kvoten närmar
+  sig GITHUB_RATE_LIMIT_RESERVE sprids anropen ut fram till återställningen.
+- Identiska GET-anrop som pågår samtidigt delar på ett och samma anrop.
+- Svar med ETag cachas, och ett 304-svar (som inte räknas mot kvoten)
+  returnerar det cachade innehållet.
+
+En aiohttp-session lever bara inom `async with client.session()`, eftersom
+Flask-routerna kör varje förfrågan i en egen event loop.
+"""
+
+import asyncio
+import contextvars
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlparse
+import aiohttp
+
+GITHUB_API_URL = "https://api.github.com"
+GITHUB_CONCURRENCY = int(os.getenv("GITHUB_CONCURRENCY", "10"))
+GITHUB_RATE_LIMIT_RESERVE = int(os.getenv("GITHUB_RATE_LIMIT_RESERVE", "100"))
+GITHUB_ETAG_CACHE_SIZE = int(os.getenv("GITHUB_ETAG_CACHE_SIZE", "512"))
+GITHUB_PER_PAGE = 100
+# Längsta tid ett anrop väntar på att kvoten återställs
+GITHUB_MAX_THROTTLE = float(os.getenv("GITHUB_MAX_THROTTLE", "60"))
+
+LINK_PATTERN = re.compile(r'<([^>]+)>;\s*rel="(\w+)"')
+
+def parse_link_header(header: Optional[str]) -> Dict[str, str]:
+    """Tolkar en Link-header till rel -> URL, t.ex. {"next": ..., "last": ...}."""
+    return {rel: url for url, rel in LINK_PATTERN.findall(header or "")}
+
+def _page_number(url: str) -> Optional[int]:
+    values = parse_qs(urlparse(url).query).get("page")
+    return int(values[0]) if values and values[0].isdigit() else None
+
+class GitHubResponse:
+    __slots__ = ("status", "data", "headers", "from_cache")
+
+    def __init__(self, status: int, data: Any, headers: dict, from_cache: bool = False):
+        self.status = status
+        self.data = data
+        self.headers = headers
+        self.from_cache = from_cache
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+class _SessionContext:
+    """Session, semaphore och pågående anrop för en `async with client.session()`."""
+
+    __slots__ = ("session", "semaphore", "inflight")
+
+    def __init__(self, session: aiohttp.ClientSession, concurrency: int):
+        self.session = session
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.inflight: Dict[str, asyncio.Future] = {}
+
+class GitHubClient:
+    def __init__(
+        self,
+        token: Optional[str],
+        owner: Optional[str] = None,
+        repo: Optional[str] = None,
+        api_url: str = GITHUB_API_URL,
+        concurrency: int = GITHUB_CONCURRENCY,
+        rate_limit_reserve: int = GITHUB_RATE_LIMIT_RESERVE,
+        cache_size: int = GITHUB_ETAG_CACHE_SIZE
+    ):
+        self.api_url = api_url.rstrip("/")
+        self.repo_url = f"{self.api_url}/repos/{owner}/{repo}" if owner and repo else self.api_url
+        self.headers = {"Accept": "application/vnd.github.v3+json"}
+        if token:
+            self.headers["Authorization"] = f"token {token}"
+        self.concurrency = concurrency
+        self.rate_limit_reserve = rate_limit_reserve
+        self.cache_size = cache_size
+        self.rate_limit_remaining: Optional[int] = None
+        self.rate_limit_reset: Optional[float] = None
+        self.debug = True
+        self._lock = threading.Lock()
+        # url -> (etag, data, headers) för svar med ETag
+        self._etag_cache: "OrderedDict[str, Tuple[str, Any, dict]]" = OrderedDict()
+        self._context: contextvars.ContextVar = contextvars.ContextVar(f"github_session_{id(self)}", default=None)
+
+    def log(self, message: str):
+        if self.debug:
+            print(f"[GitHubClient][DEBUG] {message}")
+
+    def url(self, path: str, params: Optional[dict] = None) -> str:
+        """Bygger en URL; relativa sökvägar utgår från repots API-URL."""
+        url = path if path.startswith("http") else f"{self.repo_url}/{path.lstrip('/')}"
+        if params:
+            url += ("&" if "?" in url else "?") + urlencode(params)
+        return url
+
+    @asynccontextmanager
+    async def session(self):
+        """Öppnar en session för anropen inom blocket (återanvänder en redan öppen)."""
+        context = self._context.get()
+        if context is not None:
+            yield context.session
+            return
+        async with aiohttp.ClientSession() as session:
+            token = self._context.set(_SessionContext(session, self.concurrency))
+            try:
+                yield session
+            finally:
+                self._context.reset(token)
+
+    def _update_rate_limit(self, headers):
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        with self._lock:
+            if remaining is not None and str(remaining).isdigit():
+                self.rate_limit_remaining = int(remaining)
+            if reset is not None and str(reset).isdigit():
+                self.rate_limit_reset = float(reset)
+
+    def throttle_delay(self) -> float:
+        """Sekunder att vänta före nästa anrop för att inte slå i kvoten."""
+        with self._lock:
+            remaining, reset = self.rate_limit_remaining, self.rate_limit_reset
+        if remaining is None or reset is None:
+            return 0.0
+        wait = reset - time.time()
+        if wait <= 0 or remaining >= self.rate_limit_reserve:
+            return 0.0
+        if remaining <= 0:
+            return min(wait, GITHUB_MAX_THROTTLE)
+        # Sprid de sista anropen jämnt fram till återställningen
+        return min(wait / remaining, GITHUB_MAX_THROTTLE)
+
+    def _cached(self, url: str) -> Optional[Tuple[str, Any, dict]]:
+        with self._lock:
+            entry = self._etag_cache.get(url)
+            if entry is not None:
+                self._etag_cache.move_to_end(url)
+            return entry
+
+    def _remember(self, url: str, etag: str, data: Any, headers: dict):
+        with self._lock:
+            self._etag_cache[url] = (etag, data, headers)
+            self._etag_cache.move_to_end(url)
+            while len(self._etag_cache) > self.cache_size:
+                self._etag_cache.popitem(last=False)
+
+    async def _wait_for_quota(self):
+        delay = self.throttle_delay()
+        if delay > 0:
+            self.log(f"Rate limit nearly exhausted ({self.rate_limit_remaining} left), waiting {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def _send(self, context: _SessionContext, method: str, url: str, headers: dict, json_body=None) -> GitHubResponse:
+        for attempt in range(2):
+            await self._wait_for_quota()
+
+            async with context.semaphore:
+                kwargs = {"headers": headers}
+                if json_body is not None:
+                    kwargs["json"] = json_body
+                async with getattr(context.session, method)(url, **kwargs) as response:
+                    self._update_rate_limit(response.headers)
+                    response_headers = dict(response.headers)
+                    retry_after = response_headers.get("Retry-After")
+                    retry = response.status in (403, 429) and retry_after and attempt == 0
+                    if not retry:
+                        data = None
+                        if response.status not in (204, 304):
+                            try:
+                                data = await response.json()
+                            except Exception:
+                                data = None
+                        return GitHubResponse(response.status, data, response_headers)
+
+            # Sekundär rate limit: vänta som GitHub anger (utanför semaphoren) och försök igen en gång
+            await asyncio.sleep(min(float(retry_after), GITHUB_MAX_THROTTLE))
+
+    async def get(self, path: str, params: Optional[dict] = None, headers: Optional[dict] = None,
+                  cache: bool = True) -> GitHubResponse:
+        """GET med ETag-cache och delning av identiska pågående anrop.
+
+        Med egna headers (t.ex. If-None-Match) eller cache=False går
+        anropet förbi cachen.
+        """
+        url = self.url(path, params)
+        context = self._context.get()
+        if context is None:
+            async with self.session():
+                return await self.get(path, params, headers, cache)
+
+        use_cache = cache and not headers
+        if use_cache:
+            pending = context.inflight.get(url)
+            if pending is not None:
+                return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        if use_cache:
+            context.inflight[url] = future
+        try:
+            request_headers = dict(self.headers, **(headers or {}))
+            cached = self._cached(url) if use_cache else None
+            if cached is not None:
+                request_headers["If-None-Match"] = cached[0]
+
+            response = await self._send(context, "get", url, request_headers)
+            if response.status == 304 and cached is not None:
+                response = GitHubResponse(200, cached[1], dict(cached[2], **response.headers), from_cache=True)
+            elif response.status == 200 and use_cache and response.headers.get("ETag"):
+                self._remember(url, response.headers["ETag"], response.data, response.headers)
+
+            future.set_result(response)
+            return response
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Hämta undantaget så att asyncio inte varnar när ingen annan väntar
+            future.exception()
+            raise
+        finally:
+            if use_cache:
+                context.inflight.pop(url, None)
+
+    async def stream(
+        self,
+        path: str,
+        consume: Callable[[int, AsyncIterator[bytes]], Awaitable[Any]],
+        params: Optional[dict] = None,
+        chunk_size: int = 64 * 1024
+    ) -> Any:
+        """Strömmande GET för stora svar, t.ex. tar-arkiv.
+
+        consume(status, chunks) får statuskoden och en asynkron iterator över
+        kroppen och returnerar resultatet. Anropet går genom samma throttling,
+        semaphore och kvotbokföring som get(), och identiska strömmar som
+        pågår samtidigt delar på ett anrop och får samma resultat.
+        """
+        url = self.url(path, params)
+        context = self._context.get()
+        if context is None:
+            async with self.session():
+                return await self.stream(path, consume, params, chunk_size)
+
+        key = f"stream:{url}"
+        pending = context.inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        context.inflight[key] = future
+        try:
+            for attempt in range(2):
+                await self._wait_for_quota()
+                async with context.semaphore:
+                    async with context.session.get(url, headers=dict(self.headers)) as response:
+                        self._update_rate_limit(response.headers)
+                        retry_after = response.headers.get("Retry-After")
+                        if not (response.status in (403, 429) and retry_after and attempt == 0):
+                            result = await consume(response.status, response.content.iter_chunked(chunk_size))
+                            future.set_result(result)
+                            return result
+                await asyncio.sleep(min(float(retry_after), GITHUB_MAX_THROTTLE))
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            context.inflight.pop(key, None)
+
+    async def get_json(self, path: str, params: Optional[dict] = None) -> Optional[Any]:
+        """Returnerar svaret som JSON, eller None om anropet misslyckades."""
+        response = await self.get(path, params)
+        if not response.ok:
+            self.log(f"GET {path} failed with status {response.status}")
+            return None
+        return response.data
+
+    async def get_pages(self, path: str, params: Optional[dict] = None) -> Optional[List[Any]]:
+        """Hämtar alla sidor för en paginerad resurs och returnerar sidornas data i ordning.
+
+        När första sidan anger rel="last" hämtas övriga sidor parallellt,
+        annars följs rel="next" en sida i taget.
+        """
+        params = dict(params or {}, per_page=GITHUB_PER_PAGE)
+        async with self.session():
+            first = await self.get(path, params)
+            if not first.ok:
+                self.log(f"GET {path} failed with status {first.status}")
+                return None
+            pages = [first.data]
+            links = parse_link_header(first.headers.get("Link"))
+
+            last_page = _page_number(links["last"]) if "last" in links else None
+            if last_page:
+                responses = await asyncio.gather(*(
+                    self.get(path, dict(params, page=page)) for page in range(2, last_page + 1)
+                ))
+                for response in responses:
+                    if not response.ok:
+                        self.log(f"GET {path} page failed with status {response.status}")
+                        return None
+                    pages.append(response.data)
+                return pages
+
+            while "next" in links:
+                response = await self.get(links["next"])
+                if not response.ok:
+                    self.log(f"GET {links['next']} failed with status {response.status}")
+                    return None
+                pages.append(response.data)
+                links = parse_link_header(response.headers.get("Link"))
+            return pages
+
+    async def get_paginated(self, path: str, params: Optional[dict] = None) -> Optional[List[Any]]:
+        """Hämtar en paginerad lista och returnerar alla element."""
+        pages = await self.get_pages(path, params)
+        if pages is None:
+            return None
+        return [item for page in pages for item in (page or [])]
+
+    async def get_commit(self, sha: str) -> Optional[dict]:
+        """Hämtar en commit med alla ändrade filer (filerna pagineras för stora commits)."""
+        pages = await self.get_pages(f"commits/{sha}")
+        if not pages:
+            return None
+        commit = dict(pages[0])
+        commit["files"] = [file for page in pages for file in page.get("files", [])]
+        return commit
+
+    async def post_json(self, path: str, payload: dict) -> GitHubResponse:
+        async with self.session():
+            context = self._context.get()
+            return await self._send(context, "post", self.url(path), dict(self.headers), json_body=payload)
+
+def create_github_client() -> GitHubClient:
+    """Skapar en GitHubClient med konfiguration från miljövariabler."""
+    return GitHubClient(
+        os.getenv("GITHUB_AGENT_TOKEN"),
+        os.getenv("GITHUB_REPO_OWNER"),
+        os.getenv("GITHUB_REPO_NAME")
+    )
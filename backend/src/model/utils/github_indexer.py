@@ -1,144 +1,419 @@
 import os
+import io
 import json
-import aiohttp
+import queue
+import base64
+import tarfile
 import asyncio
-from typing import Dict, List
+from typing import Dict, List, Optional
 from pathlib import Path
+from urllib.parse import quote
 from dotenv import load_dotenv
+from src.model.utils.file_store import FileStore, LazyFileIndex, git_blob_sha
+from src.model.utils.github_client import GitHubClient
 
 # Ladda miljövariabler från .env-filen
 load_dotenv()
 
+FETCH_MODES = ("api", "tarball")
+TARBALL_CHUNK_SIZE = 64 * 1024
+
+def should_index(path: str) -> bool:
+    """Bestämmer om en fil i ett repo ska indexeras."""
+    ignore_dirs = {'.git', '__pycache__', 'node_modules', 'venv', '.env', '.pytest_cache', 'data'}
+    ignore_extensions = {'.pyc', '.pyo', '.pyd', '.so', '.dll', '.exe', '.json', '.cache'}
+
+    if any(part in ignore_dirs for part in path.split('/')):
+        return False
+
+    if any(path.endswith(ext) for ext in ignore_extensions):
+        return False
+
+    return True
+
+class _ChunkStream(io.RawIOBase):
+    """Blockerande filobjekt som matas med bytes från en asynkron nedladdning.
+
+    tarfile läser från strömmen i en arbetstråd medan event-loopen lägger
+    till chunkar. Kön är begränsad så att nedladdningen inte springer ifrån
+    uppackningen.
+    """
+
+    def __init__(self, max_chunks: int = 16):
+        super().__init__()
+        self._chunks = queue.Queue(maxsize=max_chunks)
+        self._buffer = b""
+        self._eof = False
+        self.closed_by_reader = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        while not self._buffer and not self._eof:
+            chunk = self._chunks.get()
+            if chunk is None:
+                self._eof = True
+            else:
+                self._buffer = chunk
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def feed(self, chunk) -> None:
+        # Ge upp om läsaren redan har slutat (t.ex. korrupt arkiv)
+        while not self.closed_by_reader:
+            try:
+                self._chunks.put(chunk, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
 class GitHubIndexer:
-    def __init__(self, token: str, owner: str, repo: str):
+    def __init__(self, token: str, owner: str, repo: str, branch: str = "main", fetch_mode: str = "api"):
+        if fetch_mode not in FETCH_MODES:
+            raise ValueError(f"Unknown fetch mode '{fetch_mode}'. Expected one of {FETCH_MODES}.")
         self.token = token
         self.owner = owner
         self.repo = repo
-        self.base_url = f"https://api.github.com/repos/{owner}/{repo}"
-        self.headers = {
-            "Authorization": f"token {token}",
-            "Accept": "application/vnd.github.v3+json"
-        }
-        self.cache_file = Path(".github_index_cache.json")
+        self.branch = branch
+        self.fetch_mode = fetch_mode
+        # Delad klient för rate limit, sessioner och headers (se github_client.py)
+        self.client = GitHubClient(token, owner, repo)
+        self.base_url = self.client.repo_url
+        self.headers = self.client.headers
+        self.cache_file = Path(".github_index.sqlite")
+        self._store = None
         self.debug = True
         self.session = None
-        self.semaphore = None
+        self.tree_sha = None
+        self.tree_etag = None
+        self.file_shas: Dict[str, str] = {}
+        # Binära filer indexeras inte, men path -> SHA sparas i storen så att
+        # de inte laddas ner igen (som i LocalGitIndexer)
+        self._binary_shas: Dict[str, str] = {}
 
     def log(self, message: str):
         if self.debug:
             print(f"[GitHubIndexer][DEBUG] {message}")
 
-    async def _get_file_content(self, path: str) -> str:
-        """Hämtar innehållet i en fil från GitHub asynkront."""
-        if self.semaphore is None:
-            self.semaphore = asyncio.Semaphore(10)
-            
-        async with self.semaphore:
-            self.log(f"Fetching content for file: {path}")
-            url = f"{self.base_url}/contents/{path}"
-            try:
-                async with self.session.get(url, headers=self.headers) as response:
-                    if response.status == 200:
-                        self.log(f"Successfully fetched content for {path}")
-                        data = await response.json()
-                        content = data["content"]
-                        import base64
-                        return base64.b64decode(content).decode('utf-8')
-                    self.log(f"Failed to fetch content for {path}. Status code: {response.status}")
-                    return ""
-            except Exception as e:
-                self.log(f"Error fetching {path}: {str(e)}")
-                return ""
-
-    async def _get_repo_structure(self) -> Dict[str, str]:
-        """Hämtar hela repository-strukturen från GitHub asynkront."""
+    @property
+    def store(self) -> FileStore:
+        if self._store is None or self._store.db_path != Path(self.cache_file):
+            self._store = FileStore(self.cache_file)
+        return self._store
+
+    async def _get_blob(self, path: str, sha: str) -> Optional[bytes]:
+        """Hämtar en blob från GitHub asynkront. Returnerar None om hämtningen misslyckades."""
+        self.log(f"Fetching content for file: {path}")
+        try:
+            # Blobbar är oföränderliga per SHA, så ETag-cachen behövs inte
+            response = await self.client.get(f"git/blobs/{sha}", cache=False)
+            if response.status == 200:
+                self.log(f"Successfully fetched content for {path}")
+                return base64.b64decode(response.data["content"])
+            self.log(f"Failed to fetch content for {path}. Status code: {response.status}")
+            return None
+        except Exception as e:
+            self.log(f"Error fetching {path}: {str(e)}")
+            return None
+
+    async def _get_file_contents(self, path: str, ref: str) -> Optional[dict]:
+        """Hämtar en fil via contents-API:t. Returnerar {"sha", "content"} eller None.
+
+        "content" är None för binära filer.
+        """
+        try:
+            response = await self.client.get(f"contents/{quote(path)}", {"ref": ref}, cache=False)
+            if response.status != 200:
+                self.log(f"Failed to fetch {path}. Status code: {response.status}")
+                return None
+            data = response.data
+        except Exception as e:
+            self.log(f"Error fetching {path}: {str(e)}")
+            return None
+
+        if data.get("encoding") != "base64":
+            # Filer över 1 MB returneras utan innehåll, hämta bloben i stället
+            raw = await self._get_blob(path, data["sha"])
+            if raw is None:
+                return None
+        else:
+            raw = base64.b64decode(data["content"])
+        try:
+            content = raw.decode("utf-8")
+        except UnicodeDecodeError:
+            content = None
+        return {"sha": data["sha"], "content": content}
+
+    async def update_files(self, changed: List[str], removed: List[str], ref: Optional[str] = None) -> LazyFileIndex:
+        """Uppdaterar enskilda filer, t.ex. från en push-webhook, utan att hämta hela trädet.
+
+        Args:
+            changed: Tillagda eller ändrade sökvägar
+            removed: Borttagna sökvägar
+            ref: Commit att läsa filerna från (standard: grenen)
+        """
+        paths = [path for path in dict.fromkeys(changed) if self._should_index(path)]
+        removed = [path for path in removed if path not in paths]
+        self.log(f"Updating {len(paths)} files, removing {len(removed)}")
+
+        async with self.client.session() as self.session:
+            results = await asyncio.gather(*(self._get_file_contents(path, ref or self.branch) for path in paths))
+
+        updates = {}
+        for path in removed:
+            self._binary_shas.pop(path, None)
+        for path, result in zip(paths, results):
+            if result is None:
+                continue
+            if result["content"] is None:
+                # Binär fil, ska inte finnas i indexet
+                removed.append(path)
+                self._binary_shas[path] = result["sha"]
+            else:
+                updates[path] = result
+                self._binary_shas.pop(path, None)
+
+        self.store.update(updates, removed)
+        # Trädets SHA/ETag motsvarar inte längre storen; nästa refresh hämtar
+        # trädet igen men laddar bara ner blobbar som fortfarande skiljer sig
+        self.tree_sha = None
+        self.tree_etag = None
+        self.store.set_meta(tree_sha=None, etag=None, binary_shas=json.dumps(self._binary_shas))
+        return self._publish()
+
+    async def _get_repo_structure(self, cached_shas: Dict[str, str]) -> Optional[Dict[str, dict]]:
+        """Hämtar repository-trädet och laddar bara ner blobbar vars SHA ändrats.
+
+        Returns:
+            Dictionary path -> {"sha", "content"} där oförändrade filer bara
+            har "sha", eller None om trädet inte ändrats sedan förra
+            hämtningen (304 Not Modified) eller inte kunde hämtas. Då
+            används cachen som den är.
+        """
         self.log("Fetching repository structure from GitHub...")
-        url = f"{self.base_url}/git/trees/main?recursive=1"
-        
+        headers = {}
+        if self.tree_etag and cached_shas:
+            headers["If-None-Match"] = self.tree_etag
+
         try:
-            async with self.session.get(url, headers=self.headers) as response:
-                if response.status != 200:
-                    self.log(f"Failed to fetch repository structure. Status code: {response.status}")
-                    return {}
-                
-                self.log("Successfully fetched repository structure")
-                data = await response.json()
-                tree = data["tree"]
-                
-                files_to_fetch = []
-                for item in tree:
-                    if item["type"] == "blob" and self._should_index(item["path"]):
-                        files_to_fetch.append(item["path"])
-                
-                self.log(f"Found {len(files_to_fetch)} files to fetch")
-                
-                # Skapa en ny semaphore för varje anrop
-                self.semaphore = asyncio.Semaphore(10)
-                tasks = [self._get_file_content(path) for path in files_to_fetch]
-                contents = await asyncio.gather(*tasks)
-                
-                file_index = {}
-                for path, content in zip(files_to_fetch, contents):
-                    if content:
-                        file_index[path] = content
-                        self.log(f"Added file to index: {path}")
-                
-                self.log(f"Indexed {len(file_index)} files from GitHub")
-                return file_index
-                
+            # Trädets ETag sparas i storen, så klientens minnescache används inte här
+            response = await self.client.get(
+                f"git/trees/{self.branch}", {"recursive": 1}, headers=headers, cache=False
+            )
+            if response.status == 304:
+                self.log("Repository tree not modified since last fetch")
+                return None
+
+            if response.status != 200:
+                self.log(f"Failed to fetch repository structure. Status code: {response.status}")
+                return None
+
+            self.log("Successfully fetched repository structure")
+            self.tree_etag = response.headers.get("ETag")
+            data = response.data
+
+            if data["sha"] == self.tree_sha and cached_shas:
+                self.log("Tree SHA unchanged, reusing cached files")
+                return None
+            self.tree_sha = data["sha"]
+
+            if self.fetch_mode == "tarball":
+                return await self._get_repo_tarball()
+
+            file_index = {}
+            binary_shas = {}
+            files_to_fetch = []
+            for item in data["tree"]:
+                if item["type"] != "blob" or not self._should_index(item["path"]):
+                    continue
+                if cached_shas.get(item["path"]) == item["sha"]:
+                    file_index[item["path"]] = {"sha": item["sha"]}
+                elif self._binary_shas.get(item["path"]) == item["sha"]:
+                    binary_shas[item["path"]] = item["sha"]
+                else:
+                    files_to_fetch.append((item["path"], item["sha"]))
+
+            self.log(f"{len(file_index)} files unchanged, {len(files_to_fetch)} files to fetch")
+
+            # Klienten begränsar antalet samtidiga anrop
+            tasks = [self._get_blob(path, sha) for path, sha in files_to_fetch]
+            blobs = await asyncio.gather(*tasks)
+
+            failed = 0
+            for (path, sha), blob in zip(files_to_fetch, blobs):
+                if blob is None:
+                    failed += 1
+                    continue
+                try:
+                    # Tomma filer (t.ex. __init__.py) är giltigt innehåll
+                    file_index[path] = {"sha": sha, "content": blob.decode("utf-8")}
+                    self.log(f"Added file to index: {path}")
+                except UnicodeDecodeError:
+                    binary_shas[path] = sha
+            self._binary_shas = binary_shas
+
+            if failed:
+                # Glöm trädets SHA/ETag så att nästa uppdatering försöker igen
+                self.tree_sha = None
+                self.tree_etag = None
+
+            self.log(f"Indexed {len(file_index)} files from GitHub")
+            return file_index
+
         except Exception as e:
             self.log(f"Error in _get_repo_structure: {str(e)}")
-            return {}
+            return None
+
+    async def _get_repo_tarball(self) -> Optional[Dict[str, dict]]:
+        """Hämtar hela repot som ett tar-arkiv i en enda förfrågan.
+
+        Arkivet packas upp i strömmande läge medan det laddas ner, och
+        filer som inte ska indexeras hoppas över redan under läsningen.
+        """
+        path = f"tarball/{self.branch}"
+        self.log(f"Streaming repository archive from {self.client.url(path)}")
+        loop = asyncio.get_running_loop()
+
+        async def extract(status, chunks):
+            if status != 200:
+                self.log(f"Failed to fetch repository archive. Status code: {status}")
+                return None
+            stream = _ChunkStream()
+            reader = loop.run_in_executor(None, self._read_tarball, stream)
+            try:
+                async for chunk in chunks:
+                    await loop.run_in_executor(None, stream.feed, chunk)
+            finally:
+                await loop.run_in_executor(None, stream.feed, None)
+            return await reader
+
+        try:
+            # Via klienten så att arkivet räknas mot kvoten och throttlas som övriga anrop
+            file_index = await self.client.stream(path, extract, chunk_size=TARBALL_CHUNK_SIZE)
+            if file_index is None:
+                self.tree_sha = None
+                return None
+
+            self.log(f"Indexed {len(file_index)} files from archive")
+            return file_index
+
+        except Exception as e:
+            self.log(f"Error streaming repository archive: {str(e)}")
+            self.tree_sha = None
+            return None
+
+    def _read_tarball(self, stream: _ChunkStream) -> Dict[str, dict]:
+        """Läser tar-strömmen och returnerar path -> {"sha", "content"}."""
+        file_index = {}
+        try:
+            with tarfile.open(fileobj=stream, mode="r|gz") as archive:
+                for member in archive:
+                    if not member.isfile():
+                        continue
+                    # GitHub lägger allt under en katalog "owner-repo-<sha>/"
+                    path = member.name.split("/", 1)[1] if "/" in member.name else member.name
+                    if not self._should_index(path):
+                        continue
+                    data = archive.extractfile(member).read()
+                    try:
+                        content = data.decode("utf-8")
+                    except UnicodeDecodeError:
+                        continue
+                    file_index[path] = {"sha": git_blob_sha(data), "content": content}
+        finally:
+            stream.closed_by_reader = True
+        return file_index
 
     def _should_index(self, path: str) -> bool:
         """Bestämmer om en fil ska indexeras."""
-        ignore_dirs = {'.git', '__pycache__', 'node_modules', 'venv', '.env', '.pytest_cache', 'data'}
-        ignore_extensions = {'.pyc', '.pyo', '.pyd', '.so', '.dll', '.exe', '.json', '.cache'}
-        
-        if any(part in ignore_dirs for part in path.split('/')):
-            return False
-            
-        if any(path.endswith(ext) for ext in ignore_extensions):
-            return False
-            
-        return True
+        return should_index(path)
 
-    async def index_repo(self, force_refresh: bool = False) -> Dict[str, str]:
-        """Indexerar hela repot från GitHub asynkront."""
+    def _load_cache(self) -> Dict[str, str]:
+        """Läser trädets SHA/ETag från storen och returnerar path -> blob-SHA."""
+        try:
+            self.tree_sha = self.store.get_meta("tree_sha")
+            self.tree_etag = self.store.get_meta("etag")
+            self._binary_shas = json.loads(self.store.get_meta("binary_shas", "{}"))
+            return self.store.shas()
+        except Exception as e:
+            self.log(f"Cache load failed: {str(e)}")
+            return {}
+
+    def _save_cache(self, files: Optional[Dict[str, dict]]):
+        try:
+            self.log("Saving to cache...")
+            if files is not None:
+                self.store.sync(files)
+            self.store.set_meta(
+                tree_sha=self.tree_sha, etag=self.tree_etag, binary_shas=json.dumps(self._binary_shas)
+            )
+            self.log("Cache saved successfully")
+        except Exception as e:
+            self.log(f"Cache save failed: {str(e)}")
+
+    def _publish(self) -> LazyFileIndex:
+        index = self.store.index()
+        self.file_shas = {path: index.sha(path) for path in index}
+        return index
+
+    async def index_repo(self, force_refresh: bool = False) -> LazyFileIndex:
+        """Indexerar hela repot från GitHub asynkront.
+
+        Vid force_refresh görs en villkorlig hämtning av trädet (ETag) och
+        bara blobbar vars SHA ändrats laddas ner på nytt. Resultatet är en
+        läsvy över storen där filinnehållet läses först vid åtkomst.
+        """
         self.log(f"Starting repository indexing. Force refresh: {force_refresh}")
-        
-        if self.cache_file.exists() and not force_refresh:
-            try:
-                self.log("Loading from cache...")
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    cache = json.load(f)
-                    self.log(f"Loaded {len(cache)} files from cache")
-                    return cache
-            except (json.JSONDecodeError, FileNotFoundError) as e:
-                self.log(f"Cache load failed: {str(e)}")
-        
+        cached_shas = self._load_cache()
+
+        if cached_shas and not force_refresh:
+            self.log(f"Loaded {len(cached_shas)} files from cache")
+            return self._publish()
+
         # Skapa en ny session för varje indexering
-        async with aiohttp.ClientSession() as self.session:
+        async with self.client.session() as self.session:
             self.log("Fetching files from GitHub...")
-            file_index = await self._get_repo_structure()
-            
-            try:
-                self.log("Saving to cache...")
-                with open(self.cache_file, 'w', encoding='utf-8') as f:
-                    json.dump(file_index, f, ensure_ascii=False, indent=2)
-                self.log("Cache saved successfully")
-            except (IOError, OSError) as e:
-                self.log(f"Cache save failed: {str(e)}")
-            
-            return file_index
+            files = await self._get_repo_structure(cached_shas)
+
+        # Vid None behålls filerna men trädets SHA/ETag kan ha ändrats
+        self._save_cache(files)
+        return self._publish()
 
 def create_github_indexer() -> GitHubIndexer:
     """Skapar en GitHubIndexer med konfiguration från miljövariabler."""
     token = os.getenv("GITHUB_AGENT_TOKEN")
     owner = os.getenv("GITHUB_REPO_OWNER")
     repo = os.getenv("GITHUB_REPO_NAME")
-    
+
     if not all([token, owner, repo]):
         raise ValueError("Missing required GitHub configuration. Please set GITHUB_AGENT_TOKEN, GITHUB_REPO_OWNER, and GITHUB_REPO_NAME environment variables.")
-    
-    return GitHubIndexer(token, owner, repo) 
\ No newline at end of file
+
+    return GitHubIndexer(
+        token,
+        owner,
+        repo,
+        branch=os.getenv("GITHUB_REPO_BRANCH", "main"),
+        fetch_mode=os.getenv("GITHUB_FETCH_MODE", "api")
+    )
+
+def create_repo_indexer():
+    """Väljer indexerare: en lokal klon om GIT_LOCAL_REPO_PATH är satt, annars GitHub-API:t.
+
+    Med GIT_LOCAL_SOURCE=worktree indexeras klonens arbetskatalog (inklusive
+    ändringar som inte är committade) i stället för remote-grenen.
+    """
+    repo_path = os.getenv("GIT_LOCAL_REPO_PATH")
+    if repo_path and os.getenv("GIT_LOCAL_SOURCE", "git") == "worktree":
+        from src.model.utils.file_indexer import LocalFileIndexer
+        return LocalFileIndexer(repo_path)
+    if repo_path:
+        from src.model.utils.local_git_indexer import LocalGitIndexer
+        return LocalGitIndexer(
+            repo_path,
+            branch=os.getenv("GITHUB_REPO_BRANCH", "main"),
+            remote=os.getenv("GIT_LOCAL_REMOTE", "origin")
+        )
+    return create_github_indexer()
@@ -0,0 +1,248 @@
+# src/model/utils/local_git_indexer.py
+"""Indexerare som läser direkt från en lokal git-klon.
+
+Har samma gränssnitt som GitHubIndexer (index_repo, file_shas, tree_sha)
+men läser träd, blobbar, diffar och commit-historik från disk via
+`git ls-tree` och `git cat-file --batch`. Klonen hålls aktuell med
+`git fetch`, så inga anrop går mot GitHub-API:t.
+"""
+
+import asyncio
+import json
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional
+from src.model.utils.file_store import FileStore, LazyFileIndex
+from src.model.utils.github_indexer import should_index
+
+class LocalGitIndexer:
+    def __init__(self, repo_path: str, branch: str = "main", remote: str = "origin", auto_fetch: bool = True):
+        self.repo_path = repo_path
+        self.branch = branch
+        self.remote = remote
+        self.auto_fetch = auto_fetch
+        self.debug = True
+        self.cache_file = Path(".local_git_index.sqlite")
+        self._store = None
+        self.tree_sha = None
+        self.file_shas: Dict[str, str] = {}
+        # Binära filer indexeras inte, men SHA:n sparas i storens meta-tabell
+        # så att de inte läses om, inte ens efter en omstart
+        self._binary_shas: Dict[str, str] = {}
+
+    def log(self, message: str):
+        if self.debug:
+            print(f"[LocalGitIndexer][DEBUG] {message}")
+
+    @property
+    def store(self) -> FileStore:
+        if self._store is None or self._store.db_path != Path(self.cache_file):
+            self._store = FileStore(self.cache_file)
+            self.tree_sha = self._store.get_meta("tree_sha")
+            self._binary_shas = json.loads(self._store.get_meta("binary_shas", "{}"))
+        return self._store
+
+    def _git(self, *args: str, input: bytes = None) -> bytes:
+        result = subprocess.run(
+            ["git", *args],
+            cwd=self.repo_path,
+            input=input,
+            capture_output=True,
+            check=True
+        )
+        return result.stdout
+
+    def _has_remote(self) -> bool:
+        remotes = self._git("remote").decode().split()
+        return self.remote in remotes
+
+    def ref(self) -> str:
+        """Returnerar referensen som indexeras: remote-grenen om den finns, annars HEAD."""
+        remote_ref = f"refs/remotes/{self.remote}/{self.branch}"
+        try:
+            self._git("rev-parse", "--verify", "--quiet", remote_ref)
+            return remote_ref
+        except subprocess.CalledProcessError:
+            return "HEAD"
+
+    def fetch(self) -> bool:
+        """Kör `git fetch` mot remote-grenen. Returnerar True om den gick bra."""
+        if not self._has_remote():
+            return False
+        try:
+            self._git("fetch", "--quiet", self.remote, self.branch)
+            return True
+        except subprocess.CalledProcessError as e:
+            self.log(f"git fetch failed: {e.stderr.decode(errors='replace').strip()}")
+            return False
+
+    def list_files(self, ref: str) -> Dict[str, str]:
+        """Returnerar path -> blob-SHA för alla filer i ref."""
+        output = self._git("ls-tree", "-r", "-z", "--full-tree", ref)
+        files = {}
+        for entry in output.split(b"\0"):
+            if not entry:
+                continue
+            meta, path = entry.split(b"\t", 1)
+            _, object_type, sha = meta.split()
+            if object_type == b"blob":
+                files[path.decode("utf-8", errors="surrogateescape")] = sha.decode()
+        return files
+
+    def read_blobs(self, shas: List[str]) -> Dict[str, bytes]:
+        """Läser flera blobbar i en enda `git cat-file --batch`-process."""
+        if not shas:
+            return {}
+        output = self._git("cat-file", "--batch", input="".join(f"{sha}\n" for sha in shas).encode())
+
+        blobs = {}
+        position = 0
+        while position < len(output):
+            header_end = output.index(b"\n", position)
+            header = output[position:header_end].split()
+            position = header_end + 1
+            if len(header) < 3 or header[1] == b"missing":
+                continue
+            size = int(header[2])
+            blobs[header[0].decode()] = output[position:position + size]
+            position += size + 1  # innehållet följs av en radbrytning
+        return blobs
+
+    def _index(self) -> LazyFileIndex:
+        ref = self.ref()
+        tree_sha = self._git("rev-parse", f"{ref}^{{tree}}").decode().strip()
+        store = self.store
+        if tree_sha == self.tree_sha and len(store):
+            self.log("Tree unchanged, reusing index")
+            return self._publish()
+
+        listing = {path: sha for path, sha in self.list_files(ref).items() if should_index(path)}
+        known = {**self._binary_shas, **store.shas()}
+        changed = {sha for path, sha in listing.items() if known.get(path) != sha}
+        self.log(f"{len(listing) - len(changed)} files unchanged, {len(changed)} blobs to read")
+        blobs = self.read_blobs(sorted(changed))
+
+        files = {}
+        binary_shas = {}
+        for path, sha in listing.items():
+            if sha not in changed:
+                if path in self._binary_shas:
+                    binary_shas[path] = sha
+                else:
+                    files[path] = {"sha": sha}
+                continue
+            try:
+                files[path] = {"sha": sha, "content": blobs[sha].decode("utf-8")}
+            except (KeyError, UnicodeDecodeError):
+                binary_shas[path] = sha
+
+        store.sync(files)
+        store.set_meta(tree_sha=tree_sha, binary_shas=json.dumps(binary_shas))
+        self._binary_shas = binary_shas
+        self.tree_sha = tree_sha
+        published = self._publish()
+        self.log(f"Indexed {len(published)} files from {ref}")
+        return published
+
+    def _publish(self) -> LazyFileIndex:
+        index = self.store.index()
+        self.file_shas = {path: index.sha(path) for path in index}
+        return index
+
+    async def index_repo(self, force_refresh: bool = False) -> LazyFileIndex:
+        """Indexerar repot från den lokala klonen.
+
+        Vid force_refresh hämtas först nya commits med `git fetch`, och bara
+        blobbar vars SHA ändrats läses om.
+        """
+        self.log(f"Starting repository indexing. Force refresh: {force_refresh}")
+        if len(self.store) and not force_refresh:
+            return self._publish()
+
+        loop = asyncio.get_event_loop()
+        if force_refresh and self.auto_fetch:
+            await loop.run_in_executor(None, self.fetch)
+        return await loop.run_in_executor(None, self._index)
+
+    def get_commit(self, commit_hash: str) -> Optional[dict]:
+        """Returnerar en commit i samma form som GitHubs /commits/{sha}-svar.
+
+        commit_hash kommer från användarens text, så den löses först upp
+        till en fullständig SHA och --end-of-options hindrar att något som
+        börjar med "-" tolkas som en flagga till git.
+        """
+        try:
+            sha = self._git(
+                "rev-parse", "--verify", "--quiet", "--end-of-options", f"{commit_hash}^{{commit}}"
+            ).decode().strip()
+            meta = self._git("show", "-s", "--format=%H%x00%an%x00%aI%x00%B", "--end-of-options", sha).decode()
+            numstat = self._git("show", "--format=", "--numstat", "-z", "--end-of-options", sha).decode(errors="replace")
+            patch = self._git("show", "--format=", "--patch", "--no-color", "--end-of-options", sha).decode(errors="replace")
+        except subprocess.CalledProcessError:
+            return None
+
+        sha, author, date, message = meta.split("\0", 3)
+        patches = _split_patch(patch)
+        files = []
+        for additions, deletions, filename, previous in _parse_numstat(numstat):
+            entry = {
+                "filename": filename,
+                "additions": int(additions) if additions != "-" else 0,
+                "deletions": int(deletions) if deletions != "-" else 0,
+                "patch": patches.get(filename, "")
+            }
+            if previous is not None:
+                entry["previous_filename"] = previous
+            files.append(entry)
+
+        return {
+            "sha": sha,
+            "commit": {
+                "author": {"name": author, "date": date},
+                "message": message.strip()
+            },
+            "files": files
+        }
+
+    def get_latest_commit_diff(self) -> str:
+        return self._git("show", "--stat", "--unified=1", "--no-color", self.ref()).decode(errors="replace")
+
+def _parse_numstat(numstat: str) -> List[tuple]:
+    """Tolkar `git show --numstat -z` till (tillagda, borttagna, sökväg, tidigare sökväg).
+
+    Med -z skrivs sökvägar oförändrade. En omdöpt fil har tom sökväg på
+    statistikraden följd av den gamla och den nya sökvägen som egna fält,
+    i stället för `gammal => ny` som inte matchar diffens filnamn.
+    """
+    fields = numstat.split("\0")
+    entries = []
+    position = 0
+    while position < len(fields):
+        line = fields[position].lstrip("\n")
+        position += 1
+        if not line:
+            continue
+        additions, deletions, filename = line.split("\t", 2)
+        previous = None
+        if not filename:
+            previous, filename = fields[position], fields[position + 1]
+            position += 2
+        entries.append((additions, deletions, filename, previous))
+    return entries
+
+def _split_patch(patch: str) -> Dict[str, str]:
+    """Delar upp `git show --patch` i en patch per fil (utan diff-huvudet)."""
+    patches = {}
+    current = None
+    lines: List[str] = []
+    for line in patch.splitlines():
+        if line.startswith("diff --git "):
+            if current:
+                patches[current] = "\n".join(lines)
+            current = line.split(" b/", 1)[-1]
+            lines = []
+        elif current and (lines or line.startswith("@@")):
+            lines.append(line)
+    if current:
+        patches[current] = "\n".join(lines)
+    return patches
@@ -0,0 +1,147 @@
+# src/model/utils/onnx_embedding.py
+"""ONNX Runtime-backend för embeddingmodellen.
+
+KBLab/bert-base-swedish-cased exporteras en gång till ONNX (valfritt med
+dynamisk int8-kvantisering) och körs sedan med ONNX Runtime på CPU.
+Backenden väljs med EMBEDDING_BACKEND=onnx.
+"""
+
+import os
+import threading
+from typing import List, Optional
+import numpy as np
+
+ONNX_MODEL_DIR = os.getenv("EMBEDDING_ONNX_DIR", "data/onnx")
+ONNX_QUANTIZE = os.getenv("EMBEDDING_ONNX_QUANTIZE", "0").lower() in ("1", "true", "yes")
+ONNX_THREADS = int(os.getenv("EMBEDDING_ONNX_THREADS", "0"))
+
+INPUT_NAMES = ["input_ids", "attention_mask", "token_type_ids"]
+
+def _hidden_state_wrapper(bert):
+    """Wrappar BERT så att den anropas med namngivna argument och bara
+    returnerar last_hidden_state."""
+    import torch
+
+    class HiddenStateWrapper(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.bert = bert
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            outputs = self.bert(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                token_type_ids=token_type_ids
+            )
+            return outputs.last_hidden_state
+
+    return HiddenStateWrapper().eval()
+
+def onnx_model_path(output_dir: str = ONNX_MODEL_DIR, quantize: bool = False) -> str:
+    filename = "model.int8.onnx" if quantize else "model.onnx"
+    return os.path.join(output_dir, filename)
+
+def export_onnx_model(output_dir: str = ONNX_MODEL_DIR, quantize: bool = False) -> str:
+    """Exporterar PyTorch-modellen till ONNX och returnerar sökvägen.
+
+    Args:
+        output_dir: Katalog där modellen sparas
+        quantize: Om True, skapas även en dynamiskt int8-kvantiserad variant
+
+    Returns:
+        Sökvägen till modellen som ska laddas
+    """
+    import torch
+    from src.model.utils.embedding import get_tokenizer, get_model
+
+    tokenizer = get_tokenizer()
+    os.makedirs(output_dir, exist_ok=True)
+    fp32_path = onnx_model_path(output_dir)
+
+    if not os.path.exists(fp32_path):
+        print(f"[OnnxEmbedder] Exporting model to {fp32_path}")
+        sample = tokenizer(["Exempeltext för export"], return_tensors="pt")
+        with torch.no_grad():
+            torch.onnx.export(
+                _hidden_state_wrapper(get_model()),
+                tuple(sample[name] for name in INPUT_NAMES),
+                fp32_path,
+                input_names=INPUT_NAMES,
+                output_names=["last_hidden_state"],
+                dynamic_axes={
+                    **{name: {0: "batch", 1: "sequence"} for name in INPUT_NAMES},
+                    "last_hidden_state": {0: "batch", 1: "sequence"}
+                },
+                opset_version=17,
+                dynamo=False
+            )
+
+    if not quantize:
+        return fp32_path
+
+    int8_path = onnx_model_path(output_dir, quantize=True)
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        print(f"[OnnxEmbedder] Quantizing model to {int8_path}")
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    return int8_path
+
+class OnnxEmbedder:
+    """Beräknar embeddings med ONNX Runtime och samma mean pooling som PyTorch-vägen.
+
+    Attribut:
+        model_path (str): Sökväg till ONNX-modellen
+        session: ONNX Runtime-sessionen
+    """
+
+    def __init__(self, model_path: str, tokenizer, threads: int = ONNX_THREADS):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            options.intra_op_num_threads = threads
+
+        self.model_path = model_path
+        self.tokenizer = tokenizer
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        inputs = self.tokenizer(
+            texts,
+            return_tensors="np",
+            truncation=True,
+            padding=True,
+            max_length=512
+        )
+        feed = {
+            name: inputs[name].astype(np.int64)
+            for name in INPUT_NAMES
+            if name in self.input_names and name in inputs
+        }
+        token_embeddings = self.session.run(["last_hidden_state"], feed)[0]
+
+        # Mean pooling, samma som _compute_embeddings
+        mask = inputs["attention_mask"][..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        count = np.clip(mask.sum(axis=1), 1e-9, None)
+        return (summed / count).astype(np.float32)
+
+_embedder: Optional[OnnxEmbedder] = None
+_embedder_lock = threading.Lock()
+
+def get_onnx_embedder() -> OnnxEmbedder:
+    """Returnerar den delade ONNX-embeddern och exporterar modellen vid behov."""
+    global _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            from src.model.utils.embedding import get_tokenizer
+
+            path = onnx_model_path(quantize=ONNX_QUANTIZE)
+            if not os.path.exists(path):
+                path = export_onnx_model(quantize=ONNX_QUANTIZE)
+            _embedder = OnnxEmbedder(path, get_tokenizer())
+            print(f"[OnnxEmbedder] Loaded {path}")
+        return _embedder
@@ -0,0 +1,252 @@
+# src/model/utils/path_index.py
+"""Uppslagsindex över ett file_index.
+
+Innehåller ett suffix-trie över sökvägarnas komponenter (för filnamn som
+"app.py" eller "utils/embedding.py"), en karta modulnamn -> sökväg för att
+lösa upp imports och ett inverterat tokenindex över filinnehållet. Indexet
+byggs en gång och uppdateras sedan per fil, så att en fråga kostar ungefär
+lika mycket som antalet träffar i stället för hela repots storlek.
+"""
+
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Dict, Iterable, List, Mapping, Optional, Set
+
+# \w så att identifierare med å, ä och ö blir ett token
+TOKEN_PATTERN = re.compile(r"\w+")
+# Längden på de n-gram som ordförrådet indexeras med för delsträngsuppslag
+GRAM_SIZE = 3
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+def grams(token: str) -> Set[str]:
+    return {token[i:i + GRAM_SIZE] for i in range(len(token) - GRAM_SIZE + 1)}
+
+def module_name(path: str) -> Optional[str]:
+    """Returnerar pythons modulnamn för en sökväg, t.ex. src/model/llm_client.py -> src.model.llm_client."""
+    if not path.endswith(".py"):
+        return None
+    parts = path[:-3].split("/")
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return ".".join(parts) if parts else None
+
+class PathIndex:
+    def __init__(self, file_index: Optional[Mapping[str, str]] = None):
+        self._lock = threading.RLock()
+        self._paths: Set[str] = set()
+        # Trie över omvända sökvägskomponenter, varje nod har "" -> mängd sökvägar
+        self._trie: Dict[str, dict] = {}
+        self._modules: Dict[str, str] = {}
+        self._postings: Dict[str, Set[str]] = defaultdict(set)
+        self._file_tokens: Dict[str, Set[str]] = {}
+        self._vocabulary: List[str] = []
+        self._reversed_vocabulary: List[str] = []
+        # Trigram -> token i ordförrådet som innehåller det
+        self._gram_tokens: Dict[str, Set[str]] = defaultdict(set)
+        if file_index is not None:
+            self.build(file_index)
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def build(self, file_index: Mapping[str, str]):
+        """Bygger om hela indexet från ett file_index."""
+        with self._lock:
+            self._paths = set()
+            self._trie = {}
+            self._modules = {}
+            self._postings = defaultdict(set)
+            self._file_tokens = {}
+            for path, content in file_index.items():
+                self._add(path, content, incremental=False)
+            self._build_vocabulary()
+
+    def update(self, file_index: Mapping[str, str], changed: Iterable[str], removed: Iterable[str]):
+        """Uppdaterar indexet för enskilda filer (se GitAgent.add_index_listener)."""
+        with self._lock:
+            for path in removed:
+                self._remove(path)
+            for path in changed:
+                self._remove(path)
+                content = file_index.get(path)
+                if content is not None:
+                    self._add(path, content)
+
+    def _add(self, path: str, content: str, incremental: bool = True):
+        self._paths.add(path)
+        node = self._trie
+        for part in reversed(path.split("/")):
+            node = node.setdefault(part, {})
+            node.setdefault("", set()).add(path)
+
+        name = module_name(path)
+        if name:
+            self._modules[name] = path
+
+        tokens = set(tokenize(content))
+        self._file_tokens[path] = tokens
+        for token in tokens:
+            postings = self._postings[token]
+            if incremental and not postings:
+                self._add_token(token)
+            postings.add(path)
+
+    def _remove(self, path: str):
+        if path not in self._paths:
+            return
+        self._paths.discard(path)
+        node = self._trie
+        for part in reversed(path.split("/")):
+            node = node.get(part)
+            if node is None:
+                break
+            node.get("", set()).discard(path)
+
+        name = module_name(path)
+        if name and self._modules.get(name) == path:
+            del self._modules[name]
+
+        for token in self._file_tokens.pop(path, ()):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.discard(path)
+                if not postings:
+                    del self._postings[token]
+                    self._remove_token(token)
+
+    def find_files(self, name: str) -> List[str]:
+        """Hittar filer vars sökväg slutar med name (hela komponenter).
+
+        Faller tillbaka på delsträngsmatchning mot sökvägarna om inget
+        suffix matchar, t.ex. för "embedding" utan filändelse.
+        """
+        name = name.strip().strip("/")
+        if not name:
+            return []
+        with self._lock:
+            node = self._trie
+            for part in reversed(name.split("/")):
+                node = node.get(part)
+                if node is None:
+                    break
+            matches = list(node.get("", ())) if node is not None else []
+            if not matches:
+                matches = [path for path in self._paths if name in path]
+        return sorted(matches, key=lambda path: (len(path), path))
+
+    def find_file(self, name: str) -> Optional[str]:
+        matches = self.find_files(name)
+        return matches[0] if matches else None
+
+    def resolve_module(self, module: str) -> Optional[str]:
+        """Löser upp ett importerat modulnamn till en sökväg i repot.
+
+        Absoluta namn slås upp direkt; annars matchas modulen som ett suffix
+        så att t.ex. "utils.embedding" hittar src/model/utils/embedding.py.
+        """
+        module = module.strip(".")
+        if not module:
+            return None
+        with self._lock:
+            if module in self._modules:
+                return self._modules[module]
+        base = module.replace(".", "/")
+        for candidate in (f"{base}.py", f"{base}/__init__.py"):
+            matches = self.find_files(candidate)
+            if matches:
+                return matches[0]
+        return None
+
+    def _build_vocabulary(self):
+        """Sorterar ordförrådet och bygger trigramkartan en gång för hela indexet (vid build)."""
+        self._vocabulary = sorted(self._postings)
+        self._reversed_vocabulary = sorted(token[::-1] for token in self._postings)
+        self._gram_tokens = defaultdict(set)
+        for token in self._postings:
+            for gram in grams(token):
+                self._gram_tokens[gram].add(token)
+
+    def _add_token(self, token: str):
+        """Lägger till ett nytt token i de sorterade listorna och trigramkartan."""
+        insort(self._vocabulary, token)
+        insort(self._reversed_vocabulary, token[::-1])
+        for gram in grams(token):
+            self._gram_tokens[gram].add(token)
+
+    def _remove_token(self, token: str):
+        for vocabulary, value in ((self._vocabulary, token), (self._reversed_vocabulary, token[::-1])):
+            position = bisect_left(vocabulary, value)
+            if position < len(vocabulary) and vocabulary[position] == value:
+                del vocabulary[position]
+        for gram in grams(token):
+            tokens = self._gram_tokens.get(gram)
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self._gram_tokens[gram]
+
+    def _containing(self, fragment: str) -> Iterable[str]:
+        """Token i ordförrådet som innehåller fragment.
+
+        Fragment på minst GRAM_SIZE tecken slås upp som snittet av sina
+        trigram, så bara token som delar alla trigram kontrolleras. Kortare
+        fragment jämförs mot hela ordförrådet.
+        """
+        if len(fragment) < GRAM_SIZE:
+            return (token for token in self._vocabulary if fragment in token)
+        sets = sorted((self._gram_tokens.get(gram, set()) for gram in grams(fragment)), key=len)
+        matches = set(sets[0]).intersection(*sets[1:])
+        return (token for token in matches if fragment in token)
+
+    def _with_prefix(self, prefix: str, vocabulary: List[str]) -> List[str]:
+        start = bisect_left(vocabulary, prefix)
+        end = start
+        while end < len(vocabulary) and vocabulary[end].startswith(prefix):
+            end += 1
+        return vocabulary[start:end]
+
+    def _postings_for(self, tokens: Iterable[str]) -> Set[str]:
+        paths: Set[str] = set()
+        for token in tokens:
+            paths |= self._postings.get(token, set())
+        return paths
+
+    def candidates(self, query: str) -> Optional[Set[str]]:
+        """Returnerar filer som kan innehålla query som delsträng, eller None om indexet inte kan avgöra.
+
+        Inre token i frågan måste finnas exakt, den första kan vara slutet
+        av ett token och den sista början av ett token.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        with self._lock:
+            if len(tokens) == 1:
+                return self._postings_for(self._containing(tokens[0]))
+
+            first = self._postings_for(
+                token[::-1] for token in self._with_prefix(tokens[0][::-1], self._reversed_vocabulary)
+            )
+            last = self._postings_for(self._with_prefix(tokens[-1], self._vocabulary))
+            result = first & last
+            for token in tokens[1:-1]:
+                result &= self._postings.get(token, set())
+            return result
+
+    def search(self, query: str, file_index: Mapping[str, str]) -> List[str]:
+        """Hittar filer där query förekommer i sökvägen eller innehållet (skiftlägesokänsligt)."""
+        query_lower = query.lower()
+        with self._lock:
+            matches = {path for path in self._paths if query_lower in path.lower()}
+            candidates = self.candidates(query_lower)
+        if candidates is None:
+            candidates = set(file_index)
+        for path in candidates - matches:
+            content = file_index.get(path)
+            if content is not None and query_lower in content.lower():
+                matches.add(path)
+        return sorted(matches)
@@ -0,0 +1,259 @@
+# src/model/utils/relevance.py
+"""Lokal relevansbedömning av cacheträffar.
+
+Tidigare frågade supervisorn språkmodellen YES/NO för varje cacheträff,
+vilket gjorde en träff nästan lika långsam som en miss. Här räknas i
+stället en poäng i [0, 1] fram lokalt från:
+
+- retrieval: likhetspoängen från sökningen (FAISS/BM25),
+- overlap: andel av frågans ord som finns i det cachade svaret,
+- cross_encoder: valfri lokal cross-encoder (RELEVANCE_CROSS_ENCODER=1).
+
+Poängen jämförs mot två trösklar. Över accept används svaret direkt,
+under reject görs en ny webbsökning och däremellan (det osäkra bandet)
+avgör språkmodellen. Varje bedömning loggas som en rad i en JSONL-fil;
+språkmodellens svar blir etiketter ("label") och trösklarna kalibreras
+från dem så att precisionen över accept (och under reject) når
+RELEVANCE_TARGET_PRECISION. En liten andel säkra beslut skickas ändå
+till språkmodellen (RELEVANCE_AUDIT_RATE) så att det finns etiketter
+även utanför bandet. Rader med etikett kan också läggas till från annat
+håll, t.ex. användarfeedback (läs in dem med calibrate(reload=True)).
+
+De senaste RELEVANCE_LOG_MAX_RECORDS bedömningarna hålls i minnet och
+kalibreringen räknar på dem, så loggfilen läses bara vid start. Filen
+skrivs om till samma antal rader när den blivit dubbelt så lång.
+Bedömning och loggning är synkrona; supervisorn kör dem i en tråd.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from src.model.utils.reranker import RERANK_BUDGET_MS, get_cross_encoder
+from src.model.vector_store.lexical_index import tokenize
+
+RELEVANCE_LOG_PATH = os.getenv("RELEVANCE_LOG_PATH", "data/relevance_log.jsonl")
+# Trösklar innan det finns tillräckligt många etiketter att kalibrera från
+RELEVANCE_ACCEPT = float(os.getenv("RELEVANCE_ACCEPT", "0.75"))
+RELEVANCE_REJECT = float(os.getenv("RELEVANCE_REJECT", "0.45"))
+RELEVANCE_TARGET_PRECISION = float(os.getenv("RELEVANCE_TARGET_PRECISION", "0.95"))
+RELEVANCE_MIN_SAMPLES = int(os.getenv("RELEVANCE_MIN_SAMPLES", "30"))
+# Kalibrera om efter så här många nya etiketter
+RELEVANCE_RECALIBRATE_EVERY = int(os.getenv("RELEVANCE_RECALIBRATE_EVERY", "20"))
+RELEVANCE_AUDIT_RATE = float(os.getenv("RELEVANCE_AUDIT_RATE", "0.02"))
+RELEVANCE_CROSS_ENCODER = os.getenv("RELEVANCE_CROSS_ENCODER", "0") == "1"
+RELEVANCE_LOG_MAX_RECORDS = int(os.getenv("RELEVANCE_LOG_MAX_RECORDS", "5000"))
+
+# Vikter för de delpoäng som finns; saknade delpoäng viktas bort
+FEATURE_WEIGHTS = {"retrieval": 0.6, "overlap": 0.4, "cross_encoder": 1.0}
+# Ord kortare än så (och, är, på ...) räknas inte i överlappet
+MIN_TOKEN_LENGTH = 3
+
+def lexical_overlap(query: str, content: str) -> Optional[float]:
+    """Andel av frågans ord (minst MIN_TOKEN_LENGTH tecken) som finns i content."""
+    terms = {term for term in tokenize(query) if len(term) >= MIN_TOKEN_LENGTH}
+    if not terms:
+        return None
+    words = set(tokenize(content))
+    return len(terms & words) / len(terms)
+
+def combine(features: Dict[str, Optional[float]]) -> float:
+    """Viktat medelvärde av de delpoäng som finns."""
+    present = [(FEATURE_WEIGHTS[name], value) for name, value in features.items() if value is not None]
+    total = sum(weight for weight, _ in present)
+    if not total:
+        return 0.0
+    return sum(weight * value for weight, value in present) / total
+
+def calibrate(
+    records: List[Dict],
+    target_precision: float = RELEVANCE_TARGET_PRECISION,
+    min_samples: int = RELEVANCE_MIN_SAMPLES,
+    defaults: Tuple[float, float] = (RELEVANCE_ACCEPT, RELEVANCE_REJECT)
+) -> Tuple[float, float]:
+    """Returnerar (accept, reject) kalibrerade från loggade etiketter.
+
+    accept är den lägsta poäng där andelen relevanta bland träffar med
+    minst den poängen når target_precision. reject är den högsta poäng där
+    andelen irrelevanta bland träffar under den når target_precision.
+    Med färre än min_samples etiketter (totalt, eller på en sida) används
+    standardvärdena.
+    """
+    accept, reject = defaults
+    labelled = sorted(
+        (float(r["score"]), bool(r["label"])) for r in records
+        if r.get("label") is not None and r.get("score") is not None
+    )
+    if len(labelled) < min_samples:
+        return accept, reject
+
+    # Minsta antal etiketter på respektive sida om en tröskel
+    min_side = max(5, min_samples // 6)
+    positives_from = [0] * (len(labelled) + 1)
+    for i in range(len(labelled) - 1, -1, -1):
+        positives_from[i] = positives_from[i + 1] + labelled[i][1]
+
+    for i, (score, _) in enumerate(labelled):
+        if i and labelled[i - 1][0] == score:
+            continue
+        above = len(labelled) - i
+        if above >= min_side and positives_from[i] / above >= target_precision:
+            accept = score
+            break
+
+    # i = antal etiketter under tröskeln labelled[i]; samma poäng delas aldrig upp
+    for i in range(len(labelled) - 1, 0, -1):
+        if labelled[i - 1][0] == labelled[i][0]:
+            continue
+        negatives_below = i - (positives_from[0] - positives_from[i])
+        if i >= min_side and negatives_below / i >= target_precision:
+            reject = labelled[i][0]
+            break
+
+    return accept, min(reject, accept)
+
+class RelevanceValidator:
+    def __init__(
+        self,
+        log_path: Optional[str] = RELEVANCE_LOG_PATH,
+        accept: float = RELEVANCE_ACCEPT,
+        reject: float = RELEVANCE_REJECT,
+        target_precision: float = RELEVANCE_TARGET_PRECISION,
+        min_samples: int = RELEVANCE_MIN_SAMPLES,
+        audit_rate: float = RELEVANCE_AUDIT_RATE,
+        cross_encoder=None,
+        max_records: int = RELEVANCE_LOG_MAX_RECORDS
+    ):
+        self.log_path = log_path
+        self.defaults = (accept, reject)
+        self.accept = accept
+        self.reject = reject
+        self.target_precision = target_precision
+        self.min_samples = min_samples
+        self.audit_rate = audit_rate
+        self.cross_encoder = cross_encoder
+        if cross_encoder is None and RELEVANCE_CROSS_ENCODER:
+            self.cross_encoder = get_cross_encoder()
+        self.debug = True
+        self._lock = threading.Lock()
+        self._new_labels = 0
+        self.max_records = max_records
+        self._records = deque(maxlen=max_records)
+        # Antal rader i loggfilen, för att veta när den ska skrivas om
+        self._log_lines = 0
+        self.calibrate(reload=True)
+
+    def log(self, message: str):
+        if self.debug:
+            print(f"[RelevanceValidator][DEBUG] {message}")
+
+    def features(self, query: str, result: dict) -> Dict[str, Optional[float]]:
+        content = str(result.get("content", ""))
+        score = result.get("score")
+        features = {
+            "retrieval": float(score) if score is not None else None,
+            "overlap": lexical_overlap(query, content),
+            "cross_encoder": None
+        }
+        encoder = self.cross_encoder
+        if encoder is not None:
+            if encoder.ready:
+                deadline = time.perf_counter() + RERANK_BUDGET_MS / 1000
+                features["cross_encoder"] = encoder.score(query, [content], deadline)[0]
+            else:
+                encoder.start_loading()
+        return features
+
+    def assess(self, query: str, result: dict) -> Dict:
+        """Bedömer en cacheträff. decision är accept, reject eller uncertain.
+
+        audit=True betyder att beslutet ändå ska bekräftas av språkmodellen.
+        """
+        features = self.features(query, result)
+        score = combine(features)
+        if score >= self.accept:
+            decision = "accept"
+        elif score < self.reject:
+            decision = "reject"
+        else:
+            decision = "uncertain"
+        audit = decision != "uncertain" and random.random() < self.audit_rate
+        return {"query": query, "score": score, "features": features, "decision": decision, "audit": audit}
+
+    def record(self, assessment: Dict, label: Optional[bool] = None):
+        """Loggar en bedömning, med etikett om språkmodellen tillfrågades."""
+        entry = dict(assessment, label=label, timestamp=datetime.utcnow().isoformat())
+        if not self.log_path:
+            return
+        try:
+            with self._lock:
+                os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                self._records.append(entry)
+                self._log_lines += 1
+                if self._log_lines >= 2 * self.max_records:
+                    self._compact_log()
+                if label is not None:
+                    self._new_labels += 1
+                recalibrate = self._new_labels >= RELEVANCE_RECALIBRATE_EVERY
+            if recalibrate:
+                self.calibrate()
+        except Exception as e:
+            self.log(f"Could not write relevance log: {str(e)}")
+
+    def _compact_log(self):
+        """Skriver om loggfilen med bara posterna i minnet. Anropas med låset taget."""
+        temporary = f"{self.log_path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            for record in self._records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(temporary, self.log_path)
+        self._log_lines = len(self._records)
+
+    def load_records(self) -> List[Dict]:
+        if not self.log_path or not os.path.exists(self.log_path):
+            return []
+        records = []
+        with open(self.log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+        return records
+
+    def calibrate(self, reload: bool = False) -> Tuple[float, float]:
+        """Sätter om trösklarna från posterna i minnet; reload läser först om loggfilen."""
+        if reload:
+            try:
+                records = self.load_records()
+            except Exception as e:
+                self.log(f"Could not read relevance log: {str(e)}")
+                records = []
+            with self._lock:
+                self._records = deque(records, maxlen=self.max_records)
+                self._log_lines = len(records)
+        with self._lock:
+            records = list(self._records)
+        accept, reject = calibrate(records, self.target_precision, self.min_samples, self.defaults)
+        with self._lock:
+            self.accept, self.reject = accept, reject
+            self._new_labels = 0
+        self.log(f"Thresholds: accept >= {accept:.3f}, reject < {reject:.3f} ({len(records)} logged)")
+        return accept, reject
+
+_validator = None
+_validator_lock = threading.Lock()
+
+def get_relevance_validator() -> RelevanceValidator:
+    global _validator
+    if _validator is None:
+        with _validator_lock:
+            if _validator is None:
+                _validator = RelevanceValidator()
+    return _validator
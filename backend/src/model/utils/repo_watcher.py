@@ -0,0 +1,155 @@
+# src/model/utils/repo_watcher.py
+"""Bevakar en lokal katalog och rapporterar ändrade filer i bakgrunden.
+
+Använder inotify/FSEvents via watchdog om paketet finns installerat, annars
+en pollande bevakning som jämför stat-information (se file_indexer.scan_tree).
+Ändringar samlas ihop under en kort debounce-period och rapporteras som en
+mängd relativa sökvägar till en callback.
+"""
+
+import os
+import threading
+from typing import Callable, Dict, Optional, Set, Tuple
+from src.model.utils.file_indexer import (
+    IGNORE_DIRS,
+    IGNORE_EXTENSIONS,
+    GitignoreMatcher,
+    load_gitignore_patterns,
+    scan_tree
+)
+
+# "auto" (watchdog om det finns, annars polling), "watchdog" eller "polling"
+WATCH_BACKEND = os.getenv("GIT_WATCH_BACKEND", "auto").lower()
+WATCH_INTERVAL = float(os.getenv("GIT_WATCH_INTERVAL", "2.0"))
+WATCH_DEBOUNCE = 0.5
+
+class RepoWatcher:
+    def __init__(
+        self,
+        root: str,
+        on_change: Callable[[Set[str]], None],
+        backend: str = WATCH_BACKEND,
+        interval: float = WATCH_INTERVAL,
+        debounce: float = WATCH_DEBOUNCE
+    ):
+        self.root = os.path.abspath(root)
+        self.on_change = on_change
+        self.backend = backend
+        self.interval = interval
+        self.debounce = debounce
+        self.debug = True
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+        self._changed = threading.Event()
+        self._stopped = threading.Event()
+        self._threads = []
+        self._observer = None
+
+    def log(self, message: str):
+        if self.debug:
+            print(f"[RepoWatcher][DEBUG] {message}")
+
+    def start(self) -> str:
+        """Startar bevakningen och returnerar vilken backend som används."""
+        backend = self.backend
+        if backend in ("auto", "watchdog"):
+            try:
+                self._start_watchdog()
+                backend = "watchdog"
+            except ImportError:
+                if backend == "watchdog":
+                    raise
+                backend = "polling"
+        if backend == "polling":
+            self._spawn(self._poll_loop)
+        self._spawn(self._dispatch_loop)
+        self.log(f"Watching {self.root} ({backend})")
+        return backend
+
+    def stop(self):
+        self._stopped.set()
+        self._changed.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _spawn(self, target):
+        thread = threading.Thread(target=target, name=f"RepoWatcher-{target.__name__}", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _relevant(self, rel_path: str) -> bool:
+        parts = rel_path.split("/")
+        return not any(part in IGNORE_DIRS for part in parts) and not rel_path.endswith(IGNORE_EXTENSIONS)
+
+    def notify(self, rel_paths: Set[str]):
+        """Lägger till ändrade sökvägar; de rapporteras efter debounce-perioden."""
+        rel_paths = {path for path in rel_paths if self._relevant(path)}
+        if not rel_paths:
+            return
+        with self._lock:
+            self._pending |= rel_paths
+        self._changed.set()
+
+    def _dispatch_loop(self):
+        while not self._stopped.is_set():
+            self._changed.wait()
+            if self._stopped.is_set():
+                return
+            # Vänta in fler händelser, t.ex. när en editor sparar flera filer
+            self._stopped.wait(self.debounce)
+            with self._lock:
+                paths, self._pending = self._pending, set()
+                self._changed.clear()
+            if not paths:
+                continue
+            self.log(f"{len(paths)} changed paths")
+            try:
+                self.on_change(paths)
+            except Exception as e:
+                self.log(f"Change handler failed: {str(e)}")
+
+    def _snapshot(self) -> Dict[str, Tuple[int, int, int]]:
+        matcher = GitignoreMatcher(load_gitignore_patterns(self.root))
+        return scan_tree(self.root, matcher)
+
+    def _poll_loop(self):
+        previous = self._snapshot()
+        while not self._stopped.wait(self.interval):
+            current = self._snapshot()
+            changed = {path for path, stat in current.items() if previous.get(path) != stat}
+            changed |= set(previous) - set(current)
+            previous = current
+            if changed:
+                self.notify(changed)
+
+    def _start_watchdog(self):
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.event_type in ("opened", "closed", "closed_no_write"):
+                    return
+                paths = {event.src_path, getattr(event, "dest_path", "") or ""}
+                watcher.notify({
+                    os.path.relpath(path, watcher.root).replace(os.sep, "/")
+                    for path in paths if path
+                })
+
+        self._observer = Observer()
+        self._observer.schedule(Handler(), self.root, recursive=True)
+        self._observer.start()
+
+def create_repo_watcher(root: str, on_change: Callable[[Set[str]], None]) -> Optional[RepoWatcher]:
+    """Startar en watcher om GIT_WATCH=1, annars None."""
+    if os.getenv("GIT_WATCH", "0") != "1":
+        return None
+    watcher = RepoWatcher(root, on_change)
+    watcher.start()
+    return watcher
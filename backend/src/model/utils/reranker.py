@@ -0,0 +1,230 @@
+# src/model/utils/reranker.py
+"""Omrankning av kandidaterna från den första sökningen.
+
+Den första sökningen (FAISS + BM25) hämtar ett tiotal kandidatchunks.
+Omrankningen väljer sedan de få chunks som bäst besvarar frågan, så att
+prompten får ett par relevanta stycken i stället för hela partitioner.
+
+Lägen (RERANK_MODE):
+- none: ingen omrankning, hela partitionen för bästa träffen används.
+- mmr: Maximal Marginal Relevance över förstastegets poäng. Straffar
+  kandidater som liknar redan valda, så att vi inte väljer tre nästan
+  identiska chunks.
+- cross-encoder: en liten cross-encoder på CPU poängsätter (fråga, chunk)-
+  par i batchar, därefter MMR på de nya poängen.
+
+Omrankningen har en tidsbudget (RERANK_BUDGET_MS). Kandidater som
+cross-encodern inte hann poängsätta behåller förstastegets ordning
+efter de poängsatta, och modellen laddas i bakgrunden första gången så
+att laddningstiden aldrig hamnar i en förfrågan; tills den är klar
+används MMR.
+"""
+
+import math
+import os
+import threading
+import time
+from typing import List, Optional, Sequence
+import numpy as np
+from src.model.vector_store.lexical_index import tokenize
+
+RERANK_MODES = ("none", "mmr", "cross-encoder")
+RERANK_MODE = os.getenv("RERANK_MODE", "none")
+# Antal chunks som skickas vidare efter omrankningen
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "3"))
+# Antal kandidater som hämtas från den första sökningen
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))
+# 1.0 = bara relevans, lägre värden ger mer spridning mellan valda chunks
+RERANK_MMR_LAMBDA = float(os.getenv("RERANK_MMR_LAMBDA", "0.7"))
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "8"))
+RERANK_MAX_LENGTH = int(os.getenv("RERANK_MAX_LENGTH", "256"))
+
+def _relevance(candidate: dict) -> float:
+    return float(candidate.get("score", candidate.get("distance", 0.0)))
+
+def _similarity_matrix(candidates: Sequence[dict]) -> np.ndarray:
+    """Likhet mellan kandidaterna: cosinus om alla har vektorer, annars Jaccard på orden."""
+    vectors = [candidate.get("vector") for candidate in candidates]
+    if all(vector is not None for vector in vectors):
+        matrix = np.array(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms > 0, norms, 1.0)
+        return matrix @ matrix.T
+
+    tokens = [set(tokenize(candidate.get("content", ""))) for candidate in candidates]
+    size = len(tokens)
+    matrix = np.eye(size, dtype=np.float32)
+    for i in range(size):
+        for j in range(i + 1, size):
+            union = len(tokens[i] | tokens[j])
+            matrix[i, j] = matrix[j, i] = len(tokens[i] & tokens[j]) / union if union else 0.0
+    return matrix
+
+def mmr(candidates: Sequence[dict], relevance: Sequence[float], top_n: int, mmr_lambda: float = 0.7) -> List[int]:
+    """Väljer top_n index med Maximal Marginal Relevance.
+
+    score = lambda * relevans - (1 - lambda) * max likhet med redan valda
+    """
+    if not candidates:
+        return []
+    relevance = np.asarray(relevance, dtype=np.float32)
+    similarity = _similarity_matrix(candidates)
+    selected: List[int] = []
+    remaining = list(range(len(candidates)))
+    while remaining and len(selected) < top_n:
+        if selected:
+            redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+        else:
+            redundancy = np.zeros(len(remaining), dtype=np.float32)
+        scores = mmr_lambda * relevance[remaining] - (1 - mmr_lambda) * redundancy
+        best = remaining[int(np.argmax(scores))]
+        selected.append(best)
+        remaining.remove(best)
+    return selected
+
+class CrossEncoder:
+    """En cross-encoder från Hugging Face som körs på CPU."""
+
+    def __init__(self, model_name: str = RERANK_MODEL, batch_size: int = RERANK_BATCH_SIZE,
+                 max_length: int = RERANK_MAX_LENGTH):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.tokenizer = None
+        self.model = None
+        self.failed = False
+        self._loader = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.model is not None
+
+    def load(self):
+        """Laddar modellen synkront."""
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
+        model.eval()
+        self.tokenizer = tokenizer
+        self.model = model
+        print(f"[Reranker][DEBUG] Cross-encoder {self.model_name} laddad")
+
+    def _load_safely(self):
+        try:
+            self.load()
+        except Exception as e:
+            self.failed = True
+            print(f"[Reranker][ERROR] Kunde inte ladda cross-encoder {self.model_name}: {str(e)}")
+
+    def start_loading(self):
+        """Startar laddningen i en bakgrundstråd (högst en gång)."""
+        with self._lock:
+            if self.ready or self.failed or self._loader is not None:
+                return
+            self._loader = threading.Thread(target=self._load_safely, name="reranker-loader", daemon=True)
+            self._loader.start()
+
+    def score(self, query: str, texts: Sequence[str], deadline: Optional[float] = None) -> List[Optional[float]]:
+        """Poäng i [0, 1] per text, i batchar. Texter som inte hanns med före deadline får None."""
+        import torch
+        scores: List[Optional[float]] = [None] * len(texts)
+        for start in range(0, len(texts), self.batch_size):
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            batch = list(texts[start:start + self.batch_size])
+            inputs = self.tokenizer(
+                [query] * len(batch),
+                batch,
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="pt"
+            )
+            with torch.no_grad():
+                logits = self.model(**inputs).logits
+            # Modeller med en utgång ger relevans-logit, annars används sista klassen
+            values = logits[:, 0] if logits.shape[-1] == 1 else logits[:, -1]
+            for offset, value in enumerate(values.tolist()):
+                scores[start + offset] = 1.0 / (1.0 + math.exp(-value))
+        return scores
+
+class Reranker:
+    def __init__(
+        self,
+        mode: str = RERANK_MODE,
+        top_n: int = RERANK_TOP_N,
+        budget_ms: float = RERANK_BUDGET_MS,
+        mmr_lambda: float = RERANK_MMR_LAMBDA,
+        cross_encoder: Optional[CrossEncoder] = None
+    ):
+        if mode not in RERANK_MODES:
+            raise ValueError(f"Okänt RERANK_MODE '{mode}', förväntade något av {RERANK_MODES}")
+        self.mode = mode
+        self.top_n = top_n
+        self.budget_ms = budget_ms
+        self.mmr_lambda = mmr_lambda
+        self.cross_encoder = cross_encoder
+        if mode == "cross-encoder" and self.cross_encoder is None:
+            self.cross_encoder = get_cross_encoder()
+        self.debug = True
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "none"
+
+    def rerank(self, query: str, candidates: Sequence[dict]) -> List[dict]:
+        """Returnerar högst top_n kandidater i ny ordning, med "rerank_score" satt."""
+        candidates = list(candidates)
+        if not self.enabled or len(candidates) <= 1:
+            return candidates[:self.top_n]
+
+        start = time.perf_counter()
+        deadline = start + self.budget_ms / 1000
+        relevance = [_relevance(candidate) for candidate in candidates]
+        method = "mmr"
+
+        encoder = self.cross_encoder
+        if self.mode == "cross-encoder" and encoder is not None:
+            if encoder.ready:
+                scores = encoder.score(query, [c.get("content", "") for c in candidates], deadline)
+                scored = [i for i, value in enumerate(scores) if value is not None]
+                if scored:
+                    method = "cross-encoder"
+                    # Ej poängsatta hamnar efter de poängsatta men behåller inbördes ordning
+                    floor = min(scores[i] for i in scored)
+                    relevance = [
+                        value if value is not None else floor * (1 - (i + 1) / (len(candidates) + 1))
+                        for i, value in enumerate(scores)
+                    ]
+            else:
+                encoder.start_loading()
+
+        selected = mmr(candidates, relevance, self.top_n, self.mmr_lambda)
+        if self.debug:
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"[Reranker][DEBUG] {method}: {len(selected)} av {len(candidates)} kandidater på {elapsed:.1f} ms")
+        return [dict(candidates[i], rerank_score=float(relevance[i])) for i in selected]
+
+_reranker = None
+_cross_encoder = None
+_reranker_lock = threading.RLock()
+
+def get_cross_encoder() -> CrossEncoder:
+    """Delad cross-encoder, så att modellen bara laddas en gång i processen."""
+    global _cross_encoder
+    if _cross_encoder is None:
+        with _reranker_lock:
+            if _cross_encoder is None:
+                _cross_encoder = CrossEncoder()
+    return _cross_encoder
+
+def get_reranker() -> Reranker:
+    global _reranker
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                _reranker = Reranker()
+    return _reranker
@@ -0,0 +1,206 @@
+# src/model/utils/symbol_table.py
+"""Symboltabell över de Python-filer som finns i file_index.
+
+Varje fil parsas med ast en gång per innehåll (blob-SHA). Resultatet –
+klasser, funktioner, metoder med radintervall, imports och anrop – sparas
+som härledd information i samma FileStore som filindexet, så att en
+omstart bara läser in tabellerna och en ändrad fil bara parsas om.
+"""
+
+import ast
+import json
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+from src.model.utils.file_store import FileStore, git_blob_sha
+
+SYMBOLS_KIND = "symbols:v1"
+
+def _called_name(node: ast.Call) -> Optional[str]:
+    if isinstance(node.func, ast.Name):
+        return node.func.id
+    if isinstance(node.func, ast.Attribute):
+        return node.func.attr
+    return None
+
+def _calls(node: ast.AST) -> List[str]:
+    names = []
+    for child in ast.walk(node):
+        if isinstance(child, ast.Call):
+            name = _called_name(child)
+            if name and name not in names:
+                names.append(name)
+    return names
+
+def parse_symbols(content: str) -> dict:
+    """Parsar en Python-fil och returnerar dess symboler, imports och anrop.
+
+    Returns:
+        {"symbols": [{"name", "qualname", "kind", "lineno", "end_lineno", "calls"}],
+         "imports": [modulnamn], "error": None eller felmeddelande}
+    """
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError) as e:
+        return {"symbols": [], "imports": [], "error": str(e)}
+
+    symbols = []
+
+    def visit(node: ast.AST, prefix: str, in_class: bool):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.ClassDef):
+                qualname = f"{prefix}{child.name}"
+                symbols.append({
+                    "name": child.name,
+                    "qualname": qualname,
+                    "kind": "class",
+                    "lineno": child.lineno,
+                    "end_lineno": getattr(child, "end_lineno", child.lineno),
+                    "calls": []
+                })
+                visit(child, qualname + ".", True)
+            elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                qualname = f"{prefix}{child.name}"
+                symbols.append({
+                    "name": child.name,
+                    "qualname": qualname,
+                    "kind": "method" if in_class else "function",
+                    "lineno": child.lineno,
+                    "end_lineno": getattr(child, "end_lineno", child.lineno),
+                    "calls": _calls(child)
+                })
+                visit(child, qualname + ".", False)
+            else:
+                visit(child, prefix, in_class)
+
+    visit(tree, "", False)
+
+    imports = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            imports.append("." * node.level + (node.module or ""))
+
+    return {"symbols": symbols, "imports": imports, "error": None}
+
+def _discard_path(index: Dict[str, list], key: str, path: str):
+    entries = [entry for entry in index.get(key, []) if entry[0] != path]
+    if entries:
+        index[key] = entries
+    else:
+        index.pop(key, None)
+
+class SymbolTable:
+    def __init__(self, store: Optional[FileStore] = None):
+        self.store = store
+        self._lock = threading.RLock()
+        self._files: Dict[str, dict] = {}
+        self._by_name: Dict[str, List[Tuple[str, dict]]] = defaultdict(list)
+        # Anropsgraf baklänges: anropat namn -> (path, qualname) för anroparna
+        self._callers: Dict[str, List[Tuple[str, str]]] = defaultdict(list)
+        # Tabeller som redan parsats i den här processen, per blob-SHA
+        self._cache: Dict[str, dict] = {}
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def _shas_for(self, file_index: Mapping[str, str], shas: Mapping[str, str], paths: Iterable[str]) -> Dict[str, str]:
+        """path -> blob-SHA för Python-filerna bland paths."""
+        result = {}
+        for path in paths:
+            if not path.endswith(".py") or path not in file_index:
+                continue
+            sha = shas.get(path)
+            result[path] = sha or git_blob_sha(file_index[path].encode("utf-8"))
+        return result
+
+    def _tables_for(self, file_index: Mapping[str, str], path_shas: Dict[str, str]) -> Dict[str, dict]:
+        """Hämtar symboltabeller från cache eller store; bara okända blobbar läses och parsas."""
+        missing = {sha for sha in path_shas.values() if sha not in self._cache}
+        if missing and self.store is not None:
+            for sha, data in self.store.get_derived(SYMBOLS_KIND, missing).items():
+                self._cache[sha] = json.loads(data)
+
+        parsed = {}
+        for path, sha in path_shas.items():
+            if sha not in self._cache:
+                self._cache[sha] = parse_symbols(file_index[path])
+                parsed[sha] = json.dumps(self._cache[sha])
+        if parsed and self.store is not None:
+            self.store.put_derived(SYMBOLS_KIND, parsed)
+        return {path: self._cache[sha] for path, sha in path_shas.items()}
+
+    def build(self, file_index: Mapping[str, str], shas: Optional[Mapping[str, str]] = None):
+        """Bygger tabellen för alla Python-filer i file_index."""
+        with self._lock:
+            self._files = {}
+            self._by_name = defaultdict(list)
+            self._callers = defaultdict(list)
+            self._set(self._tables_for(file_index, self._shas_for(file_index, shas or {}, list(file_index))))
+
+    def update(self, file_index: Mapping[str, str], shas: Optional[Mapping[str, str]],
+               changed: Iterable[str], removed: Iterable[str]):
+        """Uppdaterar tabellen för enskilda filer (se GitAgent.add_index_listener)."""
+        changed = list(changed)
+        with self._lock:
+            for path in list(removed) + changed:
+                self._unset(path)
+            self._set(self._tables_for(file_index, self._shas_for(file_index, shas or {}, changed)))
+
+    def _set(self, tables: Dict[str, dict]):
+        for path, table in tables.items():
+            self._files[path] = table
+            for symbol in table["symbols"]:
+                self._by_name[symbol["name"]].append((path, symbol))
+                for called in symbol["calls"]:
+                    self._callers[called].append((path, symbol["qualname"]))
+
+    def _unset(self, path: str):
+        table = self._files.pop(path, None)
+        if table is None:
+            return
+        for symbol in table["symbols"]:
+            _discard_path(self._by_name, symbol["name"], path)
+            for called in symbol["calls"]:
+                _discard_path(self._callers, called, path)
+
+    def file_symbols(self, path: str) -> Optional[dict]:
+        return self._files.get(path)
+
+    def find(self, name: str, kinds: Iterable[str] = ("function", "method")) -> List[Tuple[str, dict]]:
+        """Returnerar (path, symbol) för alla symboler med namnet name (eller kvalificerat namn)."""
+        kinds = set(kinds)
+        short_name = name.rsplit(".", 1)[-1]
+        return [
+            (path, symbol) for path, symbol in self._by_name.get(short_name, [])
+            if symbol["kind"] in kinds and (name == short_name or symbol["qualname"] == name)
+        ]
+
+    def functions(self) -> List[dict]:
+        """Alla funktioner och metoder i repot."""
+        with self._lock:
+            return [
+                {"name": symbol["name"], "path": path}
+                for path, table in self._files.items()
+                for symbol in table["symbols"] if symbol["kind"] != "class"
+            ]
+
+    def callers(self, name: str) -> List[Tuple[str, str]]:
+        """Returnerar (path, qualname) för funktioner som anropar name."""
+        with self._lock:
+            return list(self._callers.get(name, []))
+
+    def summary(self, path: str) -> Optional[str]:
+        """Kort sammanfattning av en fils klasser och funktioner, eller None om filen saknas."""
+        table = self._files.get(path)
+        if table is None:
+            return None
+        classes = [symbol["name"] for symbol in table["symbols"] if symbol["kind"] == "class"]
+        functions = [symbol["name"] for symbol in table["symbols"] if symbol["kind"] != "class"]
+        summary = []
+        if classes:
+            summary.append(f"Klasser: {', '.join(classes)}")
+        if functions:
+            summary.append(f"Funktioner: {', '.join(functions)}")
+        return " | ".join(summary) if summary else "Inga klasser eller funktioner hittades"
@@ -0,0 +1,244 @@
+import base64
+import json
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Mapping, Optional
+import numpy as np
+from src.model.utils.file_store import FileStore, git_blob_sha
+from src.model.utils.symbol_table import SymbolTable
+from src.model.vector_store.vector_store import IndexGeneration, create_faiss_index, normalize_embedding
+
+CODE_CHUNKS_KIND = "code_chunks:v1"
+CODE_CHUNK_LINES = int(os.getenv("CODE_CHUNK_LINES", "60"))
+CODE_SEARCH_EXTENSIONS = tuple(
+    os.getenv(
+        "CODE_SEARCH_EXTENSIONS",
+        ".py,.js,.jsx,.ts,.tsx,.md,.html,.css,.sh,.yml,.yaml,.toml,.cfg,.ini"
+    ).split(",")
+)
+
+def _windows(start: int, end: int, symbol: str, kind: str, max_lines: int) -> List[dict]:
+    """Splits the line range [start, end] into chunks of at most max_lines lines."""
+    return [
+        {"symbol": symbol, "kind": kind, "start": line, "end": min(line + max_lines - 1, end)}
+        for line in range(start, end + 1, max_lines)
+    ]
+
+def chunk_file(content: str, table: Optional[dict] = None, max_lines: int = CODE_CHUNK_LINES) -> List[dict]:
+    """Splits a file into chunks along symbol boundaries.
+
+    Top-level functions and classes become one chunk each. Classes that are
+    longer than max_lines are split into a header chunk plus one chunk per
+    method. Module-level code between the symbols is grouped into
+    "<module>" chunks, and files without a symbol table (non-Python files
+    or syntax errors) are cut into fixed line windows. Line numbers are
+    1-based and inclusive.
+    """
+    lines = content.splitlines()
+    if not lines:
+        return []
+
+    symbols = (table or {}).get("symbols") or []
+    top_level = [symbol for symbol in symbols if "." not in symbol["qualname"]]
+    chunks = []
+    covered = [False] * (len(lines) + 1)
+
+    for symbol in top_level:
+        start, end = symbol["lineno"], min(symbol["end_lineno"], len(lines))
+        for line in range(start, end + 1):
+            covered[line] = True
+
+        methods = [
+            child for child in symbols
+            if child["kind"] == "method" and child["qualname"] == f"{symbol['qualname']}.{child['name']}"
+        ]
+        if symbol["kind"] != "class" or end - start < max_lines or not methods:
+            chunks.extend(_windows(start, end, symbol["qualname"], symbol["kind"], max_lines))
+            continue
+
+        header_end = min(method["lineno"] for method in methods) - 1
+        if header_end >= start:
+            chunks.extend(_windows(start, header_end, symbol["qualname"], "class", max_lines))
+        for method in methods:
+            chunks.extend(_windows(
+                method["lineno"], min(method["end_lineno"], end), method["qualname"], "method", max_lines
+            ))
+
+    # Contiguous uncovered, non-blank code becomes module-level chunks
+    block_start = None
+    for line in range(1, len(lines) + 2):
+        open_line = line <= len(lines) and not covered[line] and lines[line - 1].strip()
+        if open_line and block_start is None:
+            block_start = line
+        elif not open_line and block_start is not None and (line > len(lines) or covered[line]):
+            block_end = line - 1
+            while not lines[block_end - 1].strip():
+                block_end -= 1
+            chunks.extend(_windows(block_start, block_end, "<module>", "module", max_lines))
+            block_start = None
+
+    return sorted(chunks, key=lambda chunk: chunk["start"])
+
+def chunk_text(content: str, chunk: dict) -> str:
+    lines = content.splitlines()
+    return "\n".join(lines[chunk["start"] - 1:chunk["end"]])
+
+def _encode_vectors(vectors: np.ndarray) -> str:
+    return base64.b64encode(np.ascontiguousarray(vectors, dtype=np.float32).tobytes()).decode("ascii")
+
+def _decode_vectors(data: str, rows: int) -> np.ndarray:
+    vectors = np.frombuffer(base64.b64decode(data), dtype=np.float32)
+    return vectors.reshape(rows, -1) if rows else np.zeros((0, 0), dtype=np.float32)
+
+class CodeIndex:
+    """A FAISS index over code chunks from the repository file index.
+
+    Every chunk is identified by (path, symbol, blob sha). Chunk ranges and
+    their embeddings are cached per blob sha, in memory and as derived data
+    in the FileStore next to the file index, so a restart or an update only
+    embeds blobs that have not been seen before. Searches read the current
+    generation once and never block on a rebuild.
+    """
+
+    def __init__(
+        self,
+        symbols: SymbolTable,
+        store: Optional[FileStore] = None,
+        embed: Optional[Callable[[List[str]], np.ndarray]] = None,
+        name: str = "code",
+        max_lines: int = CODE_CHUNK_LINES
+    ):
+        self.symbols = symbols
+        self.store = store
+        self.name = name
+        self.max_lines = max_lines
+        self._embed = embed
+        self._lock = threading.RLock()
+        # path -> (sha, chunks, vectors) for the files currently in the index
+        self._files: Dict[str, tuple] = {}
+        # sha -> (chunks, vectors) for the blobs in the current tree
+        self._cache: Dict[str, tuple] = {}
+        self._generation = IndexGeneration()
+        self.built = False
+
+    def __len__(self) -> int:
+        return len(self._generation.mapping)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if self._embed is None:
+            from src.model.utils.embedding_pool import embed_texts
+            self._embed = embed_texts
+        return np.asarray(self._embed(texts), dtype=np.float32)
+
+    @staticmethod
+    def indexable(path: str) -> bool:
+        return path.endswith(CODE_SEARCH_EXTENSIONS)
+
+    def _shas_for(self, file_index: Mapping[str, str], shas: Mapping[str, str], paths: Iterable[str]) -> Dict[str, str]:
+        result = {}
+        for path in paths:
+            if not self.indexable(path) or path not in file_index:
+                continue
+            result[path] = shas.get(path) or git_blob_sha(file_index[path].encode("utf-8"))
+        return result
+
+    def _entries_for(self, file_index: Mapping[str, str], path_shas: Dict[str, str]) -> Dict[str, tuple]:
+        """Returns path -> (sha, chunks, vectors), embedding only blobs missing from cache and store."""
+        missing = {sha for sha in path_shas.values() if sha not in self._cache}
+        if missing and self.store is not None:
+            for sha, data in self.store.get_derived(CODE_CHUNKS_KIND, missing).items():
+                entry = json.loads(data)
+                self._cache[sha] = (entry["chunks"], _decode_vectors(entry["vectors"], len(entry["chunks"])))
+
+        pending = {}
+        for path, sha in path_shas.items():
+            if sha in self._cache or sha in pending:
+                continue
+            content = file_index[path]
+            chunks = chunk_file(content, self.symbols.file_symbols(path), self.max_lines)
+            texts = [f"{path} {chunk['symbol']}\n{chunk_text(content, chunk)}" for chunk in chunks]
+            pending[sha] = (chunks, texts)
+
+        if pending:
+            # One batched embedding call for every new chunk in the update
+            texts = [text for _, chunk_texts in pending.values() for text in chunk_texts]
+            print(f"[CodeIndex:{self.name}] Embedding {len(texts)} chunks from {len(pending)} blobs")
+            vectors = self.embed(texts) if texts else np.zeros((0, 0), dtype=np.float32)
+            offset = 0
+            derived = {}
+            for sha, (chunks, chunk_texts) in pending.items():
+                blob_vectors = vectors[offset:offset + len(chunk_texts)]
+                offset += len(chunk_texts)
+                self._cache[sha] = (chunks, blob_vectors)
+                derived[sha] = json.dumps({"chunks": chunks, "vectors": _encode_vectors(blob_vectors)})
+            if self.store is not None:
+                self.store.put_derived(CODE_CHUNKS_KIND, derived)
+
+        return {path: (sha, *self._cache[sha]) for path, sha in path_shas.items()}
+
+    def _prune_cache(self):
+        """Drops cached blobs that no file in the index points to any more."""
+        live = {sha for sha, _, _ in self._files.values()}
+        self._cache = {sha: entry for sha, entry in self._cache.items() if sha in live}
+
+    def _rebuild(self):
+        vectors = []
+        mapping = {}
+        for path, (sha, chunks, blob_vectors) in sorted(self._files.items()):
+            for chunk, vector in zip(chunks, blob_vectors):
+                mapping[len(vectors)] = dict(chunk, path=path, sha=sha)
+                vectors.append(normalize_embedding(vector))
+
+        number = self._generation.number + 1
+        if not vectors:
+            self._generation = IndexGeneration(None, {}, number)
+            return
+        index = create_faiss_index(len(vectors[0]), "flat")
+        index.add(np.array(vectors))
+        self._generation = IndexGeneration(index, mapping, number)
+
+    def build(self, file_index: Mapping[str, str], shas: Optional[Mapping[str, str]] = None):
+        """Indexes every searchable file in file_index."""
+        with self._lock:
+            self._files = self._entries_for(file_index, self._shas_for(file_index, shas or {}, list(file_index)))
+            self._prune_cache()
+            self._rebuild()
+            self.built = True
+        print(f"[CodeIndex:{self.name}] Indexed {len(self)} chunks from {len(self._files)} files")
+
+    def update(self, file_index: Mapping[str, str], shas: Optional[Mapping[str, str]],
+               changed: Iterable[str], removed: Iterable[str]):
+        """Re-embeds changed files (see GitAgent.add_index_listener). A no-op until build() has run."""
+        changed = list(changed)
+        with self._lock:
+            if not self.built:
+                return
+            for path in list(removed) + changed:
+                self._files.pop(path, None)
+            self._files.update(self._entries_for(file_index, self._shas_for(file_index, shas or {}, changed)))
+            self._prune_cache()
+            self._rebuild()
+
+    def search(self, query: str, top_k: int = 5, threshold: float = 0.0,
+               file_index: Optional[Mapping[str, str]] = None) -> List[dict]:
+        """Returns the chunks closest to query, best first.
+
+        Each hit has path, symbol, kind, start, end, sha and score, plus the
+        chunk's code under "content" when file_index is given.
+        """
+        generation = self._generation
+        if not generation.index:
+            return []
+
+        query_vector = normalize_embedding(self.embed([query])[0])
+        distances, indices = generation.index.search(np.array([query_vector]), top_k)
+
+        hits = []
+        for idx, score in zip(indices[0], distances[0]):
+            if idx == -1 or score < threshold:
+                continue
+            hit = dict(generation.mapping[idx], score=float(score))
+            if file_index is not None and hit["path"] in file_index:
+                hit["content"] = chunk_text(file_index[hit["path"]], hit)
+            hits.append(hit)
+        return hits
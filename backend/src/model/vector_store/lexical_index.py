@@ -0,0 +1,144 @@
+import copy
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Hashable, Iterable, List, Sequence, Set
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens. Keeps digits and underscores, so error codes and identifiers survive."""
+    return TOKEN_PATTERN.findall(text.casefold())
+
+class LexicalIndex:
+    """An in-memory inverted index with BM25 scoring.
+
+    Complements the FAISS shards for keyword-heavy queries (product names,
+    error codes) where dense similarity is weak. Indexes are immutable once
+    built: extended() returns a new index with more documents that shares
+    the posting arrays of unchanged terms, so the sharded store can swap it
+    in without rebuilding from MongoDB.
+    """
+
+    def __init__(self, documents: Iterable[dict] = (), k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents: List[dict] = []
+        self.doc_ids: Set[str] = set()
+        self.lengths = np.zeros(0, dtype=np.float32)
+        self.avg_length = 0.0
+        self.postings: Dict[str, tuple] = {}
+        self._append(documents)
+
+    def _append(self, documents: Iterable[dict]):
+        postings = defaultdict(lambda: ([], []))
+        lengths = []
+
+        for doc in documents:
+            doc_id = str(doc["_id"]) if "_id" in doc else None
+            if doc_id is not None and doc_id in self.doc_ids:
+                continue
+            text = doc.get("chunk") or doc.get("content") or ""
+            # The query a chunk was saved under is part of what it is about
+            counts = Counter(tokenize(f"{doc.get('query', '')} {text}"))
+            if not counts:
+                continue
+            position = len(self.documents)
+            metadata = dict(doc.get("metadata") or {})
+            for key in ("partition_id", "chunk_index"):
+                if key in doc:
+                    metadata.setdefault(key, doc[key])
+            self.documents.append({
+                "query": doc.get("query", ""),
+                "content": text,
+                "metadata": metadata,
+                "doc_id": doc_id
+            })
+            if doc_id is not None:
+                self.doc_ids.add(doc_id)
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                ids, tfs = postings[term]
+                ids.append(position)
+                tfs.append(tf)
+
+        if not lengths:
+            return
+        self.lengths = np.concatenate([self.lengths, np.array(lengths, dtype=np.float32)])
+        self.avg_length = float(self.lengths.mean())
+        for term, (ids, tfs) in postings.items():
+            ids, tfs = np.array(ids, dtype=np.int64), np.array(tfs, dtype=np.float32)
+            existing = self.postings.get(term)
+            if existing is not None:
+                ids, tfs = np.concatenate([existing[0], ids]), np.concatenate([existing[1], tfs])
+            self.postings[term] = (ids, tfs)
+
+    def extended(self, documents: Iterable[dict]) -> "LexicalIndex":
+        """Returns a new index with documents added. Documents already indexed (by _id) are skipped."""
+        index = copy.copy(self)
+        index.documents = list(self.documents)
+        index.doc_ids = set(self.doc_ids)
+        index.postings = dict(self.postings)
+        index._append(documents)
+        return index
+
+    def idf(self, term: str) -> float:
+        """BM25 idf; terms that occur nowhere get the highest possible value."""
+        postings = self.postings.get(term)
+        frequency = len(postings[0]) if postings is not None else 0
+        return math.log(1 + (len(self.documents) - frequency + 0.5) / (frequency + 0.5))
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def search(self, query: str, top_k: int = 10) -> List[dict]:
+        """Returns the best matching documents with their BM25 score and query coverage.
+
+        coverage is the idf-weighted share of the query terms that occur in
+        the document, in [0, 1]. Unlike the raw BM25 score it is comparable
+        between queries, so callers can use it as a match threshold.
+        """
+        terms = [term for term in dict.fromkeys(tokenize(query))]
+        known = [term for term in terms if term in self.postings]
+        if not known or not self.documents:
+            return []
+
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        matched = np.zeros(len(self.documents), dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * self.lengths / (self.avg_length or 1.0))
+        for term in known:
+            ids, tfs = self.postings[term]
+            idf = self.idf(term)
+            scores[ids] += idf * tfs * (self.k1 + 1) / (tfs + norm[ids])
+            matched[ids] += idf
+
+        # Unknown terms count as missing, with the highest possible idf
+        total_idf = sum(self.idf(term) for term in terms)
+
+        top_k = min(top_k, int(np.count_nonzero(scores)))
+        if top_k <= 0:
+            return []
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [
+            dict(self.documents[i], score=float(scores[i]), coverage=float(matched[i] / total_idf))
+            for i in best
+        ]
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Hashable]],
+    weights: Sequence[float] = None,
+    k: int = 60
+) -> Dict[Hashable, float]:
+    """Fuses ranked lists of keys: score(key) = sum(weight / (k + rank)).
+
+    RRF only looks at positions, so BM25 scores and cosine similarities can
+    be combined without normalizing them against each other.
+    """
+    weights = weights or [1.0] * len(rankings)
+    fused: Dict[Hashable, float] = defaultdict(float)
+    for ranking, weight in zip(rankings, weights):
+        for rank, key in enumerate(ranking, start=1):
+            fused[key] += weight / (k + rank)
+    return dict(fused)
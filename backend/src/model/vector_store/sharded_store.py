@@ -0,0 +1,267 @@
+import heapq
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pymongo.collection import Collection
+from src.model.vector_store.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from src.model.vector_store.vector_store import VectorStore, document_id
+
+RESEARCH_SHARD = "research"
+DOCUMENTS_SHARD = "documents"
+CODE_SHARD_PREFIX = "code:"
+
+# Shards built from the research_cache collection
+DEFAULT_SHARDS = {
+    RESEARCH_SHARD: {
+        "query_filter": {"metadata.document_type": {"$ne": "uploaded_file"}},
+        "index_type": "flat"
+    },
+    DOCUMENTS_SHARD: {
+        "query_filter": {"metadata.document_type": "uploaded_file"},
+        "index_type": "flat"
+    }
+}
+
+KNOWLEDGE_SHARDS = (RESEARCH_SHARD, DOCUMENTS_SHARD)
+
+def code_shard_name(repo: str) -> str:
+    """Returns the shard name used for code chunks from a repository."""
+    return f"{CODE_SHARD_PREFIX}{repo}"
+
+class ShardedVectorStore:
+    """Manages one VectorStore per knowledge source.
+
+    Every shard has its own FAISS index, index type and snapshot, so a
+    source can be rebuilt without touching the others. Searches fan out
+    to the selected shards concurrently and the hits are merged with a
+    top-k heap. Each shard also gets a BM25 index over the same documents,
+    built on first use, extended with new entries in the background and
+    rebuilt when the shard is reindexed, which hybrid_search fuses with
+    the dense hits. Like the FAISS generations, a BM25 index is replaced
+    as a whole, so searches keep using the previous one meanwhile.
+    """
+
+    def __init__(
+        self,
+        mongo_collection: Collection,
+        shard_configs: dict = None,
+        snapshot_dir: str = None,
+        max_workers: int = 4
+    ):
+        self.mongo_collection = mongo_collection
+        self.snapshot_dir = snapshot_dir
+        self.shards: dict[str, VectorStore] = {}
+        self._lexical: dict[str, LexicalIndex] = {}
+        self._lexical_lock = threading.Lock()
+        # Pending background extensions of the BM25 indexes
+        self._lexical_updates = set()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="vector-shard")
+
+        for name, config in (shard_configs or DEFAULT_SHARDS).items():
+            self.add_shard(name, **config)
+
+    def _snapshot_path(self, name: str) -> str:
+        if not self.snapshot_dir:
+            return None
+        safe_name = name.replace(":", "_").replace("/", "_")
+        return os.path.join(self.snapshot_dir, f"{safe_name}.faiss")
+
+    def add_shard(
+        self,
+        name: str,
+        mongo_collection: Collection = None,
+        query_filter: dict = None,
+        index_type: str = "flat"
+    ) -> VectorStore:
+        """Registers (or replaces) a shard and builds its index."""
+        shard = VectorStore(
+            mongo_collection if mongo_collection is not None else self.mongo_collection,
+            query_filter=query_filter,
+            index_type=index_type,
+            snapshot_path=self._snapshot_path(name),
+            name=name
+        )
+        self.shards[name] = shard
+        self._lexical.pop(name, None)
+        return shard
+
+    def get_shard(self, name: str) -> VectorStore:
+        if name not in self.shards:
+            raise KeyError(f"Unknown vector store shard '{name}'")
+        return self.shards[name]
+
+    def shard_for(self, metadata: dict = None) -> str:
+        """Picks the shard an entry belongs to based on its metadata."""
+        metadata = metadata or {}
+        if metadata.get("shard"):
+            return metadata["shard"]
+        if metadata.get("document_type") == "uploaded_file":
+            return DOCUMENTS_SHARD
+        return RESEARCH_SHARD
+
+    def add_entry(self, query: str, embedding: list[float], metadata: dict = None, shard: str = None,
+                  doc_id: str = None):
+        return self.add_entries([{"query": query, "embedding": embedding, "metadata": metadata, "doc_id": doc_id}], shard)
+
+    def add_entries(self, entries: list[dict], shard: str = None):
+        """Adds entries to one shard in a single index generation. Returns the write future."""
+        name = shard or self.shard_for(entries[0].get("metadata") if entries else None)
+        future = self.get_shard(name).add_entries(entries)
+        doc_ids = [entry["doc_id"] for entry in entries if entry.get("doc_id")]
+        if len(doc_ids) < len(entries):
+            # Entries without a MongoDB id can only be found by rebuilding
+            self._lexical.pop(name, None)
+        elif doc_ids:
+            update = self._executor.submit(self._extend_lexical, name, doc_ids)
+            self._lexical_updates.add(update)
+            update.add_done_callback(self._lexical_updates.discard)
+        return future
+
+    def flush(self):
+        """Blocks until every queued write and BM25 update has been applied."""
+        for shard in list(self.shards.values()):
+            shard.flush()
+        for update in list(self._lexical_updates):
+            update.result()
+
+    def _extend_lexical(self, name: str, doc_ids: list[str]):
+        """Adds saved documents to the shard's BM25 index and swaps in the new index."""
+        try:
+            with self._lexical_lock:
+                index = self._lexical.get(name)
+                if index is None:
+                    # Not built yet; the lazy build reads the documents from MongoDB
+                    return
+                shard = self.get_shard(name)
+                query = {**shard.document_filter, "_id": {"$in": [document_id(doc_id) for doc_id in doc_ids]}}
+                self._lexical[name] = index.extended(shard.mongo_collection.find(query))
+        except Exception as e:
+            print(f"[ShardedVectorStore] Error extending lexical index of shard {name}: {str(e)}")
+
+    def search(self, query_vector: list[float], top_k=5, threshold=0.7, shards=None, with_vectors=False) -> list[dict]:
+        names = list(shards) if shards else list(self.shards)
+        selected = [(name, self.shards[name]) for name in names if name in self.shards]
+        if not selected:
+            return []
+
+        if len(selected) == 1:
+            name, shard = selected[0]
+            return [dict(hit, shard=name) for hit in shard.search(query_vector, top_k, threshold, with_vectors)]
+
+        futures = [
+            (name, self._executor.submit(shard.search, query_vector, top_k, threshold, with_vectors))
+            for name, shard in selected
+        ]
+
+        hits = []
+        for name, future in futures:
+            try:
+                hits.extend(dict(hit, shard=name) for hit in future.result())
+            except Exception as e:
+                print(f"[ShardedVectorStore] Error searching shard {name}: {str(e)}")
+
+        return heapq.nlargest(top_k, hits, key=lambda hit: hit["distance"])
+
+    def reindex(self, shard: str = None):
+        """Rebuilds one shard, or every shard if none is given."""
+        names = [shard] if shard else list(self.shards)
+        for name in names:
+            shard = self.get_shard(name)
+            shard.reindex()
+            # Built before the swap, so searches use the old BM25 index until the new one is ready
+            index = LexicalIndex(shard.mongo_collection.find(shard.document_filter))
+            with self._lexical_lock:
+                self._lexical[name] = index
+
+    def lexical_index(self, name: str) -> LexicalIndex:
+        """Returns the shard's BM25 index, building it from MongoDB if needed."""
+        index = self._lexical.get(name)
+        if index is None:
+            with self._lexical_lock:
+                index = self._lexical.get(name)
+                if index is None:
+                    shard = self.get_shard(name)
+                    # Same documents as the FAISS index, so duplicates without embeddings are left out
+                    index = LexicalIndex(shard.mongo_collection.find(shard.document_filter))
+                    self._lexical[name] = index
+        return index
+
+    def lexical_search(self, query: str, top_k=10, shards=None) -> list[dict]:
+        names = [name for name in (list(shards) if shards else list(self.shards)) if name in self.shards]
+        hits = []
+        for name in names:
+            try:
+                hits.extend(dict(hit, shard=name) for hit in self.lexical_index(name).search(query, top_k))
+            except Exception as e:
+                print(f"[ShardedVectorStore] Error in lexical search of shard {name}: {str(e)}")
+        return heapq.nlargest(top_k, hits, key=lambda hit: hit["score"])
+
+    def hybrid_search(
+        self,
+        query: str,
+        query_vector: list[float],
+        top_k=5,
+        threshold=0.7,
+        shards=None,
+        dense_weight=1.0,
+        lexical_weight=1.0,
+        min_coverage=0.8,
+        candidates=10,
+        rrf_k=60,
+        with_vectors=False
+    ) -> list[dict]:
+        """Dense and BM25 retrieval run concurrently and fused with reciprocal rank fusion.
+
+        A hit qualifies if its cosine similarity reaches threshold or if it
+        contains at least min_coverage of the (idf-weighted) query terms.
+        Qualifying hits are ordered by their fused score. Each hit carries
+        "distance" (cosine, 0 if only found lexically), "coverage", "rrf"
+        and "score" = max(distance, coverage). with_vectors adds "vector" to
+        hits found by FAISS.
+        """
+        lexical_future = self._executor.submit(self.lexical_search, query, candidates, shards)
+        dense = self.search(query_vector, top_k=candidates, threshold=0.0, shards=shards, with_vectors=with_vectors)
+        try:
+            lexical = lexical_future.result()
+        except Exception as e:
+            print(f"[ShardedVectorStore] Lexical search failed: {str(e)}")
+            lexical = []
+
+        def key(hit):
+            metadata = hit.get("metadata") or {}
+            return hit.get("doc_id") or (hit["query"], metadata.get("partition_id"), metadata.get("chunk_index"))
+
+        hits = {}
+        for hit in dense:
+            hits.setdefault(key(hit), dict(hit, coverage=0.0))
+        for hit in lexical:
+            existing = hits.get(key(hit))
+            if existing is None:
+                hits[key(hit)] = dict(hit, distance=0.0)
+            else:
+                existing["coverage"] = hit["coverage"]
+                # Chunks stored without metadata get partition_id and chunk_index from the document
+                existing["metadata"] = {**hit["metadata"], **(existing.get("metadata") or {})}
+
+        fused = reciprocal_rank_fusion(
+            [[key(hit) for hit in dense], [key(hit) for hit in lexical]],
+            [dense_weight, lexical_weight],
+            rrf_k
+        )
+        results = []
+        for hit_key, hit in hits.items():
+            if hit["distance"] < threshold and hit["coverage"] < min_coverage:
+                continue
+            hit["rrf"] = fused.get(hit_key, 0.0)
+            hit["score"] = max(hit["distance"], hit["coverage"])
+            results.append(hit)
+        return heapq.nlargest(top_k, results, key=lambda hit: hit["rrf"])
+
+    def flush(self):
+        """Waits for all queued writes in every shard."""
+        for shard in self.shards.values():
+            shard.flush()
+
+    def save_snapshots(self):
+        for shard in self.shards.values():
+            shard.save_snapshot()
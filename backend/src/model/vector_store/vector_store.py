@@ -1,7 +1,16 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+from concurrent.futures import Future
 import faiss
 import numpy as np
+from bson import ObjectId
 from pymongo.collection import Collection
 
+INDEX_TYPES = ("flat", "hnsw")
+
 def normalize_embedding(embedding: list[float]) -> np.ndarray:
     """Converts list to float32 numpy array and normalizes it."""
     arr = np.array(embedding).astype("float32")
@@ -10,25 +19,103 @@ def normalize_embedding(embedding: list[float]) -> np.ndarray:
         return arr / norm
     return arr
 
+def document_id(doc_id: str):
+    """Turns a mapping doc_id back into a MongoDB _id."""
+    return ObjectId(doc_id) if ObjectId.is_valid(doc_id) else doc_id
+
+def document_fingerprint(docs) -> str:
+    """Hash over the _id and updated_at of every document, independent of order.
+
+    Two collections with the same count but a deleted and an inserted
+    document, or a re-saved one, get different fingerprints.
+    """
+    keys = sorted(f"{doc['_id']}|{doc.get('updated_at')}" for doc in docs)
+    digest = hashlib.sha256()
+    for key in keys:
+        digest.update(key.encode("utf-8"))
+        digest.update(b"\n")
+    return f"{len(keys)}:{digest.hexdigest()}"
+
+def create_faiss_index(dim: int, index_type: str = "flat"):
+    """Creates an empty inner-product FAISS index of the given type."""
+    if index_type == "hnsw":
+        return faiss.IndexHNSWFlat(dim, 32, faiss.METRIC_INNER_PRODUCT)
+    if index_type != "flat":
+        raise ValueError(f"Unknown index type '{index_type}'. Expected one of {INDEX_TYPES}.")
+    return faiss.IndexFlatIP(dim)
+
+class IndexGeneration:
+    """An immutable FAISS index together with its position mapping.
+
+    Readers grab the current generation once and use it for the whole
+    search. Writers never mutate a published generation; they build the
+    next one and swap the reference.
+    """
+
+    __slots__ = ("index", "mapping", "number", "fingerprint")
+
+    def __init__(self, index=None, mapping: dict = None, number: int = 0, fingerprint: str = None):
+        self.index = index
+        self.mapping = mapping or {}
+        self.number = number
+        # Fingerprint of the MongoDB documents the index was built from, None once entries were added
+        self.fingerprint = fingerprint
+
 class VectorStore:
-    def __init__(self, mongo_collection: Collection):
+    def __init__(
+        self,
+        mongo_collection: Collection,
+        query_filter: dict = None,
+        index_type: str = "flat",
+        snapshot_path: str = None,
+        name: str = "default",
+        max_pending_writes: int = 1000,
+        write_timeout: float = 5.0
+    ):
         self.mongo_collection = mongo_collection
-        self.index = None
-        self.mapping = {}  # maps FAISS index positions to a dict containing query and metadata
-        self._initialize_index()
+        self.query_filter = query_filter or {}
+        self.index_type = index_type
+        self.snapshot_path = snapshot_path
+        self.name = name
+        self.write_timeout = write_timeout
+        self._generation = IndexGeneration()
+        self._write_queue = queue.Queue(maxsize=max_pending_writes)
+        self._writer = None
+        self._writer_lock = threading.Lock()
+
+        generation = self._load_snapshot()
+        self._generation = generation or self._build_generation()
+
+    @property
+    def index(self):
+        return self._generation.index
+
+    @property
+    def mapping(self) -> dict:
+        return self._generation.mapping
+
+    @property
+    def generation(self) -> int:
+        return self._generation.number
+
+    @property
+    def document_filter(self) -> dict:
+        """MongoDB filter selecting the documents this store indexes."""
+        return {"embedding": {"$exists": True}, **self.query_filter}
 
-    def _initialize_index(self):
-        print("[VectorStore] Loading embeddings from MongoDB...")
+    def _build_generation(self) -> IndexGeneration:
+        print(f"[VectorStore:{self.name}] Loading embeddings from MongoDB...")
         embeddings = []
-        self.mapping = {}  # Reset mapping
-        processed_count = 0
+        mapping = {}
         error_count = 0
+        number = self._generation.number + 1
 
         try:
-            cursor = self.mongo_collection.find({"embedding": {"$exists": True}})
-            total_docs = self.mongo_collection.count_documents({"embedding": {"$exists": True}})
+            cursor = self.mongo_collection.find(self.document_filter)
+            seen = []
 
-            for i, doc in enumerate(cursor):
+            for doc in cursor:
+                seen.append(doc)
                 try:
                     vec = doc.get("embedding")
                     if not vec or not isinstance(vec, list):
@@ -36,18 +123,23 @@ class VectorStore:
                         continue
 
                     norm_vec = normalize_embedding(vec)
-                    
-                    if i > 0 and len(norm_vec) != len(embeddings[0]):
+
+                    if embeddings and len(norm_vec) != len(embeddings[0]):
                         error_count += 1
                         continue
 
-                    embeddings.append(norm_vec)
-                    self.mapping[i] = {
+                    # Chunks store partition_id and chunk_index next to the embedding, not in metadata
+                    metadata = dict(doc.get("metadata") or {})
+                    for key in ("partition_id", "chunk_index"):
+                        if key in doc:
+                            metadata.setdefault(key, doc[key])
+
+                    mapping[len(embeddings)] = {
                         "query": doc["query"],
-                        "metadata": doc.get("metadata", {}),
+                        "metadata": metadata,
                         "doc_id": str(doc["_id"])
                     }
-                    processed_count += 1
+                    embeddings.append(norm_vec)
 
                 except Exception:
                     error_count += 1
@@ -55,73 +147,227 @@ class VectorStore:
 
             if embeddings:
                 dim = len(embeddings[0])
-                self.index = faiss.IndexFlatIP(dim)
-                self.index.add(np.array(embeddings))
-                print(f"[VectorStore] Loaded {len(embeddings)} vectors into FAISS")
+                index = create_faiss_index(dim, self.index_type)
+                index.add(np.array(embeddings))
+                print(f"[VectorStore:{self.name}] Loaded {len(embeddings)} vectors into FAISS")
                 if error_count > 0:
-                    print(f"[VectorStore] Warning: {error_count} documents were skipped due to errors")
-            else:
-                print("[VectorStore] No valid embeddings found in DB")
-                self.index = None
+                    print(f"[VectorStore:{self.name}] Warning: {error_count} documents were skipped due to errors")
+                return IndexGeneration(index, mapping, number, document_fingerprint(seen))
+
+            print(f"[VectorStore:{self.name}] No valid embeddings found in DB")
+            return IndexGeneration(None, {}, number, document_fingerprint(seen))
 
         except Exception as e:
-            print(f"[VectorStore] Critical error during index initialization: {str(e)}")
-            self.index = None
+            print(f"[VectorStore:{self.name}] Critical error during index initialization: {str(e)}")
             raise
 
-    def search(self, query_vector: list[float], top_k=5, threshold=0.7) -> list[dict]:
-        if not self.index:
+    def _load_snapshot(self) -> IndexGeneration:
+        """Loads the index from its snapshot if it still matches MongoDB."""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return None
+
+        mapping_path = f"{self.snapshot_path}.mapping.json"
+        meta_path = f"{self.snapshot_path}.meta.json"
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                fingerprint = json.load(f).get("fingerprint")
+            current = document_fingerprint(
+                self.mongo_collection.find(self.document_filter, {"_id": 1, "updated_at": 1})
+            )
+            if not fingerprint or fingerprint != current:
+                print(f"[VectorStore:{self.name}] Snapshot is stale, rebuilding from MongoDB")
+                return None
+            with open(mapping_path, "r", encoding="utf-8") as f:
+                mapping = {int(k): v for k, v in json.load(f).items()}
+            index = faiss.read_index(self.snapshot_path)
+            if index.ntotal != len(mapping):
+                return None
+        except Exception as e:
+            print(f"[VectorStore:{self.name}] Could not load snapshot: {str(e)}")
+            return None
+
+        print(f"[VectorStore:{self.name}] Loaded {index.ntotal} vectors from snapshot")
+        return IndexGeneration(index, mapping, 1, fingerprint)
+
+    def save_snapshot(self):
+        """Writes the current index and mapping to the snapshot path."""
+        generation = self._generation
+        if not self.snapshot_path or not generation.index:
+            return
+        if generation.fingerprint is None:
+            # Entries added since the last rebuild; the snapshot could not be validated on load
+            print(f"[VectorStore:{self.name}] Index has unsaved additions, snapshot written on next reindex")
+            return
+
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+            faiss.write_index(generation.index, self.snapshot_path)
+            with open(f"{self.snapshot_path}.mapping.json", "w", encoding="utf-8") as f:
+                json.dump(generation.mapping, f, ensure_ascii=False)
+            # Written last, so a half-written snapshot never has a matching fingerprint
+            with open(f"{self.snapshot_path}.meta.json", "w", encoding="utf-8") as f:
+                json.dump({"fingerprint": generation.fingerprint}, f)
+        except Exception as e:
+            print(f"[VectorStore:{self.name}] Could not save snapshot: {str(e)}")
+
+    def search(self, query_vector: list[float], top_k=5, threshold=0.7, with_vectors=False) -> list[dict]:
+        """Returns the top_k entries with cosine similarity >= threshold.
+
+        With with_vectors each hit also carries its normalized "vector",
+        reconstructed from the index, for re-ranking.
+        """
+        # Read the generation once; concurrent writers only swap the reference
+        generation = self._generation
+        if not generation.index:
             return []
 
         try:
             norm_query = normalize_embedding(query_vector)
             query_np = np.array([norm_query])
-            distances, indices = self.index.search(query_np, top_k)
+            distances, indices = generation.index.search(query_np, top_k)
 
             results = []
             for idx, sim in zip(indices[0], distances[0]):
                 if idx == -1:  # FAISS returns -1 for not enough results
                     continue
-                    
-                if idx in self.mapping and sim >= threshold:
-                    mapping_entry = self.mapping[idx]
-                    doc = self.mongo_collection.find_one({"query": mapping_entry["query"]})
-                    
+
+                if idx in generation.mapping and sim >= threshold:
+                    mapping_entry = generation.mapping[idx]
+                    doc = None
+                    if mapping_entry.get("doc_id"):
+                        # Several chunks share a query; the doc_id points at the chunk that matched
+                        doc = self.mongo_collection.find_one({"_id": document_id(mapping_entry["doc_id"])})
+                    if not doc:
+                        doc = self.mongo_collection.find_one({"query": mapping_entry["query"]})
+
                     if doc:
                         result = {
                             "query": doc["query"],
                             "content": doc.get("content", doc.get("chunk", "")),
                             "metadata": mapping_entry["metadata"],
-                            "distance": float(sim)
+                            "distance": float(sim),
+                            "doc_id": mapping_entry.get("doc_id")
                         }
+                        if with_vectors:
+                            result["vector"] = generation.index.reconstruct(int(idx))
                         results.append(result)
 
             return results
 
         except Exception as e:
-            print(f"[VectorStore] Error during search: {str(e)}")
+            print(f"[VectorStore:{self.name}] Error during search: {str(e)}")
             return []
 
-    def add_entry(self, query: str, embedding: list[float], metadata: dict = None):
+    def _ensure_writer(self):
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(
+                    target=self._write_loop,
+                    name=f"vector-writer-{self.name}",
+                    daemon=True
+                )
+                self._writer.start()
+
+    def _submit(self, operation: str, payload=None) -> Future:
+        future = Future()
+        self._ensure_writer()
+        try:
+            self._write_queue.put((operation, payload, future), timeout=self.write_timeout)
+        except queue.Full:
+            raise RuntimeError(f"[VectorStore:{self.name}] Write queue is full, try again later")
+        return future
+
+    def _write_loop(self):
+        pending = None
+        while True:
+            item = pending or self._write_queue.get()
+            pending = None
+            batch = [item]
+
+            # Fold already queued additions into a single new generation
+            while item[0] == "add":
+                try:
+                    next_item = self._write_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if next_item[0] != "add":
+                    pending = next_item
+                    break
+                batch.append(next_item)
+
+            self._apply(batch)
+            for _ in batch:
+                self._write_queue.task_done()
+
+    def _apply(self, batch: list):
+        operation = batch[0][0]
+        try:
+            if operation == "reindex":
+                generation = self._build_generation()
+            else:
+                generation = self._extend_generation([entry for _, payload, _ in batch for entry in payload])
+
+            self._generation = generation
+            if operation == "reindex":
+                self.save_snapshot()
+
+            for _, _, future in batch:
+                future.set_result(generation.number)
+        except Exception as e:
+            print(f"[VectorStore:{self.name}] Error applying {operation}: {str(e)}")
+            for _, _, future in batch:
+                future.set_exception(e)
+
+    def _extend_generation(self, entries: list) -> IndexGeneration:
+        """Builds the next generation from the current one plus new entries."""
+        current = self._generation
+        vectors = np.array([vector for _, vector, _, _ in entries])
+
+        if current.index is not None:
+            index = faiss.clone_index(current.index)
+        else:
+            index = create_faiss_index(vectors.shape[1], self.index_type)
+
+        start = index.ntotal
+        index.add(vectors)
+        mapping = dict(current.mapping)
+        for offset, (query, _, metadata, doc_id) in enumerate(entries):
+            mapping[start + offset] = {"query": query, "metadata": metadata or {}, "doc_id": doc_id}
+
+        return IndexGeneration(index, mapping, current.number + 1)
+
+    def add_entry(self, query: str, embedding: list[float], metadata: dict = None, doc_id: str = None) -> Future:
+        """Queues an entry for the next index generation.
+
+        Returns a future that resolves to the generation number once the
+        entry is searchable.
+        """
+        return self.add_entries([{"query": query, "embedding": embedding, "metadata": metadata, "doc_id": doc_id}])
+
+    def add_entries(self, entries: list[dict]) -> Future:
+        """Queues several entries ({"query", "embedding", "metadata", "doc_id"}) as one write.
+
+        The index is cloned once for the whole batch, so saving a document
+        costs one new generation instead of one per chunk.
+        """
         try:
-            norm_embedding = normalize_embedding(embedding)
-            
-            if not self.index:
-                dim = len(norm_embedding)
-                self.index = faiss.IndexFlatIP(dim)
-            
-            idx = self.index.ntotal
-            self.index.add(np.array([norm_embedding]))
-            self.mapping[idx] = {"query": query, "metadata": metadata or {}}
-            
+            payload = [
+                (entry["query"], normalize_embedding(entry["embedding"]), entry.get("metadata"), entry.get("doc_id"))
+                for entry in entries
+            ]
+            return self._submit("add", payload)
         except Exception as e:
-            print(f"[VectorStore] Error adding entry: {str(e)}")
+            print(f"[VectorStore:{self.name}] Error adding entries: {str(e)}")
             raise
 
     def reindex(self):
         try:
-            self._initialize_index()
-            print("[VectorStore] FAISS index reinitialized")
+            self._submit("reindex").result()
+            print(f"[VectorStore:{self.name}] FAISS index reinitialized")
         except Exception as e:
-            print(f"[VectorStore] Error during reindexing: {str(e)}")
+            print(f"[VectorStore:{self.name}] Error during reindexing: {str(e)}")
             raise
+
+    def flush(self):
+        """Blocks until every queued write has been applied."""
+        self._write_queue.join()
@@ -0,0 +1,57 @@
+# src/model/warmup.py
+"""Explicit uppvärmning av backendens lat initierade resurser.
+
+Modell, databasklient och vector store laddas annars först vid första
+användning. Anropa warm_up() när man hellre betalar kostnaden vid start
+än på den första förfrågan, eller start_warm_up() för att göra det i
+bakgrunden medan appen redan svarar (se /status för när den är klar).
+Stegen registreras i den delade Lifecycle och körs parallellt.
+"""
+
+import asyncio
+import threading
+from typing import Callable, List, Optional
+from src.model.lifecycle import Lifecycle, get_lifecycle
+
+def _warm_up_embeddings():
+    from src.model.utils.embedding import warm_up_embeddings
+    from src.model.utils.embedding_pool import get_embedding_pool
+
+    # Poolen startas före all inferens i huvudprocessen
+    pool = get_embedding_pool()
+    if pool is not None:
+        pool.start()
+    warm_up_embeddings()
+
+def _warm_up_vector_store():
+    from src.model.utils.mongo_client import get_vector_store
+    get_vector_store()
+
+def register_warm_up(lifecycle: Lifecycle, embeddings: bool = True, database: bool = True) -> List[str]:
+    """Registrerar uppvärmningsstegen och returnerar deras namn."""
+    names = []
+    if embeddings:
+        lifecycle.register("embeddings", _warm_up_embeddings)
+        names.append("embeddings")
+    if database:
+        lifecycle.register("vector_store", _warm_up_vector_store)
+        names.append("vector_store")
+    return names
+
+def warm_up(embeddings: bool = True, database: bool = True) -> dict:
+    """Laddar de tunga resurserna parallellt och returnerar tidsåtgången per steg i sekunder."""
+    lifecycle = get_lifecycle()
+    names = register_warm_up(lifecycle, embeddings, database)
+    errors = asyncio.run(lifecycle.ensure_all(names))
+
+    status = lifecycle.status()["components"]
+    timings = {name: status[name]["seconds"] for name in names if errors[name] is None}
+    print(f"[Warmup] Finished: {', '.join(f'{k}={v:.2f}s' for k, v in timings.items())}")
+    return timings
+
+def start_warm_up(setup: Optional[Callable[[], None]] = None, embeddings: bool = True,
+                  database: bool = True) -> threading.Thread:
+    """Värmer upp i en bakgrundstråd. setup kan registrera fler komponenter, t.ex. agenterna."""
+    lifecycle = get_lifecycle()
+    register_warm_up(lifecycle, embeddings, database)
+    return lifecycle.start(setup=setup)
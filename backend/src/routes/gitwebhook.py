@@ -0,0 +1,53 @@
+# src/routes/gitwebhook.py
+import asyncio
+import hashlib
+import hmac
+import os
+import threading
+from flask import Blueprint, request, jsonify
+from src.routes.supervisorroute import get_supervisor
+
+bp = Blueprint("git_webhook", __name__, url_prefix="/api/git")
+
+def verify_signature(body: bytes, signature: str) -> bool:
+    """Kontrollerar X-Hub-Signature-256 mot GITHUB_WEBHOOK_SECRET.
+
+    Utan hemlighet godkänns ingen förfrågan, eftersom varje push startar
+    anrop mot GitHub och en omindexering.
+    """
+    secret = os.getenv("GITHUB_WEBHOOK_SECRET")
+    if not secret:
+        return False
+    if not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(signature[len("sha256="):], expected)
+
+def _apply_push(payload: dict):
+    try:
+        result = asyncio.run(get_supervisor().git_agent.apply_push(payload))
+        print(f"[GitWebhook] {result}")
+    except Exception as e:
+        print(f"[GitWebhook] Failed to apply push: {str(e)}")
+
+@bp.route("/webhook", methods=["POST"])
+def github_webhook():
+    if not os.getenv("GITHUB_WEBHOOK_SECRET"):
+        print("[GitWebhook] GITHUB_WEBHOOK_SECRET is not set, rejecting webhook")
+        return jsonify({"error": "Webhook secret not configured"}), 401
+    if not verify_signature(request.get_data(), request.headers.get("X-Hub-Signature-256")):
+        return jsonify({"error": "Invalid signature"}), 401
+
+    event = request.headers.get("X-GitHub-Event", "push")
+    if event == "ping":
+        return jsonify({"status": "pong"})
+    if event != "push":
+        return jsonify({"status": "ignored", "event": event})
+
+    payload = request.get_json(silent=True)
+    if not payload:
+        return jsonify({"error": "Missing payload"}), 400
+
+    # Indexet uppdateras i bakgrunden så att GitHub får svar direkt
+    threading.Thread(target=_apply_push, args=(payload,), daemon=True).start()
+    return jsonify({"status": "accepted"}), 202
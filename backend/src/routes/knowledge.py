@@ -1,7 +1,15 @@
 from flask import Blueprint, jsonify, request
-from src.model.utils.mongo_client import collection, vector_store    
+from src.model.utils.mongo_client import get_collection, get_vector_store
+from src.model.vector_store.sharded_store import DEFAULT_SHARDS, DOCUMENTS_SHARD
 from src.model.utils.chunking import chunk_text
-from src.model.utils.embedding import get_embedding_from_llm
+from src.model.utils.embedding_pool import embed_texts
+from src.model.utils.dedup import (
+    chunk_fields,
+    content_hash,
+    find_duplicate_document,
+    plan_chunks,
+    promote_duplicates
+)
 from datetime import datetime
 import uuid
 
@@ -9,7 +17,7 @@ bp = Blueprint("knowledge", __name__, url_prefix="/api")
 
 @bp.route("/knowledge", methods=["GET"])
 def get_knowledge():
-    docs = collection.find(
+    docs = get_collection().find(
         {"chunk": {"$exists": True}}, 
         {"_id": 0, "query": 1, "chunk": 1, "chunk_index": 1, "partition_id": 1, "updated_at": 1}
     )
@@ -52,48 +60,65 @@ def update_knowledge(query):
         return jsonify({"error": "Missing content"}), 400
 
     # Hämta partition_id för denna query
+    collection = get_collection()
+    vector_store = get_vector_store()
     first_doc = collection.find_one({"query": query})
     if not first_doc:
         return jsonify({"error": "Entry not found"}), 404
 
     partition_id = first_doc["partition_id"]
+    metadata = first_doc.get("metadata", {})
+    shard = vector_store.shard_for(metadata)
 
-    # Ta bort gamla chunkar
+    # Ta bort gamla chunkar, dubbletter av dem i andra poster tar över embeddingen
+    old_docs = list(collection.find({"partition_id": partition_id}))
     collection.delete_many({"partition_id": partition_id})
+    promote_duplicates(collection, old_docs)
 
-    # Chunka nytt content
+    # Chunka nytt content, bara chunks som inte redan finns embeddas
     chunks = chunk_text(new_content)
-    for i, chunk in enumerate(chunks):
-        embedding = get_embedding_from_llm(chunk)
+    plan = plan_chunks(collection, chunks, DEFAULT_SHARDS.get(shard, {}).get("query_filter"))
+    new_chunks = [entry["chunk"] for entry in plan if entry["duplicate_of"] is None]
+    vectors = iter(embed_texts(new_chunks)) if new_chunks else iter(())
+    for i, entry in enumerate(plan):
         doc = {
             "query": query,
-            "chunk": chunk,
+            "chunk": entry["chunk"],
             "chunk_index": i,
-            "embedding": embedding,
             "partition_id": partition_id,
-            "updated_at": datetime.utcnow()
+            "updated_at": datetime.utcnow(),
+            **chunk_fields(entry)
         }
+        if entry["duplicate_of"] is None:
+            doc["embedding"] = next(vectors).tolist()
+        if metadata:
+            # Behåll dokumenttypen så att chunken hamnar i samma shard
+            doc["metadata"] = {**metadata, "chunk_index": i}
         collection.insert_one(doc)
-        vector_store.add_entry(f"{query} (chunk {i})", embedding)
-        vector_store.reindex()
+    # De gamla chunkarna är borttagna, så sharden byggs om från MongoDB en gång
+    vector_store.reindex(shard)
 
     return jsonify({"message": "Entry updated"})
 
 @bp.route("/knowledge/<query>", methods=["DELETE"])
 def delete_knowledge(query):
+    collection = get_collection()
+    vector_store = get_vector_store()
     doc = collection.find_one({"query": query})
     if not doc:
         return jsonify({"error": "Entry not found"}), 404
 
     partition_id = doc["partition_id"]
+    old_docs = list(collection.find({"partition_id": partition_id}))
     result = collection.delete_many({"partition_id": partition_id})
-    vector_store.reindex()
+    promote_duplicates(collection, old_docs)
+    vector_store.reindex(vector_store.shard_for(doc.get("metadata")))
     return jsonify({"message": f"Deleted {result.deleted_count} chunks."})
 
 @bp.route("/knowledge", methods=["DELETE"])
 def delete_all_knowledge():
-    result = collection.delete_many({})
-    vector_store.reindex()
+    result = get_collection().delete_many({})
+    get_vector_store().reindex()
     return jsonify({"message": f"Deleted {result.deleted_count} entries"})
 
 @bp.route("/upload-document", methods=["POST"])
@@ -111,6 +136,20 @@ def upload_document():
     try:
         # Läs innehållet från filen
         content = file.read().decode('utf-8')
+        collection = get_collection()
+        scope = DEFAULT_SHARDS[DOCUMENTS_SHARD]["query_filter"]
+
+        # Samma fil har redan laddats upp: ingenting att göra
+        document_hash = content_hash(content)
+        existing = find_duplicate_document(collection, document_hash, scope)
+        if existing:
+            return jsonify({
+                "message": "Document already uploaded",
+                "filename": file.filename,
+                "chunks_processed": 0,
+                "partition_id": existing["partition_id"],
+                "duplicate": True
+            })
         
         # Skapa ett unikt partition_id för dokumentet
         partition_id = str(uuid.uuid4())
@@ -128,19 +167,23 @@ def upload_document():
             "partition_id": partition_id
         }
         
+        # Skapa embeddings i en batch för chunkar som inte redan finns i något dokument
+        plan = plan_chunks(collection, chunks, scope)
+        new_chunks = [entry["chunk"] for entry in plan if entry["duplicate_of"] is None]
+        vectors = iter(embed_texts(new_chunks)) if new_chunks else iter(())
+
         # Spara varje chunk
-        for i, chunk in enumerate(chunks):
-            # Skapa embedding för chunken
-            chunk_embedding = get_embedding_from_llm(chunk)
-            
+        entries = []
+        for i, entry in enumerate(plan):
             # Spara i MongoDB
             doc = {
                 "query": file.filename,
-                "chunk": chunk,
+                "chunk": entry["chunk"],
                 "chunk_index": i,
-                "embedding": chunk_embedding,
                 "partition_id": partition_id,
                 "updated_at": datetime.utcnow(),
+                "document_hash": document_hash,
+                **chunk_fields(entry),
                 "metadata": {
                     "partition_id": partition_id,
                     "is_chunk": True,
@@ -149,28 +192,26 @@ def upload_document():
                     "filename": file.filename
                 }
             }
+            if entry["duplicate_of"] is None:
+                doc["embedding"] = next(vectors).tolist()
             collection.insert_one(doc)
-            
-            # Lägg till i vector store
-            vector_store.add_entry(
-                query=file.filename,
-                embedding=chunk_embedding,
-                metadata={
-                    "partition_id": partition_id,
-                    "is_chunk": True,
-                    "chunk_index": i,
-                    "document_type": "uploaded_file",
-                    "filename": file.filename
-                }
-            )
+            if "embedding" in doc:
+                entries.append({
+                    "query": file.filename,
+                    "embedding": doc["embedding"],
+                    "metadata": doc["metadata"],
+                    "doc_id": str(doc["_id"])
+                })
         
-        # Reindexera efter att alla chunks har lagts till
-        vector_store.reindex()
+        # Alla chunks läggs till i dokument-sharden i en enda indexgeneration
+        if entries:
+            get_vector_store().add_entries(entries, shard=DOCUMENTS_SHARD).result()
         
         return jsonify({
             "message": "Document processed successfully",
             "filename": file.filename,
             "chunks_processed": len(chunks),
+            "chunks_reused": len(plan) - len(new_chunks),
             "partition_id": partition_id
         })
         
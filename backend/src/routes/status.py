@@ -1,8 +1,15 @@
 # src/routes/status.py
 from flask import Blueprint, jsonify
+from src.model.lifecycle import get_lifecycle
 
 bp = Blueprint('status', __name__, url_prefix='/status')
 
 @bp.route('/', methods=['GET'])
 def get_status():
-    return jsonify({"status": "ok"})
+    return jsonify({"status": "ok", **get_lifecycle().status()})
+
+@bp.route('/ready', methods=['GET'])
+def get_ready():
+    """Readiness: 200 när alla registrerade komponenter är initierade, annars 503."""
+    status = get_lifecycle().status()
+    return jsonify(status), 200 if status["ready"] else 503
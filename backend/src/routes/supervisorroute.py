@@ -4,10 +4,21 @@ from flask import Blueprint, request, jsonify
 from src.model.supervisor import SupervisorAgent
 from src.model.llm_client import LLMClient
 import asyncio
+import threading
 
 bp = Blueprint("supervisor", __name__, url_prefix="/api")
-llm = LLMClient()
-supervisor = SupervisorAgent(llm)
+_supervisor = None
+_supervisor_lock = threading.Lock()
+
+def get_supervisor() -> SupervisorAgent:
+    """Skapar SupervisorAgent (och dess agenter) vid första förfrågan."""
+    global _supervisor
+    if _supervisor is None:
+        # Uppvärmningstråden och första förfrågan får inte skapa varsin GitAgent
+        with _supervisor_lock:
+            if _supervisor is None:
+                _supervisor = SupervisorAgent(LLMClient())
+    return _supervisor
 
 @bp.route("/ask-supervisor", methods=["POST"])
 def ask_supervisor():
@@ -27,7 +38,7 @@ def ask_supervisor():
         if tasks:
             task = " and ".join(tasks)
             
-        response = loop.run_until_complete(supervisor.handle(task))
+        response = loop.run_until_complete(get_supervisor().handle(task))
         loop.close()
         
         # Kontrollera om svaret är en sträng eller ett dict
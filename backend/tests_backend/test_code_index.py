@@ -0,0 +1,119 @@
+import zlib
+import numpy as np
+import pytest
+from src.model.utils.file_store import FileStore
+from src.model.utils.path_index import tokenize
+from src.model.utils.symbol_table import SymbolTable, parse_symbols
+from src.model.vector_store.code_index import CodeIndex, chunk_file
+
+AGENT = '''import os
+
+class Agent:
+    def fetch_weather(self, city):
+        return os.getenv("WEATHER") + city
+
+    def send_email(self, to):
+        return to
+
+def parse_config(path):
+    return open(path).read()
+
+DEFAULT_CITY = "Oslo"
+'''
+
+class FakeEmbedder:
+    """Bag-of-words-vektorer så att testerna inte behöver någon modell."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        vectors = np.zeros((len(texts), 64), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text.replace("_", " ")):
+                vectors[row, zlib.crc32(token.encode()) % 64] += 1
+        return vectors
+
+@pytest.fixture
+def files():
+    return {"agent.py": AGENT, "docs/notes.md": "Notes about deployment\n", "logo.svg": "<svg/>"}
+
+@pytest.fixture
+def code_index(files, tmp_path):
+    symbols = SymbolTable()
+    symbols.build(files)
+    return CodeIndex(symbols, store=FileStore(tmp_path / "index.sqlite"), embed=FakeEmbedder())
+
+def test_chunks_follow_symbol_boundaries():
+    chunks = chunk_file(AGENT, parse_symbols(AGENT))
+    assert [(chunk["symbol"], chunk["start"], chunk["end"]) for chunk in chunks] == [
+        ("<module>", 1, 1),
+        ("Agent", 3, 8),
+        ("parse_config", 10, 11),
+        ("<module>", 13, 13)
+    ]
+
+def test_long_classes_are_split_per_method():
+    chunks = chunk_file(AGENT, parse_symbols(AGENT), max_lines=4)
+    assert [chunk["symbol"] for chunk in chunks] == [
+        "<module>", "Agent", "Agent.fetch_weather", "Agent.send_email", "parse_config", "<module>"
+    ]
+    assert all(chunk["end"] - chunk["start"] < 4 for chunk in chunks)
+
+def test_files_without_symbols_use_line_windows():
+    chunks = chunk_file("\n".join(f"rad {n}" for n in range(10)), max_lines=4)
+    assert [(chunk["start"], chunk["end"]) for chunk in chunks] == [(1, 4), (5, 8), (9, 10)]
+
+def test_search_returns_matching_chunk_with_code(code_index, files):
+    code_index.build(files)
+
+    hits = code_index.search("parse config", top_k=1, file_index=files)
+
+    assert hits[0]["path"] == "agent.py"
+    assert hits[0]["symbol"] == "parse_config"
+    assert hits[0]["content"] == "def parse_config(path):\n    return open(path).read()"
+    assert all(hit["path"] != "logo.svg" for hit in code_index.search("svg", top_k=10))
+
+def test_update_embeds_only_changed_blobs(code_index, files):
+    code_index.build(files)
+    embedder = code_index._embed
+    embedder.calls.clear()
+
+    files["docs/notes.md"] = "Notes about releases\n"
+    code_index.symbols.update(files, {}, ["docs/notes.md"], [])
+    code_index.update(files, {}, ["docs/notes.md"], [])
+
+    assert embedder.calls == [["docs/notes.md <module>\nNotes about releases"]]
+    assert {hit["path"] for hit in code_index.search("releases", top_k=10)} >= {"docs/notes.md"}
+
+def test_removed_files_leave_the_index(code_index, files):
+    code_index.build(files)
+    del files["agent.py"]
+    code_index.update(files, {}, [], ["agent.py"])
+
+    assert "agent.py" not in {hit["path"] for hit in code_index.search("weather", top_k=10)}
+    assert len(code_index) == 1
+
+def test_cache_only_keeps_blobs_in_the_tree(code_index, files):
+    """Gamla blobbar släpps ur minnescachen när filen ändras eller tas bort."""
+    code_index.build(files)
+    old_shas = {sha for sha, _, _ in code_index._files.values()}
+
+    files["docs/notes.md"] = "Notes about releases\n"
+    del files["agent.py"]
+    code_index.update(files, {}, ["docs/notes.md"], ["agent.py"])
+
+    assert set(code_index._cache) == {sha for sha, _, _ in code_index._files.values()}
+    assert not old_shas & set(code_index._cache)
+
+def test_embeddings_are_reused_from_store(code_index, files):
+    """En ny process läser vektorerna från storen i stället för att embedda om."""
+    code_index.build(files)
+    embedder = FakeEmbedder()
+    restarted = CodeIndex(code_index.symbols, store=code_index.store, embed=embedder)
+
+    restarted.build(files)
+
+    assert embedder.calls == []
+    assert len(restarted) == len(code_index)
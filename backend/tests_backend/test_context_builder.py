@@ -0,0 +1,83 @@
+import threading
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from src.model.utils import context_builder
+from src.model.utils.context_builder import ContextBuilder
+
+def word_count(text):
+    return len(text.split())
+
+def test_candidates_are_packed_by_priority_within_budget():
+    builder = ContextBuilder(budget=20, count=word_count)
+    builder.add("låg", "ett två tre", 10)
+    builder.add("hög", "fyra fem sex sju", 90)
+    builder.add("mitten", "åtta nio", 50)
+
+    context = builder.build()
+
+    assert context.index("### hög") < context.index("### mitten") < context.index("### låg")
+    assert builder.used <= 20
+
+def test_summary_replaces_candidate_that_does_not_fit():
+    builder = ContextBuilder(budget=14, count=word_count)
+    builder.add("fil", "ord " * 6, 90)
+    builder.add("stor", "ord " * 50, 50, summary="kort sammanfattning")
+    builder.add("ryms inte", "ord " * 50, 10)
+
+    context = builder.build()
+
+    assert "kort sammanfattning" in context
+    assert builder.summarized == ["stor"]
+    assert builder.dropped == ["ryms inte"]
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    body = "\n".join(f"    value_{n} = {n}" for n in range(200))
+    (repo / "big.py").write_text(f"def compute():\n{body}\n    return 1\n\ndef other():\n    return 2\n")
+    (repo / "caller.py").write_text("from big import compute\n\ndef run():\n    return compute()\n")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("GIT_LOCAL_REPO_PATH", str(repo))
+    monkeypatch.setenv("GIT_LOCAL_SOURCE", "worktree")
+    monkeypatch.setenv("GIT_WATCH", "0")
+    monkeypatch.setattr(context_builder, "_counter", word_count)
+    from src.model.agents.git_agent import GitAgent
+    return GitAgent(MagicMock())
+
+@pytest.mark.asyncio
+async def test_large_file_context_stays_within_budget(agent):
+    """En stor fil skickas inte i sin helhet, men signaturer och anropare följer med."""
+    await agent.initialize()
+
+    context = agent._build_file_context("big.py", agent.file_index["big.py"], budget=150)
+
+    assert len(context.split()) < len(agent.file_index["big.py"].split())
+    assert "def compute(): ..." in context
+    assert "def other():\n    return 2" in context
+    assert "Anropare: caller.py (run)" in context
+
+@pytest.mark.asyncio
+async def test_explain_file_builds_context_off_the_event_loop(agent):
+    """Kontexten (kodindexsökning och tokenräkning) byggs i en tråd, inte i event loopen."""
+    await agent.initialize()
+    agent.llm.query = AsyncMock(return_value="Förklaring")
+    threads = []
+    original = agent._build_file_context
+    agent._build_file_context = lambda *args, **kwargs: threads.append(threading.current_thread()) or original(*args, **kwargs)
+
+    assert await agent.explain_file("big.py") == "Förklaring"
+    assert threads and threads[0] is not threading.main_thread()
+
+@pytest.mark.asyncio
+async def test_refresh_runs_index_listeners_off_the_event_loop(agent, tmp_path):
+    """Kodindexets omembedding (och övriga lyssnare) körs i en tråd vid refresh."""
+    await agent.initialize()
+    threads = []
+    agent.add_index_listener(lambda changed, removed: threads.append((threading.current_thread(), changed)))
+
+    (tmp_path / "repo" / "caller.py").write_text("def run():\n    return 3\n")
+    changed, _ = await agent.refresh_index()
+
+    assert changed == ["caller.py"]
+    assert threads and threads[0][0] is not threading.main_thread()
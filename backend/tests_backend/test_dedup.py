@@ -0,0 +1,203 @@
+import io
+from concurrent.futures import Future
+import numpy as np
+import pytest
+from src.model.utils import dedup, mongo_client
+from src.model.utils.dedup import content_hash, fingerprint, similarity
+
+LONG = (
+    "Python är ett programspråk som skapades av Guido van Rossum och släpptes första gången 1991 "
+    "språket är känt för sin läsbara syntax och används inom webbutveckling dataanalys maskininlärning "
+    "automatisering och undervisning eftersom det är lätt att komma igång med men ändå kraftfullt"
+)
+
+def _get(doc, key):
+    for part in key.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return None
+        doc = doc[part]
+    return doc
+
+def _matches(doc, query):
+    for key, condition in query.items():
+        value = _get(doc, key)
+        if isinstance(condition, dict):
+            if "$exists" in condition and (value is not None) != condition["$exists"]:
+                return False
+            if "$ne" in condition and value == condition["$ne"]:
+                return False
+            if "$in" in condition:
+                values = value if isinstance(value, list) else [value]
+                if not any(v in condition["$in"] for v in values):
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+class FakeCollection:
+    """Minimal pymongo-ersättare med de operatorer dedup-koden använder."""
+
+    def __init__(self):
+        self.docs = []
+        self.next_id = 1
+
+    def find(self, query=None, projection=None):
+        return [doc for doc in self.docs if _matches(doc, query or {})]
+
+    def find_one(self, query=None, projection=None):
+        found = self.find(query)
+        return found[0] if found else None
+
+    def insert_one(self, doc):
+        doc.setdefault("_id", self.next_id)
+        self.next_id += 1
+        self.docs.append(doc)
+
+    def update_one(self, query, update):
+        self._update(self.find(query)[:1], update)
+
+    def update_many(self, query, update):
+        self._update(self.find(query), update)
+
+    def _update(self, docs, update):
+        for doc in docs:
+            doc.update(update.get("$set", {}))
+            for key in update.get("$unset", {}):
+                doc.pop(key, None)
+
+    def delete_many(self, query):
+        doomed = self.find(query)
+        self.docs = [doc for doc in self.docs if doc not in doomed]
+
+        class Result:
+            deleted_count = len(doomed)
+        return Result()
+
+    def create_index(self, field):
+        pass
+
+class FakeVectorStore:
+    def __init__(self):
+        self.entries = []
+
+    def add_entry(self, query, embedding, metadata=None, shard=None, doc_id=None):
+        return self.add_entries([{"query": query}], shard)
+
+    def add_entries(self, entries, shard=None):
+        self.entries.extend(entry["query"] for entry in entries)
+        future = Future()
+        future.set_result(len(self.entries))
+        return future
+
+    def reindex(self, shard=None):
+        pass
+
+    def shard_for(self, metadata=None):
+        return "documents" if (metadata or {}).get("document_type") == "uploaded_file" else "research"
+
+@pytest.fixture
+def env(monkeypatch):
+    collection = FakeCollection()
+    store = FakeVectorStore()
+    embedded = []
+
+    def fake_embed(texts):
+        embedded.extend(texts)
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+    async def fake_embed_async(texts):
+        return fake_embed(texts)
+
+    def fake_chunk_text(text):
+        return [s.strip() for s in text.split("\n") if s.strip()]
+
+    from src.routes import knowledge
+    for module in (mongo_client, knowledge):
+        monkeypatch.setattr(module, "get_collection", lambda: collection)
+        monkeypatch.setattr(module, "get_vector_store", lambda: store)
+        monkeypatch.setattr(module, "chunk_text", fake_chunk_text)
+    monkeypatch.setattr(mongo_client, "embed_texts_async", fake_embed_async)
+    monkeypatch.setattr(knowledge, "embed_texts", fake_embed)
+    return collection, store, embedded
+
+def test_content_hash_ignores_whitespace():
+    assert content_hash("hej  hopp\n") == content_hash("hej hopp")
+
+def test_minhash_similarity_finds_near_duplicates():
+    original = fingerprint(LONG)
+    edited = fingerprint(LONG.replace("1991", "1992"))
+    other = fingerprint("Flamingos är rosa fåglar som står på ett ben i grunda sjöar och äter räkor")
+
+    assert similarity(original["minhash"], edited["minhash"]) >= 0.8
+    assert set(original["minhash_bands"]) & set(edited["minhash_bands"])
+    assert similarity(original["minhash"], other["minhash"]) < 0.2
+    assert fingerprint("för kort")["minhash"] is None
+
+def test_near_duplicate_chunk_references_original(env):
+    collection, store, embedded = env
+    collection.insert_one({"chunk": LONG, "embedding": [1.0], **fingerprint(LONG)})
+    plan = dedup.plan_chunks(collection, [LONG.replace("1991", "1992"), "Något helt annat om flamingos och rosa fåglar i sjöar"])
+    assert [entry["duplicate_of"] for entry in plan] == [content_hash(LONG), None]
+
+@pytest.mark.asyncio
+async def test_identical_research_is_refreshed_not_duplicated(env):
+    collection, store, embedded = env
+    answer = f"{LONG}\nEn andra chunk med lite annan text om Python och dess historia"
+    await mongo_client.save_research("vad är python", answer)
+    before = len(collection.docs)
+
+    await mongo_client.save_research("vad är python?", answer)
+
+    assert len(collection.docs) == before == 2
+    assert len(embedded) == 2 and len(store.entries) == 2
+
+@pytest.mark.asyncio
+async def test_existing_chunks_reuse_embeddings(env):
+    collection, store, embedded = env
+    other = "Flamingos är rosa fåglar som står på ett ben i grunda sjöar och äter små räkor hela dagarna"
+    await mongo_client.save_research("python", f"{LONG}\nKort rad ett")
+    await mongo_client.save_research("flamingos", f"{other}\n{LONG}\n{other}")
+
+    new_docs = [doc for doc in collection.docs if doc["query"] == "flamingos"]
+    assert [doc["chunk_index"] for doc in new_docs] == [0, 1, 2]
+    # LONG finns redan och den andra flamingoraden är en dubblett i samma svar
+    assert [("embedding" in doc) for doc in new_docs] == [True, False, False]
+    assert new_docs[1]["duplicate_of"] == content_hash(LONG)
+    assert embedded == [LONG, "Kort rad ett", other]
+
+@pytest.mark.asyncio
+async def test_deleting_original_promotes_duplicate(env):
+    from flask import Flask
+    from src.routes import knowledge
+    collection, store, embedded = env
+    await mongo_client.save_research("python", f"{LONG}\nKort rad ett")
+    await mongo_client.save_research("kopia", f"Helt annan inledning om något annat ämne som inte liknar resten\n{LONG}")
+
+    app = Flask(__name__)
+    app.register_blueprint(knowledge.bp)
+    assert app.test_client().delete("/api/knowledge/python").status_code == 200
+
+    copy = next(doc for doc in collection.docs if doc["chunk"] == LONG)
+    assert copy["query"] == "kopia" and "embedding" in copy and "duplicate_of" not in copy
+
+def test_reuploading_a_document_is_skipped(env):
+    from flask import Flask
+    from src.routes import knowledge
+    collection, store, embedded = env
+    app = Flask(__name__)
+    app.register_blueprint(knowledge.bp)
+    client = app.test_client()
+    body = f"{LONG}\nAndra stycket i manualen".encode()
+
+    first = client.post("/api/upload-document", data={"file": (io.BytesIO(body), "manual.txt")}).get_json()
+    second = client.post("/api/upload-document", data={"file": (io.BytesIO(body), "manual.txt")}).get_json()
+
+    assert first["chunks_processed"] == 2 and "duplicate" not in first
+    assert second["duplicate"] and second["partition_id"] == first["partition_id"]
+    assert len(embedded) == 2 and len(collection.docs) == 2
+
+def test_dedup_can_be_disabled(env, monkeypatch):
+    collection, store, embedded = env
+    monkeypatch.setattr(dedup, "DEDUP_ENABLED", False)
+    plan = dedup.plan_chunks(collection, [LONG, LONG])
+    assert [entry["duplicate_of"] for entry in plan] == [None, None]
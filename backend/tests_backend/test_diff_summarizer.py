@@ -0,0 +1,82 @@
+import asyncio
+import pytest
+from src.model.utils.diff_summarizer import DiffSummarizer, split_hunks, split_patch
+
+def word_count(text):
+    return len(text.split())
+
+def make_patch(hunks, lines=20):
+    return "\n".join(
+        f"@@ -{n},{lines} +{n},{lines} @@\n" + "\n".join(f"+rad {n} {i}" for i in range(lines))
+        for n in range(hunks)
+    )
+
+class FakeLLM:
+    """Räknar anrop och hur många som pågår samtidigt."""
+
+    def __init__(self):
+        self.prompts = []
+        self.active = 0
+        self.peak = 0
+
+    async def query(self, prompt):
+        self.prompts.append(prompt)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return f"sammanfattning {len(self.prompts)}"
+
+def test_split_hunks():
+    assert split_hunks("diff\n@@ a @@\n+x\n@@ b @@\n-y") == ["diff", "@@ a @@\n+x", "@@ b @@\n-y"]
+
+def test_split_patch_respects_token_limit():
+    pieces = split_patch(make_patch(4), max_tokens=100, count=word_count)
+    assert len(pieces) == 4
+    assert all(word_count(piece) <= 100 for piece in pieces)
+    assert "\n".join(pieces) == make_patch(4)
+
+@pytest.mark.asyncio
+async def test_small_diff_is_returned_unchanged():
+    llm = FakeLLM()
+    summarizer = DiffSummarizer(llm, budget=1000, count=word_count)
+    files = [{"filename": "a.py", "additions": 1, "deletions": 0, "patch": "@@ -1 +1 @@\n+x = 1"}]
+
+    changes = await summarizer.summarize(files)
+
+    assert "+x = 1" in changes
+    assert llm.prompts == []
+
+@pytest.mark.asyncio
+async def test_large_diff_is_mapped_concurrently_and_cached():
+    llm = FakeLLM()
+    summarizer = DiffSummarizer(llm, concurrency=2, chunk_tokens=100, budget=200, count=word_count)
+    files = [
+        {"filename": f"f{n}.py", "additions": 80, "deletions": 0, "patch": make_patch(2)}
+        for n in range(3)
+    ] + [{"filename": "logo.png", "additions": 0, "deletions": 0}]
+
+    changes = await summarizer.summarize(files)
+
+    # 3 filer x 2 bitar + en sammanslagning per fil
+    assert len(llm.prompts) == 9
+    assert llm.peak == 2
+    assert "Fil: f0.py" in changes and "Fil: logo.png" in changes
+    assert "+rad" not in changes
+
+    llm.prompts.clear()
+    files[0]["patch"] = make_patch(1)
+    await summarizer.summarize(files)
+    assert len(llm.prompts) == 1
+    assert "f0.py" in llm.prompts[0]
+
+@pytest.mark.asyncio
+async def test_summaries_over_budget_are_reduced():
+    llm = FakeLLM()
+    summarizer = DiffSummarizer(llm, chunk_tokens=100, budget=20, count=word_count)
+    files = [{"filename": f"f{n}.py", "patch": make_patch(1)} for n in range(6)]
+
+    changes = await summarizer.summarize(files)
+
+    assert llm.prompts[-1].startswith("Slå ihop följande sammanfattningar av filändringar")
+    assert "Fil:" not in changes
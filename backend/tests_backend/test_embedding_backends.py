@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from src.model.utils.embedding import MODEL_NAME, _compute_embedding, _compute_embeddings
+from src.model.utils.embedding_pool import EmbeddingPool
+
+def _model_available() -> bool:
+    """Sant om modellen redan finns i Hugging Face-cachen (testerna laddar inte ner den)."""
+    try:
+        from huggingface_hub import try_to_load_from_cache
+        return isinstance(try_to_load_from_cache(MODEL_NAME, "config.json"), str)
+    except Exception:
+        return False
+
+pytestmark = pytest.mark.skipif(not _model_available(), reason=f"{MODEL_NAME} finns inte lokalt")
+
+TEXTS = [
+    "Varför är flamingos rosa?",
+    "Python är ett programmeringsspråk.",
+    "Stockholm är Sveriges huvudstad och har många broar."
+]
+
+def _cosine(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+def test_batch_matches_single_embedding():
+    """Batchad mean pooling ska ge samma vektorer som en text i taget."""
+    batch = _compute_embeddings(TEXTS)
+    for text, vector in zip(TEXTS, batch):
+        single = np.array(_compute_embedding(text), dtype=np.float32)
+        assert _cosine(single, vector) > 0.999
+
+def test_embedding_pool_returns_shared_memory_results():
+    pool = EmbeddingPool(workers=2, torch_threads=1, batch_size=2)
+    try:
+        vectors = pool.embed(TEXTS)
+    finally:
+        pool.shutdown()
+
+    assert vectors.shape == (len(TEXTS), pool.dim)
+    assert vectors.dtype == np.float32
+    expected = _compute_embeddings(TEXTS)
+    for got, want in zip(vectors, expected):
+        assert _cosine(got, want) > 0.999
+
+@pytest.mark.parametrize("quantize, tolerance", [(False, 0.999), (True, 0.95)])
+def test_onnx_backend_matches_pytorch(tmp_path, quantize, tolerance):
+    """ONNX-backenden ska ge i princip samma vektorer som PyTorch."""
+    pytest.importorskip("onnxruntime")
+    from src.model.utils.embedding import get_tokenizer, _compute_embeddings_torch
+    from src.model.utils.onnx_embedding import OnnxEmbedder, export_onnx_model
+
+    path = export_onnx_model(str(tmp_path), quantize=quantize)
+    embedder = OnnxEmbedder(path, get_tokenizer())
+
+    expected = _compute_embeddings_torch(TEXTS)
+    actual = embedder.embed(TEXTS)
+    assert actual.shape == expected.shape
+    for got, want in zip(actual, expected):
+        assert _cosine(got, want) > tolerance
@@ -0,0 +1,108 @@
+import os
+import time
+import pytest
+from src.model.tools import internet_search
+from src.model.tools.page_fetcher import PageFetcher
+from src.model.utils.fetch_cache import FetchCache, normalize_query, search_key, url_key
+from tests_backend.test_page_fetcher import ARTICLE, FixtureServer
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = FetchCache(tmp_path / "fetch_cache.sqlite")
+    yield cache
+    cache.close()
+
+@pytest.fixture
+def fetcher(cache):
+    fetcher = PageFetcher(timeout=5, cache=cache)
+    fetcher.debug = False
+    return fetcher
+
+def test_near_identical_queries_share_key():
+    assert normalize_query("  Vad är   Python? ") == normalize_query("vad är python")
+    assert search_key("Vad är Python?", 5) != search_key("Vad är Python?", 10)
+
+def test_url_key_ignores_fragment_and_tracking_params():
+    assert url_key("HTTPS://Example.com:443/a?b=2&utm_source=x&a=1#top") == url_key("https://example.com/a?a=1&b=2")
+
+def test_ttl_honours_cache_control(cache):
+    assert cache.ttl_for("text/html", "public, max-age=60") == 60
+    assert cache.ttl_for("text/html", "no-cache") == 0
+    assert cache.ttl_for("text/html", "no-store") is None
+    assert cache.ttl_for("text/html; charset=utf-8") == cache.ttls["text/html"]
+    assert cache.ttl_for("application/pdf") == cache.ttls["default"]
+
+def test_entries_are_compressed_and_expire(cache):
+    body = b"<p>hej</p>" * 1000
+    cache.put("url:a", body, "text/html", ttl=60, etag='"e"')
+    cache.put("url:b", body, "text/html", ttl=-1)
+
+    entry = cache.get("url:a")
+    assert entry.data == body and entry.fresh and entry.validators() == {"If-None-Match": '"e"'}
+    assert not cache.get("url:b").fresh
+    assert cache.size() < len(body)
+
+def test_least_recently_used_entries_are_evicted(cache):
+    cache.max_bytes = 3500
+    for key in ("a", "b", "c"):
+        cache.put(key, os.urandom(1000), ttl=60)
+        time.sleep(0.01)
+    cache.get("a")
+    cache.put("d", os.urandom(1000), ttl=60)
+
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in ("a", "d"))
+    assert cache.size() <= cache.max_bytes
+
+@pytest.mark.asyncio
+async def test_fresh_pages_skip_the_network(fetcher):
+    with FixtureServer(delay=0.0) as server:
+        first = await fetcher.fetch_all([f"{server.base}/article"])
+        second = await fetcher.fetch_all([f"{server.base}/article#intro"])
+
+    assert second[0]["text"] == first[0]["text"] != ""
+    assert len(server.requests) == 1
+
+@pytest.mark.asyncio
+async def test_stale_pages_are_revalidated_with_etag(fetcher):
+    with FixtureServer(delay=0.0) as server:
+        first = await fetcher.fetch_all([f"{server.base}/etag"])
+        second = await fetcher.fetch_all([f"{server.base}/etag"])
+
+    assert second[0]["text"] == first[0]["text"] != ""
+    assert server.requests[1][1].get("If-None-Match") == '"v1"'
+
+@pytest.mark.asyncio
+async def test_no_store_pages_are_not_cached(fetcher, cache):
+    with FixtureServer(delay=0.0) as server:
+        await fetcher.fetch_all([f"{server.base}/no-store"])
+        assert cache.get(url_key(f"{server.base}/no-store")) is None
+
+@pytest.mark.asyncio
+async def test_truncated_pages_are_not_cached(fetcher, cache):
+    """En sida som kortats till max_bytes får inte serveras som hela sidan senare."""
+    fetcher.max_bytes = 1000
+    with FixtureServer(delay=0.0) as server:
+        await fetcher.fetch_all([f"{server.base}/big"])
+        assert cache.get(url_key(f"{server.base}/big")) is None
+
+        fetcher.max_bytes = len(ARTICLE.encode())
+        await fetcher.fetch_all([f"{server.base}/article"])
+        assert cache.get(url_key(f"{server.base}/article")) is not None
+
+@pytest.mark.asyncio
+async def test_repeated_search_uses_cached_results(monkeypatch, cache):
+    calls = []
+
+    def fake_search(query, max_results):
+        calls.append(query)
+        return [{"title": "Python", "body": "Ett språk", "href": "https://python.org"}]
+
+    monkeypatch.setattr(internet_search, "_sync_search_duckduckgo", fake_search)
+    monkeypatch.setattr(internet_search, "get_fetch_cache", lambda: cache)
+
+    first = await internet_search.search_duckduckgo("Vad är Python?", fetch_pages_count=0)
+    second = await internet_search.search_duckduckgo("vad är python", fetch_pages_count=0)
+
+    assert first == second == ["Python - Ett språk\nhttps://python.org"]
+    assert calls == ["Vad är Python?"]
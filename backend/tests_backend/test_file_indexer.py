@@ -0,0 +1,121 @@
+import os
+import pytest
+from src.model.utils import file_indexer
+from src.model.utils.file_indexer import GitignoreMatcher, LocalFileIndexer, is_binary
+
+@pytest.fixture
+def tree(tmp_path):
+    repo = tmp_path / "repo"
+    (repo / "src" / "pkg").mkdir(parents=True)
+    (repo / "build").mkdir()
+    (repo / "src" / "app.py").write_text("print('app')\n")
+    (repo / "src" / "pkg" / "util.py").write_text("X = 1\n")
+    (repo / "src" / "debug.log").write_text("log\n")
+    (repo / "build" / "out.py").write_text("ignoreras\n")
+    (repo / "logo.png").write_bytes(b"\x89PNG\r\n\x1a\nutan-nul")
+    (repo / ".gitignore").write_text("*.log\n/build/\n")
+    return repo
+
+@pytest.fixture
+def indexer(tree, tmp_path):
+    return LocalFileIndexer(str(tree), cache_file=tmp_path / "index.sqlite", workers=4)
+
+def _count_reads(monkeypatch):
+    reads = []
+    original = file_indexer.read_text_file
+    monkeypatch.setattr(file_indexer, "read_text_file", lambda path: reads.append(path) or original(path))
+    return reads
+
+@pytest.mark.parametrize("pattern,path,is_dir,expected", [
+    ("*.log", "a/b/debug.log", False, True),
+    ("/build/", "build", True, True),
+    ("/build/", "src/build", True, False),
+    ("build/", "build", False, False),
+    ("docs/**/*.md", "docs/a/b/readme.md", False, True),
+    ("docs/**/*.md", "docs/readme.md", False, True),
+    ("**/cache", "x/y/cache", True, True),
+    ("src/*.py", "src/pkg/util.py", False, False),
+    ("file[0-9].txt", "file7.txt", False, True),
+    ("app", "application.py", False, False),
+])
+def test_gitignore_glob_semantics(pattern, path, is_dir, expected):
+    """Mönster matchas som glob, inte som delsträngar."""
+    assert GitignoreMatcher([pattern]).matches(path, is_dir) is expected
+
+def test_gitignore_negation_last_rule_wins():
+    matcher = GitignoreMatcher(["*.log", "!keep.log"])
+    assert matcher.matches("debug.log")
+    assert not matcher.matches("logs/keep.log")
+
+def test_binary_sniff():
+    assert is_binary(b"\x89PNG\r\n\x1a\n")
+    assert is_binary(b"abc\0def")
+    assert not is_binary("räksmörgås".encode())
+
+def test_cold_index_skips_ignored_and_binary_files(indexer):
+    files = indexer.refresh()
+    assert dict(files) == {
+        ".gitignore": "*.log\n/build/\n",
+        "src/app.py": "print('app')\n",
+        "src/pkg/util.py": "X = 1\n"
+    }
+    assert indexer.store.stats()["logo.png"][3] is True
+
+def test_unchanged_tree_reads_no_files(indexer, monkeypatch):
+    """En omindexering av ett oförändrat träd gör bara stat-anrop."""
+    indexer.refresh()
+    reads = _count_reads(monkeypatch)
+
+    files = indexer.refresh()
+
+    assert reads == []
+    assert set(files) == {".gitignore", "src/app.py", "src/pkg/util.py"}
+
+def test_only_changed_files_are_read(indexer, tree, monkeypatch):
+    indexer.refresh()
+    reads = _count_reads(monkeypatch)
+
+    (tree / "src" / "app.py").write_text("print('ny')\n")
+    os.remove(tree / "src" / "pkg" / "util.py")
+    (tree / "src" / "new.py").write_text("Y = 2\n")
+
+    files = indexer.refresh()
+
+    assert sorted(os.path.relpath(path, tree) for path in reads) == ["src/app.py", "src/new.py"]
+    assert dict(files) == {
+        ".gitignore": "*.log\n/build/\n",
+        "src/app.py": "print('ny')\n",
+        "src/new.py": "Y = 2\n"
+    }
+
+def test_file_that_becomes_binary_is_dropped(indexer, tree):
+    indexer.refresh()
+    (tree / "src" / "app.py").write_bytes(b"\x00\x01\x02")
+
+    assert "src/app.py" not in indexer.refresh()
+
+def test_update_paths_applies_single_file_changes(indexer, tree, monkeypatch):
+    """Watcherns sökvägar uppdateras fil för fil utan att trädet gås igenom."""
+    indexer.refresh()
+    monkeypatch.setattr(file_indexer, "scan_tree", lambda *args, **kwargs: pytest.fail("ingen full genomgång"))
+
+    (tree / "src" / "app.py").write_text("print('ny')\n")
+    os.remove(tree / "src" / "pkg" / "util.py")
+    (tree / "src" / "other.log").write_text("ignoreras\n")
+
+    files = indexer.update_paths(["src/app.py", "src/pkg/util.py", "src/other.log"])
+
+    assert dict(files) == {".gitignore": "*.log\n/build/\n", "src/app.py": "print('ny')\n"}
+    assert indexer.file_shas.keys() == files.keys()
+
+def test_update_paths_handles_removed_and_new_directories(indexer, tree):
+    indexer.refresh()
+    (tree / "lib").mkdir()
+    (tree / "lib" / "a.py").write_text("A = 1\n")
+    for path in (tree / "src" / "pkg").iterdir():
+        path.unlink()
+    (tree / "src" / "pkg").rmdir()
+
+    files = indexer.update_paths(["lib", "src/pkg"])
+
+    assert set(files) == {".gitignore", "src/app.py", "lib/a.py"}
@@ -0,0 +1,57 @@
+import zlib
+from src.model.utils.file_store import FileStore, git_blob_sha
+
+def test_identical_files_share_one_compressed_blob(tmp_path):
+    """Filer med samma innehåll lagras som en enda komprimerad blob."""
+    store = FileStore(tmp_path / "index.sqlite")
+    content = "x = 1\n" * 1000
+    store.update({
+        "a.py": {"sha": None, "content": content},
+        "b/a.py": {"sha": None, "content": content}
+    })
+
+    blobs = store._conn.execute("SELECT sha, size, data FROM blobs").fetchall()
+    assert len(blobs) == 1
+    sha, size, data = blobs[0]
+    assert sha == git_blob_sha(content.encode())
+    assert size == len(content)
+    assert len(data) < size / 10
+    assert zlib.decompress(data).decode() == content
+
+def test_sync_writes_only_changes_and_prunes_blobs(tmp_path):
+    """sync tar bort försvunna filer och deras blobbar, oförändrade filer behålls."""
+    store = FileStore(tmp_path / "index.sqlite")
+    store.update({"a.py": {"content": "a"}, "b.py": {"content": "b"}})
+    sha_a = store.shas()["a.py"]
+
+    store.sync({"a.py": {"sha": sha_a}, "c.py": {"content": "c"}})
+
+    assert set(store.shas()) == {"a.py", "c.py"}
+    assert store.read("a.py") == "a"
+    assert store._conn.execute("SELECT COUNT(*) FROM blobs").fetchone()[0] == 2
+
+def test_lazy_index_reads_content_on_access(tmp_path):
+    """Vyn läser bara sökvägar direkt, innehållet hämtas vid åtkomst."""
+    store = FileStore(tmp_path / "index.sqlite")
+    store.put("a.py", "print('a')")
+    index = store.index()
+
+    store.put("a.py", "print('b')")
+
+    assert list(index) == ["a.py"]
+    assert "a.py" in index
+    # Den gamla bloben är borta, vyn faller tillbaka på filens aktuella innehåll
+    assert index["a.py"] == "print('b')"
+    assert dict(index.items()) == {"a.py": "print('b')"}
+
+def test_meta_survives_reopen(tmp_path):
+    path = tmp_path / "index.sqlite"
+    store = FileStore(path)
+    store.put("a.py", "a")
+    store.set_meta(tree_sha="t1", etag=None)
+    store.close()
+
+    reopened = FileStore(path)
+    assert reopened.get_meta("tree_sha") == "t1"
+    assert reopened.get_meta("etag") is None
+    assert reopened.index() == {"a.py": "a"}
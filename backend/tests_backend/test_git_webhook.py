@@ -0,0 +1,57 @@
+import hashlib
+import hmac
+import json
+import pytest
+from flask import Flask
+from unittest.mock import patch
+from src.routes import gitwebhook
+
+SECRET = "hemlig"
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("GITHUB_WEBHOOK_SECRET", SECRET)
+    app = Flask(__name__)
+    app.register_blueprint(gitwebhook.bp)
+    return app.test_client()
+
+def _signature(body: bytes) -> str:
+    return "sha256=" + hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest()
+
+def test_push_with_valid_signature_is_applied_in_background(client):
+    body = json.dumps({"ref": "refs/heads/main", "commits": [{"added": ["a.py"], "modified": [], "removed": []}]}).encode()
+    with patch.object(gitwebhook.threading, "Thread") as thread:
+        response = client.post("/api/git/webhook", data=body, content_type="application/json", headers={
+            "X-GitHub-Event": "push",
+            "X-Hub-Signature-256": _signature(body)
+        })
+
+    assert response.status_code == 202
+    assert thread.call_args.kwargs["args"] == (json.loads(body),)
+    thread.return_value.start.assert_called_once()
+
+def test_invalid_signature_is_rejected(client):
+    body = b'{"ref": "refs/heads/main"}'
+    response = client.post("/api/git/webhook", data=body, content_type="application/json", headers={
+        "X-GitHub-Event": "push",
+        "X-Hub-Signature-256": "sha256=" + "0" * 64
+    })
+    assert response.status_code == 401
+
+def test_ping_event(client):
+    body = b"{}"
+    response = client.post("/api/git/webhook", data=body, content_type="application/json", headers={
+        "X-GitHub-Event": "ping",
+        "X-Hub-Signature-256": _signature(body)
+    })
+    assert response.get_json() == {"status": "pong"}
+
+def test_webhook_is_rejected_without_configured_secret(client, monkeypatch):
+    monkeypatch.delenv("GITHUB_WEBHOOK_SECRET")
+    body = b'{"ref": "refs/heads/main"}'
+    with patch.object(gitwebhook.threading, "Thread") as thread:
+        response = client.post("/api/git/webhook", data=body, content_type="application/json", headers={
+            "X-GitHub-Event": "push"
+        })
+    assert response.status_code == 401
+    thread.assert_not_called()
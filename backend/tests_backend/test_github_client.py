@@ -0,0 +1,146 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import patch
+from src.model.utils.github_client import GitHubClient, parse_link_header
+
+BASE = "https://api.github.com/repos/owner/repo"
+
+class FakeResponse:
+    def __init__(self, status, payload=None, headers=None):
+        self.status = status
+        self.payload = payload
+        self.headers = headers or {}
+
+    async def json(self):
+        return self.payload
+
+    async def __aenter__(self):
+        await asyncio.sleep(0.01)
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+class FakeSession:
+    """Svarar med sidor från pages (url -> (payload, headers)) och loggar alla anrop."""
+
+    def __init__(self, pages, etag=None, rate_limit=None):
+        self.pages = pages
+        self.etag = etag
+        self.rate_limit = rate_limit or {}
+        self.requests = []
+
+    def get(self, url, headers=None):
+        self.requests.append((url, dict(headers or {})))
+        if self.etag and (headers or {}).get("If-None-Match") == self.etag:
+            return FakeResponse(304, headers=dict(self.rate_limit))
+        payload, extra = self.pages.get(url, (None, {}))
+        if payload is None:
+            return FakeResponse(404, {"message": "Not Found"})
+        response_headers = dict(self.rate_limit, **extra)
+        if self.etag:
+            response_headers["ETag"] = self.etag
+        return FakeResponse(200, payload, response_headers)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+def _session(session):
+    return patch("src.model.utils.github_client.aiohttp.ClientSession", return_value=session)
+
+def _link(path, page, last):
+    return f'<{BASE}/{path}?per_page=100&page={page}>; rel="next", <{BASE}/{path}?per_page=100&page={last}>; rel="last"'
+
+@pytest.fixture
+def client():
+    client = GitHubClient("token", "owner", "repo")
+    client.debug = False
+    return client
+
+def test_parse_link_header():
+    links = parse_link_header('<https://x/a?page=2>; rel="next", <https://x/a?page=5>; rel="last"')
+    assert links == {"next": "https://x/a?page=2", "last": "https://x/a?page=5"}
+
+@pytest.mark.asyncio
+async def test_pagination_fetches_all_pages(client):
+    """Stora PR:er stannar inte vid första sidan (30/100 filer)."""
+    path = "pulls/7/files"
+    session = FakeSession({
+        f"{BASE}/{path}?per_page=100": ([{"filename": "a.py"}], {"Link": _link(path, 2, 3)}),
+        f"{BASE}/{path}?per_page=100&page=2": ([{"filename": "b.py"}], {}),
+        f"{BASE}/{path}?per_page=100&page=3": ([{"filename": "c.py"}], {})
+    })
+
+    with _session(session):
+        files = await client.get_paginated(path)
+
+    assert [file["filename"] for file in files] == ["a.py", "b.py", "c.py"]
+    assert len(session.requests) == 3
+
+@pytest.mark.asyncio
+async def test_commit_files_are_merged_across_pages(client):
+    path = "commits/abc1234"
+    session = FakeSession({
+        f"{BASE}/{path}?per_page=100": ({"sha": "abc1234", "files": [{"filename": "a.py"}]}, {"Link": _link(path, 2, 2)}),
+        f"{BASE}/{path}?per_page=100&page=2": ({"sha": "abc1234", "files": [{"filename": "b.py"}]}, {})
+    })
+
+    with _session(session):
+        commit = await client.get_commit("abc1234")
+
+    assert commit["sha"] == "abc1234"
+    assert [file["filename"] for file in commit["files"]] == ["a.py", "b.py"]
+
+@pytest.mark.asyncio
+async def test_identical_inflight_gets_share_one_request(client):
+    session = FakeSession({f"{BASE}/pulls/1": ({"number": 1}, {})})
+
+    with _session(session):
+        async with client.session():
+            results = await asyncio.gather(*(client.get_json("pulls/1") for _ in range(5)))
+
+    assert results == [{"number": 1}] * 5
+    assert len(session.requests) == 1
+
+@pytest.mark.asyncio
+async def test_etag_cache_serves_not_modified_responses(client):
+    session = FakeSession({f"{BASE}/pulls/1": ({"number": 1}, {})}, etag='"v1"')
+
+    with _session(session):
+        first = await client.get("pulls/1")
+        second = await client.get("pulls/1")
+
+    assert second.data == first.data == {"number": 1}
+    assert second.from_cache
+    assert session.requests[1][1]["If-None-Match"] == '"v1"'
+
+def test_throttle_spreads_remaining_requests_until_reset(client):
+    reset = time.time() + 100
+    client._update_rate_limit({"X-RateLimit-Remaining": "1000", "X-RateLimit-Reset": str(int(reset))})
+    assert client.throttle_delay() == 0
+
+    client._update_rate_limit({"X-RateLimit-Remaining": "10", "X-RateLimit-Reset": str(int(reset))})
+    assert 8 < client.throttle_delay() <= 10
+
+@pytest.mark.asyncio
+async def test_low_rate_limit_delays_next_request(client, monkeypatch):
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    reset = str(int(time.time()) + 30)
+    session = FakeSession(
+        {f"{BASE}/pulls/1": ({"number": 1}, {})},
+        rate_limit={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": reset}
+    )
+    with _session(session):
+        await client.get("pulls/1", cache=False)
+        monkeypatch.setattr("src.model.utils.github_client.asyncio.sleep", fake_sleep)
+        await client.get("pulls/1", cache=False)
+
+    assert 25 < sleeps[0] <= 30
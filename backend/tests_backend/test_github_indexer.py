@@ -0,0 +1,178 @@
+import base64
+import io
+import tarfile
+import pytest
+from unittest.mock import patch
+from src.model.utils.github_indexer import GitHubIndexer, git_blob_sha
+
+class FakeContent:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    async def iter_chunked(self, size):
+        for start in range(0, len(self.data), size):
+            yield self.data[start:start + size]
+
+class FakeResponse:
+    def __init__(self, status, payload=None, headers=None, body=b""):
+        self.status = status
+        self.payload = payload
+        self.headers = headers or {}
+        self.content = FakeContent(body)
+
+    async def json(self):
+        return self.payload
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+class FakeSession:
+    """Spelar upp ett fast GitHub-API och loggar alla anrop."""
+
+    def __init__(self, tree, blobs, etag='"tree-etag"', tarball=b"", contents=None):
+        self.tree = tree
+        self.blobs = blobs
+        self.etag = etag
+        self.tarball = tarball
+        self.contents = contents or {}
+        self.requests = []
+
+    def get(self, url, headers=None):
+        self.requests.append((url, dict(headers or {})))
+        if "/git/trees/" in url:
+            if (headers or {}).get("If-None-Match") == self.etag:
+                return FakeResponse(304)
+            return FakeResponse(200, self.tree, {"ETag": self.etag})
+        if "/tarball/" in url:
+            return FakeResponse(200, headers={"X-RateLimit-Remaining": "42"}, body=self.tarball)
+        if "/contents/" in url:
+            path = url.split("/contents/", 1)[1].split("?", 1)[0]
+            sha, data = self.contents[path]
+            return FakeResponse(200, {"sha": sha, "encoding": "base64", "content": base64.b64encode(data).decode()})
+        sha = url.rsplit("/", 1)[-1]
+        blob = self.blobs[sha]
+        content = base64.b64encode(blob if isinstance(blob, bytes) else blob.encode()).decode()
+        return FakeResponse(200, {"content": content})
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+def _tree(sha, files):
+    return {
+        "sha": sha,
+        "tree": [{"path": path, "type": "blob", "sha": blob} for path, blob in files.items()]
+    }
+
+@pytest.fixture
+def indexer(tmp_path):
+    indexer = GitHubIndexer("token", "owner", "repo")
+    indexer.cache_file = tmp_path / "index.sqlite"
+    indexer.debug = False
+    return indexer
+
+async def _index(indexer, session, force_refresh=True):
+    with patch("src.model.utils.github_client.aiohttp.ClientSession", return_value=session):
+        return await indexer.index_repo(force_refresh=force_refresh)
+
+@pytest.mark.asyncio
+async def test_unchanged_repo_is_one_conditional_request(indexer):
+    blobs = {"b1": "print('a')", "b2": "print('b')"}
+    first = FakeSession(_tree("t1", {"a.py": "b1", "b.py": "b2"}), blobs)
+    assert await _index(indexer, first) == {"a.py": "print('a')", "b.py": "print('b')"}
+    assert len(first.requests) == 3
+
+    second = FakeSession(first.tree, blobs)
+    assert await _index(indexer, second) == {"a.py": "print('a')", "b.py": "print('b')"}
+    assert len(second.requests) == 1
+    assert second.requests[0][1]["If-None-Match"] == '"tree-etag"'
+
+@pytest.mark.asyncio
+async def test_empty_and_binary_files_do_not_break_conditional_refresh(indexer):
+    """En tom fil är giltigt innehåll och binära blobbar laddas inte ner igen."""
+    blobs = {"b1": "print('a')", "empty": "", "png": b"\x89PNG\r\n\x1a\n\xff\xfe"}
+    tree = _tree("t1", {"a.py": "b1", "pkg/__init__.py": "empty", "logo.png": "png"})
+    first = FakeSession(tree, blobs)
+    assert await _index(indexer, first) == {"a.py": "print('a')", "pkg/__init__.py": ""}
+
+    for _ in range(2):
+        again = FakeSession(tree, blobs)
+        assert await _index(indexer, again) == {"a.py": "print('a')", "pkg/__init__.py": ""}
+        assert [headers.get("If-None-Match") for _, headers in again.requests] == ['"tree-etag"']
+
+    # Även när trädet ändras hoppas den oförändrade binärfilen över
+    indexer.tree_etag = None
+    changed = FakeSession(_tree("t2", {"a.py": "b1", "pkg/__init__.py": "empty", "logo.png": "png"}), blobs)
+    await _index(indexer, changed)
+    assert [url for url, _ in changed.requests if "/git/blobs/" in url] == []
+
+@pytest.mark.asyncio
+async def test_only_changed_blobs_are_downloaded(indexer):
+    blobs = {"b1": "print('a')", "b2": "print('b')", "b3": "print('c')"}
+    await _index(indexer, FakeSession(_tree("t1", {"a.py": "b1", "b.py": "b2"}), blobs))
+
+    changed = FakeSession(_tree("t2", {"a.py": "b1", "b.py": "b3"}), blobs, etag='"new-etag"')
+    result = await _index(indexer, changed)
+
+    assert result == {"a.py": "print('a')", "b.py": "print('c')"}
+    fetched = [url for url, _ in changed.requests if "/git/blobs/" in url]
+    assert fetched == ["https://api.github.com/repos/owner/repo/git/blobs/b3"]
+    assert indexer.file_shas == {"a.py": "b1", "b.py": "b3"}
+    assert indexer.store.get_meta("tree_sha") == "t2"
+
+def _make_tarball(files: dict) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for path, data in files.items():
+            info = tarfile.TarInfo(f"owner-repo-abc123/{path}")
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+@pytest.mark.asyncio
+async def test_tarball_mode_streams_whole_repo_in_one_request(indexer):
+    indexer.fetch_mode = "tarball"
+    files = {
+        "app.py": b"print('app')",
+        "src/util.py": b"def util():\n    pass\n",
+        "node_modules/lib.js": b"ignored",
+        "logo.png": b"\x89PNG\r\n\x1a\n\xff\xfe",
+        "big.py": b"x = 1\n" * 50000
+    }
+    session = FakeSession(_tree("t1", {}), {}, tarball=_make_tarball(files))
+    result = await _index(indexer, session)
+
+    assert set(result) == {"app.py", "src/util.py", "big.py"}
+    assert result["src/util.py"] == "def util():\n    pass\n"
+    assert indexer.file_shas["app.py"] == git_blob_sha(b"print('app')")
+    assert [url for url, _ in session.requests if "/git/blobs/" in url] == []
+    assert sum("/tarball/" in url for url, _ in session.requests) == 1
+    # Arkivhämtningen går via klienten och räknas mot kvoten
+    assert indexer.client.rate_limit_remaining == 42
+
+def test_git_blob_sha_matches_git():
+    # `echo -n "hello" | git hash-object --stdin`
+    assert git_blob_sha(b"hello") == "b6fc4c620b67d95f953a5c1c1230aaab5db5a1b0"
+
+@pytest.mark.asyncio
+async def test_push_update_fetches_only_pushed_files(indexer):
+    blobs = {"b1": "print('a')", "b2": "print('b')"}
+    await _index(indexer, FakeSession(_tree("t1", {"a.py": "b1", "b.py": "b2"}), blobs))
+
+    session = FakeSession(None, {}, contents={"c.py": ("b3", b"print('c')"), "img.bin": ("b4", b"\xff\xfe")})
+    with patch("src.model.utils.github_client.aiohttp.ClientSession", return_value=session):
+        result = await indexer.update_files(["c.py", "img.bin"], ["b.py"], ref="abc123")
+
+    assert dict(result) == {"a.py": "print('a')", "c.py": "print('c')"}
+    assert [url for url, _ in session.requests] == [
+        "https://api.github.com/repos/owner/repo/contents/c.py?ref=abc123",
+        "https://api.github.com/repos/owner/repo/contents/img.bin?ref=abc123"
+    ]
+    assert indexer.file_shas == {"a.py": "b1", "c.py": "b3"}
+    # Nästa refresh hämtar trädet utan villkor eftersom storen ändrats
+    assert indexer.store.get_meta("etag") is None
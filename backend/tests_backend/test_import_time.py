@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Samlad importtid i mikrosekunder som backend-paketet får kosta
+IMPORT_TIME_BUDGET_US = int(os.getenv("IMPORT_TIME_BUDGET_US", "1000000"))
+HEAVY_MODULES = ("torch", "transformers", "duckduckgo_search")
+
+STARTUP = (
+    "import sys; "
+    "from src import create_app; "
+    "app = create_app(warm_up=False); "
+    "import src.routes.supervisorroute, src.routes.knowledge; "
+    f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+)
+
+def _run_with_importtime(statement: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+def _total_import_time_us(stderr: str) -> int:
+    """Summerar self-tiden för alla importer i -X importtime-utskriften."""
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us = line.split("|")[0].replace("import time:", "").strip()
+        total += int(self_us)
+    return total
+
+def test_startup_does_not_load_heavy_modules():
+    result = _run_with_importtime(STARTUP)
+    assert result.stdout.strip() == "", f"Tunga moduler laddades vid start: {result.stdout.strip()}"
+
+def test_startup_import_time_within_budget():
+    result = _run_with_importtime(STARTUP)
+    total = _total_import_time_us(result.stderr)
+    assert total < IMPORT_TIME_BUDGET_US, (
+        f"Importtiden {total / 1000:.0f} ms överskrider budgeten "
+        f"{IMPORT_TIME_BUDGET_US / 1000:.0f} ms"
+    )
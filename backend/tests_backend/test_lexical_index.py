@@ -0,0 +1,84 @@
+from src.model.vector_store.lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize
+from src.model.vector_store.sharded_store import ShardedVectorStore, RESEARCH_SHARD, KNOWLEDGE_SHARDS
+from tests_backend.test_vector_store import FakeCollection
+
+DOCS = [
+    {"_id": 1, "query": "pip fel", "chunk": "Felkoden ERR_SSL_PROTOCOL_ERROR betyder att TLS-handskakningen misslyckades",
+     "partition_id": "p1", "chunk_index": 0, "embedding": [1.0, 0.0, 0.0]},
+    {"_id": 2, "query": "python", "chunk": "Python är ett programspråk som är lätt att lära sig",
+     "partition_id": "p2", "chunk_index": 0, "embedding": [0.0, 1.0, 0.0]},
+    {"_id": 3, "query": "python", "chunk": "Python används för dataanalys och maskininlärning",
+     "partition_id": "p2", "chunk_index": 1, "embedding": [0.0, 0.9, 0.1]}
+]
+
+def test_tokenize_keeps_error_codes():
+    assert "err_ssl_protocol_error" in tokenize("Fick ERR_SSL_PROTOCOL_ERROR i Chrome")
+
+def test_bm25_ranks_rare_terms_and_reports_coverage():
+    index = LexicalIndex(DOCS)
+    hits = index.search("vad betyder ERR_SSL_PROTOCOL_ERROR")
+
+    assert hits[0]["doc_id"] == "1"
+    assert hits[0]["metadata"] == {"partition_id": "p1", "chunk_index": 0}
+    # "vad" finns inte i korpusen och räknas som saknat ord med högsta idf
+    assert 0.4 < hits[0]["coverage"] < 0.6
+    assert index.search("helt okänt ord") == []
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "a"]], k=60)
+    assert max(fused, key=fused.get) in ("a", "b")
+    assert fused["c"] < fused["a"]
+    weighted = reciprocal_rank_fusion([["a"], ["b"]], weights=[1.0, 2.0])
+    assert weighted["b"] > weighted["a"]
+
+def test_hybrid_search_finds_keyword_hits_below_dense_threshold():
+    store = ShardedVectorStore(FakeCollection([dict(doc) for doc in DOCS]))
+    # Frågevektorn ligger nära python-chunkarna, men felkoden står bara i chunk 1
+    query_vector = [0.2, 1.0, 0.0]
+
+    dense_only = store.search(query_vector, top_k=1, threshold=0.85, shards=KNOWLEDGE_SHARDS)
+    hybrid = store.hybrid_search("ERR_SSL_PROTOCOL_ERROR", query_vector, top_k=1, threshold=0.99, shards=KNOWLEDGE_SHARDS)
+
+    assert dense_only[0]["query"] == "python"
+    assert hybrid[0]["doc_id"] == "1"
+    assert hybrid[0]["coverage"] == 1.0 and hybrid[0]["score"] == 1.0
+    assert hybrid[0]["metadata"]["partition_id"] == "p1"
+
+def test_hybrid_search_fuses_both_rankings():
+    store = ShardedVectorStore(FakeCollection([dict(doc) for doc in DOCS]))
+    hits = store.hybrid_search("python dataanalys", [0.0, 0.9, 0.1], top_k=3, threshold=0.5, shards=KNOWLEDGE_SHARDS)
+
+    assert [hit["doc_id"] for hit in hits[:2]] == ["3", "2"]
+    assert hits[0]["rrf"] > hits[1]["rrf"]
+    # Den täta träffen fick partition_id från Mongo-dokumentet via BM25-indexet
+    assert hits[0]["metadata"]["partition_id"] == "p2"
+
+def test_lexical_index_is_rebuilt_after_reindex():
+    collection = FakeCollection([dict(doc) for doc in DOCS])
+    store = ShardedVectorStore(collection)
+    assert store.lexical_search("flamingos", shards=[RESEARCH_SHARD]) == []
+
+    collection.insert_one({"_id": 4, "query": "fåglar", "chunk": "Flamingos är rosa", "embedding": [0.0, 0.0, 1.0]})
+    store.reindex(RESEARCH_SHARD)
+
+    assert [hit["doc_id"] for hit in store.lexical_search("flamingos", shards=[RESEARCH_SHARD])] == ["4"]
+
+def test_new_entries_extend_the_lexical_index_without_rebuilding():
+    """Nya chunks läggs till i det befintliga BM25-indexet; hela sharden läses inte om."""
+    collection = FakeCollection([dict(doc) for doc in DOCS])
+    store = ShardedVectorStore(collection)
+    before = store.lexical_index(RESEARCH_SHARD)
+
+    collection.insert_one({"_id": "n4", "query": "fåglar", "chunk": "Flamingos är rosa", "embedding": [0.0, 0.0, 1.0]})
+    reads = []
+    original = collection.find
+    collection.find = lambda query=None, projection=None: reads.append(query) or original(query, projection)
+    store.add_entries([{"query": "fåglar", "embedding": [0.0, 0.0, 1.0], "doc_id": "n4"}], shard=RESEARCH_SHARD)
+    # Utökningen körs i storens trådpool
+    store.flush()
+
+    after = store.lexical_index(RESEARCH_SHARD)
+    assert after is not before and len(after) == len(before) + 1
+    assert [hit["doc_id"] for hit in store.lexical_search("flamingos", shards=[RESEARCH_SHARD])] == ["n4"]
+    assert all(query["_id"] == {"$in": ["n4"]} for query in reads)
+    assert len(before) == 3 and before.search("flamingos") == []
@@ -0,0 +1,131 @@
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock
+from src.model.lifecycle import Lifecycle, READY, FAILED
+
+@pytest.mark.asyncio
+async def test_concurrent_ensure_runs_init_once():
+    calls = []
+
+    async def init():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+
+    lifecycle = Lifecycle()
+    lifecycle.register("git_agent", init)
+    await asyncio.gather(*(lifecycle.ensure("git_agent") for _ in range(10)))
+
+    assert calls == [1]
+    assert lifecycle.state("git_agent") == READY
+
+def test_single_flight_across_event_loops():
+    """Flask kör varje förfrågan i en egen event loop och tråd."""
+    calls = []
+
+    def init():
+        calls.append(1)
+        time.sleep(0.1)
+
+    lifecycle = Lifecycle()
+    lifecycle.register("index", init)
+    threads = [threading.Thread(target=asyncio.run, args=(lifecycle.ensure("index"),)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert lifecycle.ready
+
+@pytest.mark.asyncio
+async def test_failed_init_is_retried():
+    attempts = []
+
+    async def init():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("GitHub nere")
+
+    lifecycle = Lifecycle()
+    lifecycle.register("git_agent", init)
+    with pytest.raises(ConnectionError):
+        await lifecycle.ensure("git_agent")
+    assert lifecycle.status()["components"]["git_agent"] == {"state": FAILED, "seconds": None, "error": "GitHub nere"}
+
+    await lifecycle.ensure("git_agent")
+    assert len(attempts) == 2 and lifecycle.ready
+
+@pytest.mark.asyncio
+async def test_ensure_all_runs_components_concurrently():
+    async def slow():
+        await asyncio.sleep(0.1)
+
+    lifecycle = Lifecycle()
+    for name in ("a", "b", "c"):
+        lifecycle.register(name, slow)
+    lifecycle.register("d", lambda: time.sleep(0.1))
+
+    start = time.perf_counter()
+    errors = await lifecycle.ensure_all()
+
+    assert errors == {"a": None, "b": None, "c": None, "d": None}
+    assert time.perf_counter() - start < 0.3
+
+def test_status_route_reports_readiness(monkeypatch):
+    from flask import Flask
+    from src.routes import status
+
+    lifecycle = Lifecycle()
+    lifecycle.register("vector_store", lambda: None)
+    monkeypatch.setattr(status, "get_lifecycle", lambda: lifecycle)
+    app = Flask(__name__)
+    app.register_blueprint(status.bp)
+    client = app.test_client()
+
+    assert client.get("/status/ready").status_code == 503
+    assert client.get("/status/").get_json()["components"]["vector_store"]["state"] == "pending"
+
+    asyncio.run(lifecycle.ensure("vector_store"))
+    assert client.get("/status/ready").status_code == 200
+    assert client.get("/status/").get_json()["ready"] is True
+
+@pytest.mark.asyncio
+async def test_git_agent_cold_start_indexes_once(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "app.py").write_text("print('app')\n")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("GIT_LOCAL_REPO_PATH", str(repo))
+    monkeypatch.setenv("GIT_LOCAL_SOURCE", "worktree")
+    monkeypatch.setenv("GIT_WATCH", "0")
+    from src.model.agents.git_agent import GitAgent
+
+    agent = GitAgent(MagicMock())
+    calls = []
+    original = agent.github_indexer.index_repo
+
+    async def counting_index_repo(*args, **kwargs):
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return await original(*args, **kwargs)
+
+    agent.github_indexer.index_repo = counting_index_repo
+    await asyncio.gather(*(agent.handle("git: help") for _ in range(5)))
+
+    assert calls == [1]
+    assert "app.py" in agent.file_index
+
+@pytest.mark.asyncio
+async def test_ready_component_is_not_replaced_by_new_init():
+    calls = []
+    lifecycle = Lifecycle()
+    lifecycle.register("git_agent", lambda: calls.append("första"))
+    await lifecycle.ensure("git_agent")
+
+    # En andra GitAgent registrerar sin egen bundna metod
+    lifecycle.register("git_agent", lambda: calls.append("andra"))
+    await lifecycle.ensure("git_agent")
+
+    assert calls == ["första"]
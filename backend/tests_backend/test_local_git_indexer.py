@@ -0,0 +1,152 @@
+import subprocess
+import pytest
+from src.model.utils.github_indexer import git_blob_sha
+from src.model.utils.local_git_indexer import LocalGitIndexer
+
+def git(cwd, *args):
+    return subprocess.run(
+        ["git", "-c", "user.name=Test", "-c", "user.email=test@example.com", *args],
+        cwd=cwd, capture_output=True, text=True, check=True
+    ).stdout.strip()
+
+@pytest.fixture
+def repos(tmp_path, monkeypatch):
+    """Skapar ett upstream-repo och en klon av det."""
+    # Indexets SQLite-fil skrivs i arbetskatalogen
+    monkeypatch.chdir(tmp_path)
+    upstream = tmp_path / "upstream"
+    upstream.mkdir()
+    git(upstream, "init", "-q", "-b", "main")
+    (upstream / "app.py").write_text("def main():\n    return 1\n")
+    (upstream / "data").mkdir()
+    (upstream / "data" / "cache.txt").write_text("ignoreras\n")
+    (upstream / "logo.png").write_bytes(b"\x89PNG\r\n\x1a\n\xff\xfe")
+    git(upstream, "add", ".")
+    git(upstream, "commit", "-q", "-m", "Första commit")
+
+    clone = tmp_path / "clone"
+    git(tmp_path, "clone", "-q", str(upstream), str(clone))
+    return upstream, clone
+
+@pytest.mark.asyncio
+async def test_index_reads_blobs_from_clone(repos):
+    """Indexet byggs från klonens objekt och filtrerar bort data/ och binärfiler."""
+    _, clone = repos
+    indexer = LocalGitIndexer(str(clone))
+
+    files = await indexer.index_repo()
+
+    assert files == {"app.py": "def main():\n    return 1\n"}
+    assert indexer.file_shas["app.py"] == git_blob_sha(b"def main():\n    return 1\n")
+
+@pytest.mark.asyncio
+async def test_refresh_fetches_and_reads_only_changed_blobs(repos):
+    """force_refresh kör git fetch och läser bara om ändrade blobbar."""
+    upstream, clone = repos
+    indexer = LocalGitIndexer(str(clone))
+    await indexer.index_repo()
+
+    (upstream / "util.py").write_text("X = 1\n")
+    git(upstream, "add", ".")
+    git(upstream, "commit", "-q", "-m", "Lägg till util")
+
+    read = []
+    original = indexer.read_blobs
+    indexer.read_blobs = lambda shas: read.extend(shas) or original(shas)
+
+    files = await indexer.index_repo(force_refresh=True)
+
+    assert set(files) == {"app.py", "util.py"}
+    assert read == [git_blob_sha(b"X = 1\n")]
+
+@pytest.mark.asyncio
+async def test_unchanged_tree_skips_reading(repos):
+    """Om trädet är oförändrat läses inga blobbar."""
+    _, clone = repos
+    indexer = LocalGitIndexer(str(clone))
+    await indexer.index_repo()
+
+    indexer.read_blobs = lambda shas: pytest.fail("inga blobbar ska läsas")
+    files = await indexer.index_repo(force_refresh=True)
+
+    assert set(files) == {"app.py"}
+
+@pytest.mark.asyncio
+async def test_index_persists_between_instances(repos):
+    """En ny indexerare återanvänder storen på disk utan att läsa blobbar."""
+    _, clone = repos
+    await LocalGitIndexer(str(clone)).index_repo()
+
+    indexer = LocalGitIndexer(str(clone))
+    indexer.read_blobs = lambda shas: pytest.fail("inga blobbar ska läsas")
+    files = await indexer.index_repo()
+
+    assert files["app.py"] == "def main():\n    return 1\n"
+
+def test_get_commit_matches_github_format(repos):
+    """get_commit returnerar samma struktur som GitHubs commits-API."""
+    upstream, _ = repos
+    (upstream / "app.py").write_text("def main():\n    return 2\n")
+    git(upstream, "commit", "-q", "-am", "Ändra returvärde")
+    sha = git(upstream, "rev-parse", "HEAD")
+
+    commit = LocalGitIndexer(str(upstream)).get_commit(sha[:7])
+
+    assert commit["sha"] == sha
+    assert commit["commit"]["author"]["name"] == "Test"
+    assert commit["commit"]["message"] == "Ändra returvärde"
+    assert commit["files"] == [{
+        "filename": "app.py",
+        "additions": 1,
+        "deletions": 1,
+        "patch": "@@ -1,2 +1,2 @@\n def main():\n-    return 1\n+    return 2"
+    }]
+
+@pytest.mark.asyncio
+async def test_binary_files_are_not_reread_after_restart(repos):
+    """Binärfilernas SHA:er sparas i storen, så en ny indexerare läser inte om dem."""
+    upstream, clone = repos
+    await LocalGitIndexer(str(clone)).index_repo()
+
+    (upstream / "util.py").write_text("X = 1\n")
+    git(upstream, "add", ".")
+    git(upstream, "commit", "-q", "-m", "Lägg till util")
+
+    indexer = LocalGitIndexer(str(clone))
+    read = []
+    original = indexer.read_blobs
+    indexer.read_blobs = lambda shas: read.extend(shas) or original(shas)
+    await indexer.index_repo(force_refresh=True)
+
+    assert read == [git_blob_sha(b"X = 1\n")]
+
+def test_get_commit_keeps_patch_for_renamed_file(repos):
+    """En omdöpt fil får sin diff och samma filnamn som i GitHubs svar."""
+    upstream, _ = repos
+    (upstream / "src").mkdir()
+    git(upstream, "mv", "app.py", "src/app.py")
+    (upstream / "src" / "app.py").write_text("def main():\n    return 1\n\nmain()\n")
+    git(upstream, "commit", "-q", "-am", "Flytta app")
+
+    commit = LocalGitIndexer(str(upstream)).get_commit("HEAD")
+
+    assert commit["files"] == [{
+        "filename": "src/app.py",
+        "previous_filename": "app.py",
+        "additions": 2,
+        "deletions": 0,
+        "patch": "@@ -1,2 +1,4 @@\n def main():\n     return 1\n+\n+main()"
+    }]
+
+def test_get_commit_unknown_hash_returns_none(repos):
+    _, clone = repos
+    assert LocalGitIndexer(str(clone)).get_commit("deadbeef") is None
+
+def test_get_commit_rejects_option_like_hash(repos, tmp_path):
+    """Text från användaren får inte tolkas som flaggor till git."""
+    _, clone = repos
+    target = tmp_path / "written-by-git"
+    indexer = LocalGitIndexer(str(clone))
+    assert indexer.get_commit(f"--output={target}") is None
+    assert indexer.get_commit("--all") is None
+    assert not target.exists()
@@ -0,0 +1,144 @@
+import threading
+import time
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.model.tools import internet_search, page_fetcher
+from src.model.tools.page_fetcher import PageFetcher, extract_text
+
+ARTICLE = """<html><head><title>Python</title><script>var x = 1;</script></head>
+<body><nav>Hem | Om oss</nav>
+<article><h1>Vad är Python?</h1><p>Python är ett   programspråk.</p><p>Det är lätt att läsa.</p></article>
+<footer>Copyright</footer></body></html>"""
+
+class FixtureServer:
+    """Lokal HTTP-server som står för internet i testerna. Loggar samtidiga anslutningar."""
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.requests = []
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with server.lock:
+                    server.active += 1
+                    server.peak = max(server.peak, server.active)
+                    server.requests.append((self.path, dict(self.headers)))
+                try:
+                    time.sleep(server.delay)
+                    status, content_type, body, headers = server.route(self.path, self.headers)
+                    self.send_response(status)
+                    self.send_header("Content-Type", content_type)
+                    self.send_header("Content-Length", str(len(body)))
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Klienten gav upp (timeout eller storleksgräns)
+                    pass
+                finally:
+                    with server.lock:
+                        server.active -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def route(self, path, headers):
+        if path.startswith("/article"):
+            return 200, "text/html; charset=utf-8", ARTICLE.encode(), {}
+        if path.startswith("/etag"):
+            # Svarar 304 på rätt If-None-Match, max-age=0 gör posten inaktuell direkt
+            cache_headers = {"ETag": '"v1"', "Cache-Control": "max-age=0"}
+            if headers.get("If-None-Match") == '"v1"':
+                return 304, "text/html", b"", cache_headers
+            return 200, "text/html; charset=utf-8", ARTICLE.encode(), cache_headers
+        if path == "/no-store":
+            return 200, "text/html", ARTICLE.encode(), {"Cache-Control": "no-store"}
+        if path == "/big":
+            return 200, "text/html", b"<p>" + b"x " * 500000 + b"</p>", {}
+        if path == "/image":
+            return 200, "image/png", b"\x89PNG", {}
+        return 404, "text/html", b"not found", {}
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+@pytest.fixture
+def fetcher():
+    fetcher = PageFetcher(concurrency=8, per_host=8, timeout=5)
+    fetcher.debug = False
+    return fetcher
+
+def test_extract_text_keeps_article_and_drops_boilerplate():
+    title, text = extract_text(ARTICLE)
+    assert title == "Python"
+    assert text == "Vad är Python?\nPython är ett programspråk.\nDet är lätt att läsa."
+
+@pytest.mark.asyncio
+async def test_pages_are_fetched_concurrently(fetcher):
+    with FixtureServer(delay=0.2) as server:
+        urls = [f"{server.base}/article/{i}" for i in range(5)]
+        start = time.perf_counter()
+        pages = await fetcher.fetch_all(urls)
+        elapsed = time.perf_counter() - start
+
+    assert [page["url"] for page in pages] == urls
+    assert all(page["title"] == "Python" and "programspråk" in page["text"] for page in pages)
+    assert elapsed < 0.6
+    assert server.peak > 1
+
+@pytest.mark.asyncio
+async def test_per_host_limit_is_respected(fetcher):
+    fetcher.per_host = 2
+    with FixtureServer(delay=0.1) as server:
+        await fetcher.fetch_all([f"{server.base}/article/{i}" for i in range(6)])
+    assert server.peak == 2
+
+@pytest.mark.asyncio
+async def test_failures_and_caps_do_not_affect_other_pages(fetcher):
+    fetcher.max_bytes = 1000
+    fetcher.max_chars = 100
+    with FixtureServer(delay=0.0) as server:
+        missing, image, big, article = await fetcher.fetch_all([
+            f"{server.base}/missing", f"{server.base}/image", f"{server.base}/big", f"{server.base}/article"
+        ])
+
+    assert missing["error"] == "HTTP 404" and missing["text"] == ""
+    assert "image/png" in image["error"]
+    assert big["error"] is None and len(big["text"]) <= 102
+    assert "programspråk" in article["text"]
+
+@pytest.mark.asyncio
+async def test_timeout_is_reported_as_error(fetcher):
+    fetcher.timeout = 0.1
+    with FixtureServer(delay=0.5) as server:
+        [page] = await fetcher.fetch_all([f"{server.base}/article"])
+    assert page["error"] and page["text"] == ""
+
+@pytest.mark.asyncio
+async def test_search_results_include_page_text(monkeypatch, fetcher):
+    with FixtureServer(delay=0.0) as server:
+        results = [
+            {"title": "Python", "body": "Ett språk", "href": f"{server.base}/article"},
+            {"title": "Borta", "body": "Finns inte", "href": f"{server.base}/missing"}
+        ]
+        monkeypatch.setattr(internet_search, "_sync_search_duckduckgo", lambda query, max_results: results)
+        monkeypatch.setattr(page_fetcher, "_fetcher", fetcher)
+        monkeypatch.setattr(internet_search, "get_fetch_cache", lambda: None)
+        found = await internet_search.search_duckduckgo("vad är python", fetch_pages_count=2)
+
+    assert found[0].startswith(f"Python - Ett språk\n{server.base}/article\n\n")
+    assert "Det är lätt att läsa." in found[0]
+    assert found[1] == f"Borta - Finns inte\n{server.base}/missing"
@@ -0,0 +1,95 @@
+import pytest
+from src.model.utils.path_index import PathIndex, module_name, tokenize
+
+FILES = {
+    "app.py": "from src import create_app\napp = create_app()\n",
+    "src/__init__.py": "def create_app():\n    pass\n",
+    "src/model/utils/embedding.py": "def get_embedding_from_llm(text):\n    return tokenizer(text)\n",
+    "src/model/utils/chunking.py": "from src.model.utils.embedding import get_tokenizer\n",
+    "tests/utils/embedding.py": "# testhjälpare\n",
+    "README.md": "# Multi-Agent System\nEtt system med AI-agenter.\n",
+}
+
+@pytest.fixture
+def index():
+    return PathIndex(FILES)
+
+def test_find_file_matches_whole_path_components(index):
+    assert index.find_file("app.py") == "app.py"
+    assert index.find_files("embedding.py") == ["tests/utils/embedding.py", "src/model/utils/embedding.py"]
+    assert index.find_file("model/utils/embedding.py") == "src/model/utils/embedding.py"
+    # Utan filändelse faller uppslaget tillbaka på delsträngar i sökvägen
+    assert index.find_file("chunk") == "src/model/utils/chunking.py"
+    assert index.find_file("saknas.py") is None
+
+def test_resolve_module(index):
+    assert module_name("src/__init__.py") == "src"
+    assert index.resolve_module("src.model.utils.embedding") == "src/model/utils/embedding.py"
+    assert index.resolve_module("src") == "src/__init__.py"
+    assert index.resolve_module("utils.chunking") == "src/model/utils/chunking.py"
+    assert index.resolve_module("os") is None
+
+@pytest.mark.parametrize("query", [
+    "tokenizer", "okeniz", "create_app()", "return tokenizer(te", "ai-agenter", "EMBEDDING", "utils/emb", "saknas helt"
+])
+def test_search_matches_linear_substring_scan(index, query):
+    """Tokenindexet ger samma träffar som en linjär sökning i sökvägar och innehåll."""
+    expected = sorted(
+        path for path, content in FILES.items()
+        if query.lower() in path.lower() or query.lower() in content.lower()
+    )
+    assert index.search(query, FILES) == expected
+
+def test_single_token_candidates_use_trigrams(index):
+    assert index.candidates("okeniz") == {"src/model/utils/embedding.py", "src/model/utils/chunking.py"}
+    assert index.candidates("zzzz") == set()
+    # Kortare än ett trigram jämförs mot hela ordförrådet
+    assert index.candidates("ai") == {"README.md"}
+
+def test_swedish_identifiers_are_single_tokens():
+    assert tokenize("def räkna_ålder(född):") == ["def", "räkna_ålder", "född"]
+    files = {"ålder.py": "def räkna_ålder(född):\n    return 2024 - född\n", "annat.py": "kna = 1\n"}
+    index = PathIndex(files)
+    assert index.candidates("räkna_ål") == {"ålder.py"}
+    assert index.search("Räkna_Ålder", files) == ["ålder.py"]
+
+def test_search_only_reads_candidate_files(index):
+    class CountingIndex(dict):
+        reads = []
+
+        def get(self, path, default=None):
+            self.reads.append(path)
+            return super().get(path, default)
+
+    files = CountingIndex(FILES)
+    assert index.search("get_tokenizer", files) == ["src/model/utils/chunking.py"]
+    assert files.reads == ["src/model/utils/chunking.py"]
+
+def test_incremental_update(index):
+    files = dict(FILES)
+    del files["src/model/utils/chunking.py"]
+    files["src/model/utils/new.py"] = "def helper():\n    return tokenizer\n"
+    files["app.py"] = "print('ny')\n"
+
+    index.update(files, ["src/model/utils/new.py", "app.py"], ["src/model/utils/chunking.py"])
+
+    assert index.find_file("chunking.py") is None
+    assert index.resolve_module("utils.chunking") is None
+    assert index.resolve_module("src.model.utils.new") == "src/model/utils/new.py"
+    assert index.search("helper", files) == ["src/model/utils/new.py"]
+    assert index.search("create_app", files) == ["src/__init__.py"]
+
+def test_update_maintains_vocabulary_without_rebuilding(index, monkeypatch):
+    """Ordförrådet och trigramkartan uppdateras per token, inte genom en ny sortering."""
+    monkeypatch.setattr(index, "_build_vocabulary", lambda: pytest.fail("ingen full ombyggnad"))
+    files = dict(FILES)
+    del files["README.md"]
+    files["src/model/utils/new.py"] = "def räkna_ålder():\n    return tokenizer\n"
+
+    index.update(files, ["src/model/utils/new.py"], ["README.md"])
+
+    fresh = PathIndex(files)
+    assert index._vocabulary == fresh._vocabulary
+    assert index._reversed_vocabulary == fresh._reversed_vocabulary
+    assert dict(index._gram_tokens) == dict(fresh._gram_tokens)
+    assert index.candidates("kna_ål") == {"src/model/utils/new.py"}
@@ -0,0 +1,138 @@
+import json
+import threading
+import pytest
+from src.model import supervisor as supervisor_module
+from src.model.utils.relevance import RelevanceValidator, calibrate, combine, lexical_overlap
+
+class FakeLLM:
+    def __init__(self, verdict="YES"):
+        self.verdict = verdict
+        self.prompts = []
+
+    async def query(self, prompt, max_tokens=1000, temperature=0.7):
+        self.prompts.append(prompt)
+        return self.verdict
+
+class FakeAgent:
+    def __init__(self, llm, lifecycle=None):
+        self.name = type(self).__name__
+        self.calls = []
+
+    def can_handle(self, task):
+        return True
+
+    async def handle(self, task, **kwargs):
+        self.calls.append(kwargs)
+        return {"source": "internet", "content": "Färskt svar från webben"}
+
+class GitAgent(FakeAgent):
+    def can_handle(self, task):
+        return False
+
+class ResearchAgent(FakeAgent):
+    pass
+
+@pytest.fixture
+def make_supervisor(monkeypatch, tmp_path):
+    monkeypatch.setattr(supervisor_module, "GitAgent", GitAgent)
+    monkeypatch.setattr(supervisor_module, "ResearchAgent", ResearchAgent)
+
+    def make(verdict="YES", **kwargs):
+        validator = RelevanceValidator(log_path=str(tmp_path / "relevance.jsonl"), **kwargs)
+        validator.debug = False
+        agent = supervisor_module.SupervisorAgent(FakeLLM(verdict), lifecycle=object(), relevance=validator)
+        agent.debug = False
+        return agent
+    return make
+
+def test_overlap_ignores_short_words():
+    assert lexical_overlap("vad är python", "Python är ett språk") == 0.5
+    assert lexical_overlap("är på", "något") is None
+
+def test_missing_features_are_weighted_away():
+    assert combine({"retrieval": 0.9, "overlap": None, "cross_encoder": None}) == pytest.approx(0.9)
+
+def test_calibration_finds_thresholds_from_labels():
+    # Träffar från 0.6 och uppåt är relevanta, alla under är irrelevanta
+    records = [{"score": i / 100, "label": i >= 60} for i in range(20, 100, 2)]
+    records.append({"score": 0.5, "label": None})
+
+    accept, reject = calibrate(records, target_precision=0.99, min_samples=30)
+
+    assert accept == 0.6
+    assert reject == 0.6
+    assert calibrate(records[:10], min_samples=30) == (0.75, 0.45)
+
+def test_log_is_compacted_and_calibration_does_not_reread_it(tmp_path):
+    log_path = tmp_path / "relevance.jsonl"
+    validator = RelevanceValidator(log_path=str(log_path), max_records=3)
+    validator.debug = False
+
+    for i in range(6):
+        validator.record({"query": "q", "score": i / 10, "decision": "uncertain"}, label=True)
+
+    # Filen skrivs om till max_records rader när den nått det dubbla
+    assert [json.loads(line)["score"] for line in log_path.read_text().splitlines()] == [0.3, 0.4, 0.5]
+    log_path.unlink()
+    validator.calibrate()
+    assert [record["score"] for record in validator._records] == [0.3, 0.4, 0.5]
+
+@pytest.mark.asyncio
+async def test_confident_cache_hit_skips_the_llm(make_supervisor):
+    agent = make_supervisor(audit_rate=0.0)
+    result = {"source": "database", "content": "Python är ett programspråk", "score": 0.95}
+
+    assert await agent._validate_semantic_match("vad är python", result) is result
+    assert agent.llm.prompts == []
+
+@pytest.mark.asyncio
+async def test_irrelevant_cache_hit_forces_internet_search(make_supervisor):
+    agent = make_supervisor(audit_rate=0.0)
+    result = {"source": "database", "content": "Flamingos är rosa", "score": 0.3}
+
+    answer = await agent._validate_semantic_match("vad är python", result)
+
+    assert answer["source"] == "internet"
+    assert agent.research_agent.calls == [{"force_internet": True}]
+    assert agent.llm.prompts == []
+
+@pytest.mark.asyncio
+async def test_uncertain_hit_asks_llm_and_logs_the_label(make_supervisor, tmp_path):
+    agent = make_supervisor(verdict="NO", audit_rate=0.0)
+    result = {"source": "database", "content": "Python används inom dataanalys", "score": 0.6}
+
+    answer = await agent._validate_semantic_match("vem skapade python", result)
+
+    assert answer["source"] == "internet"
+    assert len(agent.llm.prompts) == 1
+    logged = [json.loads(line) for line in (tmp_path / "relevance.jsonl").read_text().splitlines()]
+    assert logged[-1]["decision"] == "uncertain" and logged[-1]["label"] is False
+
+@pytest.mark.asyncio
+async def test_scoring_and_logging_run_off_the_event_loop(make_supervisor):
+    agent = make_supervisor(audit_rate=0.0)
+    threads = []
+    features, record = agent.relevance.features, agent.relevance.record
+
+    def tracked_features(*args):
+        threads.append(threading.current_thread())
+        return features(*args)
+
+    def tracked_record(*args):
+        threads.append(threading.current_thread())
+        return record(*args)
+
+    agent.relevance.features = tracked_features
+    agent.relevance.record = tracked_record
+    result = {"source": "database", "content": "Python är ett programspråk", "score": 0.95}
+
+    await agent._validate_semantic_match("vad är python", result)
+
+    assert len(threads) == 2
+    assert threading.main_thread() not in threads
+
+@pytest.mark.asyncio
+async def test_delegate_awaits_validation(make_supervisor):
+    agent = make_supervisor()
+    answer = await agent.delegate("vad är python")
+    assert answer == {"source": "internet", "content": "Färskt svar från webben"}
@@ -0,0 +1,49 @@
+import threading
+import pytest
+from src.model.utils.repo_watcher import RepoWatcher
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+        self.event = threading.Event()
+
+    def __call__(self, paths):
+        self.calls.append(paths)
+        self.event.set()
+
+@pytest.fixture
+def recorder():
+    return Recorder()
+
+def test_polling_watcher_reports_changed_files(tmp_path, recorder):
+    """Polling-bevakningen rapporterar nya, ändrade och borttagna filer men inte ignorerade."""
+    (tmp_path / "a.py").write_text("A = 1\n")
+    (tmp_path / "b.py").write_text("B = 1\n")
+    watcher = RepoWatcher(str(tmp_path), recorder, backend="polling", interval=0.05, debounce=0.05)
+    watcher.debug = False
+    assert watcher.start() == "polling"
+    try:
+        (tmp_path / "a.py").write_text("A = 2\n")
+        (tmp_path / "b.py").unlink()
+        (tmp_path / "c.py").write_text("C = 1\n")
+        (tmp_path / "__pycache__").mkdir()
+        (tmp_path / "__pycache__" / "c.pyc").write_bytes(b"\0")
+        assert recorder.event.wait(5)
+    finally:
+        watcher.stop()
+
+    assert set().union(*recorder.calls) == {"a.py", "b.py", "c.py"}
+
+def test_notifications_are_debounced(tmp_path, recorder):
+    """Flera snabba ändringar rapporteras i ett enda anrop."""
+    watcher = RepoWatcher(str(tmp_path), recorder, backend="polling", interval=60, debounce=0.2)
+    watcher.debug = False
+    watcher.start()
+    try:
+        watcher.notify({"a.py"})
+        watcher.notify({"b.py", "node_modules/x.js"})
+        assert recorder.event.wait(5)
+    finally:
+        watcher.stop()
+
+    assert recorder.calls == [{"a.py", "b.py"}]
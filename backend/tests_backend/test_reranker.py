@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from src.model.utils import mongo_client
+from src.model.utils.reranker import CrossEncoder, Reranker, mmr
+from src.model.vector_store.sharded_store import ShardedVectorStore, KNOWLEDGE_SHARDS
+from tests_backend.test_dedup import FakeCollection as QueryCollection
+from tests_backend.test_vector_store import FakeCollection
+
+CANDIDATES = [
+    {"content": "Python skapades av Guido van Rossum", "score": 0.95, "vector": [1.0, 0.0, 0.0]},
+    {"content": "Python skapades av Guido van Rossum 1991", "score": 0.94, "vector": [0.99, 0.05, 0.0]},
+    {"content": "Python används inom dataanalys", "score": 0.90, "vector": [0.3, 0.9, 0.0]}
+]
+
+class FakeEncoder:
+    """Cross-encoder som ger förbestämda poäng och kan låtsas vara oladdad."""
+
+    def __init__(self, scores, ready=True):
+        self.scores = scores
+        self.ready = ready
+        self.loading = False
+
+    def start_loading(self):
+        self.loading = True
+
+    def score(self, query, texts, deadline=None):
+        return self.scores[:len(texts)]
+
+def test_mmr_skips_near_duplicates():
+    assert mmr(CANDIDATES, [c["score"] for c in CANDIDATES], top_n=2, mmr_lambda=0.5) == [0, 2]
+    # Med lambda 1 gäller bara relevansen
+    assert mmr(CANDIDATES, [c["score"] for c in CANDIDATES], top_n=2, mmr_lambda=1.0) == [0, 1]
+
+def test_mmr_falls_back_to_word_overlap_without_vectors():
+    candidates = [{k: v for k, v in c.items() if k != "vector"} for c in CANDIDATES]
+    assert mmr(candidates, [c["score"] for c in candidates], top_n=2, mmr_lambda=0.5) == [0, 2]
+
+def test_cross_encoder_scores_reorder_and_unscored_keep_order():
+    # Budgeten räckte bara till de två första kandidaterna
+    encoder = FakeEncoder([0.2, 0.9, None])
+    reranker = Reranker("cross-encoder", top_n=3, mmr_lambda=1.0, cross_encoder=encoder)
+    reranker.debug = False
+
+    ranked = reranker.rerank("vem skapade python", CANDIDATES)
+
+    assert [hit["content"] for hit in ranked] == [CANDIDATES[1]["content"], CANDIDATES[0]["content"], CANDIDATES[2]["content"]]
+    assert ranked[0]["rerank_score"] == 0.9
+
+def test_unloaded_cross_encoder_uses_mmr_meanwhile():
+    encoder = FakeEncoder([], ready=False)
+    reranker = Reranker("cross-encoder", top_n=1, cross_encoder=encoder)
+    reranker.debug = False
+
+    assert reranker.rerank("python", CANDIDATES)[0]["content"] == CANDIDATES[0]["content"]
+    assert encoder.loading
+
+def test_cross_encoder_stops_at_deadline():
+    import torch
+
+    class Batch(dict):
+        pass
+
+    class Model:
+        calls = 0
+
+        def __call__(self, **inputs):
+            Model.calls += 1
+            return type("Output", (), {"logits": torch.zeros((len(inputs["texts"]), 1))})()
+
+    encoder = CrossEncoder(batch_size=1)
+    encoder.tokenizer = lambda queries, texts, **kwargs: Batch(texts=texts)
+    encoder.model = Model()
+
+    assert encoder.score("fråga", ["a", "b"]) == [0.5, 0.5]
+    assert encoder.score("fråga", ["a", "b"], deadline=0.0) == [None, None]
+    assert Model.calls == 2
+
+def test_dense_hits_return_the_matching_chunk_and_its_vector():
+    collection = FakeCollection([
+        {"_id": "a", "query": "python", "chunk": "Första chunken", "partition_id": "p", "chunk_index": 0,
+         "embedding": [1.0, 0.0]},
+        {"_id": "b", "query": "python", "chunk": "Andra chunken", "partition_id": "p", "chunk_index": 1,
+         "embedding": [0.0, 1.0]}
+    ])
+    store = ShardedVectorStore(collection)
+
+    hit = store.search([0.0, 1.0], top_k=1, threshold=0.5, shards=KNOWLEDGE_SHARDS, with_vectors=True)[0]
+
+    assert hit["content"] == "Andra chunken"
+    assert hit["metadata"] == {"partition_id": "p", "chunk_index": 1}
+    assert np.allclose(hit["vector"], [0.0, 1.0])
+
+@pytest.mark.asyncio
+async def test_find_research_returns_best_fresh_chunks(monkeypatch):
+    now = datetime.utcnow()
+    collection = QueryCollection()
+    for partition, index, chunk, updated in [
+        ("p1", 0, "Python skapades av Guido van Rossum", now),
+        ("p1", 1, "Inledning utan betydelse", now),
+        ("p2", 0, "Python används inom dataanalys", now),
+        ("gammal", 0, "Python 2 är den senaste versionen", now - timedelta(days=30))
+    ]:
+        collection.insert_one({"partition_id": partition, "chunk_index": index, "chunk": chunk, "updated_at": updated})
+
+    class Store:
+        def hybrid_search(self, query, embedding, **kwargs):
+            assert kwargs["top_k"] == mongo_client.RERANK_CANDIDATES and kwargs["with_vectors"]
+            return [
+                {"content": "?", "metadata": {"partition_id": "gammal", "chunk_index": 0}, "score": 0.99},
+                {"content": "?", "metadata": {"partition_id": "p1", "chunk_index": 0}, "score": 0.95},
+                {"content": "?", "metadata": {"partition_id": "p2", "chunk_index": 0}, "score": 0.9}
+            ]
+
+    async def fake_embedding(query):
+        return [1.0, 0.0]
+
+    reranker = Reranker("mmr", top_n=2)
+    reranker.debug = False
+    monkeypatch.setattr(mongo_client, "get_collection", lambda: collection)
+    monkeypatch.setattr(mongo_client, "get_vector_store", lambda: Store())
+    monkeypatch.setattr(mongo_client, "get_embedding_from_llm", fake_embedding)
+    monkeypatch.setattr(mongo_client, "get_reranker", lambda: reranker)
+    monkeypatch.setattr(mongo_client, "HYBRID_SEARCH", True)
+
+    hit = await mongo_client.find_research_scored("vem skapade python")
+
+    assert hit["content"] == "Python skapades av Guido van Rossum\n\nPython används inom dataanalys"
+    assert hit["score"] == 0.95
+    assert [chunk["metadata"]["partition_id"] for chunk in hit["chunks"]] == ["p1", "p2"]
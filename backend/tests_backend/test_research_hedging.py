@@ -0,0 +1,131 @@
+import asyncio
+import time
+import pytest
+from src.model.agents import research_agent
+from src.model.agents.research_agent import ResearchAgent
+
+class FakeLLM:
+    def __init__(self):
+        self.prompts = []
+
+    async def query(self, prompt):
+        self.prompts.append(prompt)
+        return "Sammanfattning"
+
+def _patch(monkeypatch, cache_hit=None, cache_delay=0.0, web_results=None, web_delay=0.0):
+    """Byter ut cache, webbsökning och sparande. Returnerar logg över vad som hände."""
+    events = {"web_started": False, "web_cancelled": False, "saved": []}
+
+    async def fake_find(query, max_age_days=7, threshold=0.85):
+        await asyncio.sleep(cache_delay)
+        return cache_hit
+
+    async def fake_search(query, max_results=5):
+        events["web_started"] = True
+        try:
+            await asyncio.sleep(web_delay)
+        except asyncio.CancelledError:
+            events["web_cancelled"] = True
+            raise
+        return web_results if web_results is not None else ["Python - ett språk\nhttps://python.org"]
+
+    async def fake_save(query, content, embedding=None):
+        events["saved"].append(query)
+
+    monkeypatch.setattr(research_agent, "find_research_scored", fake_find)
+    monkeypatch.setattr(research_agent, "search_duckduckgo", fake_search)
+    monkeypatch.setattr(research_agent, "save_research", fake_save)
+    return events
+
+@pytest.fixture
+def agent():
+    agent = ResearchAgent(FakeLLM())
+    agent.debug = False
+    agent.hedged = True
+    agent.cache_deadline = 0.5
+    agent.confident_score = 0.92
+    return agent
+
+@pytest.mark.asyncio
+async def test_cache_miss_costs_max_not_sum(agent, monkeypatch):
+    events = _patch(monkeypatch, cache_hit=None, cache_delay=0.2, web_delay=0.2)
+
+    start = time.perf_counter()
+    result = await agent.handle("research: vad är python")
+
+    assert time.perf_counter() - start < 0.35
+    assert result == {"source": "internet", "content": "Sammanfattning"}
+    assert events["saved"] == ["vad är python"]
+
+@pytest.mark.asyncio
+async def test_confident_cache_hit_cancels_web_search(agent, monkeypatch):
+    hit = {"content": "Sparad förklaring av python", "score": 0.97, "updated_at": None}
+    events = _patch(monkeypatch, cache_hit=hit, cache_delay=0.01, web_delay=1.0)
+
+    start = time.perf_counter()
+    result = await agent.handle("research: vad är python")
+
+    assert time.perf_counter() - start < 0.5
+    assert result == {"source": "database", "content": "Sparad förklaring av python", "score": 0.97}
+    await asyncio.sleep(0)
+    assert events["web_started"] and events["web_cancelled"]
+    assert agent.llm.prompts == []
+
+@pytest.mark.asyncio
+async def test_uncertain_cache_hit_is_merged_with_web_results(agent, monkeypatch):
+    hit = {"content": "Äldre anteckningar om python", "score": 0.88, "updated_at": None}
+    events = _patch(monkeypatch, cache_hit=hit, web_delay=0.05)
+
+    result = await agent.handle("research: vad är python")
+
+    assert result["source"] == "internet"
+    assert not events["web_cancelled"]
+    prompt = agent.llm.prompts[0]
+    assert "Äldre anteckningar om python" in prompt and "https://python.org" in prompt
+
+@pytest.mark.asyncio
+async def test_slow_cache_does_not_hold_back_web_results(agent, monkeypatch):
+    agent.cache_deadline = 0.05
+    hit = {"content": "Sparad förklaring", "score": 0.99, "updated_at": None}
+    _patch(monkeypatch, cache_hit=hit, cache_delay=1.0, web_delay=0.1)
+
+    start = time.perf_counter()
+    result = await agent.handle("research: vad är python")
+
+    assert time.perf_counter() - start < 0.5
+    assert result["source"] == "internet"
+
+@pytest.mark.asyncio
+async def test_empty_web_results_fall_back_to_cache_hit(agent, monkeypatch):
+    hit = {"content": "Sparad förklaring", "score": 0.86, "updated_at": None}
+    _patch(monkeypatch, cache_hit=hit, web_results=[])
+
+    result = await agent.handle("research: vad är python")
+
+    assert result == {"source": "database", "content": "Sparad förklaring", "score": 0.86}
+
+@pytest.mark.asyncio
+async def test_blocking_vector_search_does_not_stall_the_event_loop(monkeypatch):
+    """Den synkrona sökningen i find_research_scored körs i en tråd, så deadlinen kan slå till."""
+    from src.model.utils import mongo_client
+
+    class SlowStore:
+        def search(self, embedding, **kwargs):
+            time.sleep(0.5)
+            return []
+
+        def hybrid_search(self, query, embedding, **kwargs):
+            return self.search(embedding)
+
+    async def fake_embedding(query):
+        return [1.0, 0.0]
+
+    monkeypatch.setattr(mongo_client, "get_vector_store", lambda: SlowStore())
+    monkeypatch.setattr(mongo_client, "get_embedding_from_llm", fake_embedding)
+
+    start = time.perf_counter()
+    task = asyncio.ensure_future(mongo_client.find_research_scored("vad är python"))
+    done, _ = await asyncio.wait({task}, timeout=0.1)
+
+    assert not done and time.perf_counter() - start < 0.3
+    assert await task is None
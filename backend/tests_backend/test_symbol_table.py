@@ -0,0 +1,75 @@
+import pytest
+from unittest.mock import patch
+from src.model.utils import symbol_table
+from src.model.utils.file_store import FileStore
+from src.model.utils.symbol_table import SymbolTable, parse_symbols
+
+SOURCE = '''import os
+from .base import Base
+
+class Agent(Base):
+    def handle(self, task):
+        return self.run(task)
+
+    async def run(self, task):
+        return os.path.join(task)
+
+def helper():
+    return Agent().handle("x")
+'''
+
+def test_parse_symbols_records_kinds_lines_imports_and_calls():
+    table = parse_symbols(SOURCE)
+    symbols = {symbol["qualname"]: symbol for symbol in table["symbols"]}
+
+    assert table["imports"] == ["os", ".base"]
+    assert symbols["Agent"]["kind"] == "class"
+    assert (symbols["Agent"]["lineno"], symbols["Agent"]["end_lineno"]) == (4, 9)
+    assert symbols["Agent.run"]["kind"] == "method"
+    assert symbols["Agent.handle"]["calls"] == ["run"]
+    assert symbols["helper"]["kind"] == "function"
+    assert symbols["helper"]["calls"] == ["handle", "Agent"]
+
+def test_syntax_error_gives_empty_table():
+    assert parse_symbols("def broken(:\n")["symbols"] == []
+
+@pytest.fixture
+def files():
+    return {"agent.py": SOURCE, "util.py": "def helper():\n    pass\n", "README.md": "def not_python(): pass"}
+
+def test_lookups(files):
+    table = SymbolTable()
+    table.build(files)
+
+    assert [path for path, _ in table.find("helper")] == ["agent.py", "util.py"]
+    assert [symbol["qualname"] for _, symbol in table.find("Agent.run")] == ["Agent.run"]
+    assert table.find("Agent") == []
+    assert table.callers("run") == [("agent.py", "Agent.handle")]
+    assert table.summary("agent.py") == "Klasser: Agent | Funktioner: handle, run, helper"
+    assert table.summary("README.md") is None
+    assert {"name": "helper", "path": "util.py"} in table.functions()
+
+def test_tables_are_persisted_by_content_hash(tmp_path, files):
+    """En ny tabell läser in sparade symboler i stället för att parsa om."""
+    store = FileStore(tmp_path / "index.sqlite")
+    store.update({path: {"content": content} for path, content in files.items()})
+    SymbolTable(store).build(files, store.shas())
+
+    with patch.object(symbol_table, "parse_symbols", side_effect=AssertionError("ska inte parsas")):
+        table = SymbolTable(store)
+        table.build(files, store.shas())
+    assert table.summary("util.py") == "Funktioner: helper"
+
+def test_update_reparses_only_changed_files(files):
+    table = SymbolTable()
+    table.build(files)
+    files = dict(files, **{"util.py": "def renamed():\n    pass\n"})
+    del files["agent.py"]
+
+    with patch.object(symbol_table, "parse_symbols", wraps=symbol_table.parse_symbols) as parse:
+        table.update(files, None, ["util.py"], ["agent.py"])
+
+    assert parse.call_count == 1
+    assert table.find("helper") == []
+    assert table.callers("run") == []
+    assert [path for path, _ in table.find("renamed")] == ["util.py"]
@@ -0,0 +1,167 @@
+import threading
+import pytest
+from src.model.vector_store.sharded_store import (
+    ShardedVectorStore,
+    RESEARCH_SHARD,
+    DOCUMENTS_SHARD
+)
+from src.model.vector_store.vector_store import VectorStore
+
+def _get_field(doc: dict, key: str):
+    value = doc
+    for part in key.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+def _matches(doc: dict, query: dict) -> bool:
+    for key, condition in query.items():
+        value = _get_field(doc, key)
+        if isinstance(condition, dict):
+            if "$exists" in condition and (value is not None) != condition["$exists"]:
+                return False
+            if "$ne" in condition and value == condition["$ne"]:
+                return False
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+class FakeCollection:
+    """Minimal in-memory stand-in for a pymongo collection."""
+
+    def __init__(self, docs=None):
+        self.docs = list(docs or [])
+
+    def find(self, query=None, projection=None):
+        return [doc for doc in self.docs if _matches(doc, query or {})]
+
+    def find_one(self, query=None, projection=None):
+        found = self.find(query)
+        return found[0] if found else None
+
+    def count_documents(self, query=None):
+        return len(self.find(query))
+
+    def insert_one(self, doc):
+        self.docs.append(doc)
+
+@pytest.fixture
+def collection():
+    return FakeCollection([
+        {"_id": 1, "query": "flamingo", "chunk": "Flamingos är rosa", "embedding": [1.0, 0.0, 0.0]},
+        {"_id": 2, "query": "python", "chunk": "Python är ett språk", "embedding": [0.0, 1.0, 0.0]},
+        {
+            "_id": 3,
+            "query": "manual.txt",
+            "chunk": "Manualen",
+            "embedding": [0.9, 0.1, 0.0],
+            "metadata": {"document_type": "uploaded_file"}
+        }
+    ])
+
+def test_entries_are_split_per_source(collection):
+    store = ShardedVectorStore(collection)
+    assert store.get_shard(RESEARCH_SHARD).index.ntotal == 2
+    assert store.get_shard(DOCUMENTS_SHARD).index.ntotal == 1
+
+def test_search_merges_shards_by_score(collection):
+    store = ShardedVectorStore(collection)
+    results = store.search([1.0, 0.0, 0.0], top_k=2, threshold=0.5)
+    assert [r["query"] for r in results] == ["flamingo", "manual.txt"]
+    assert [r["shard"] for r in results] == [RESEARCH_SHARD, DOCUMENTS_SHARD]
+
+def test_search_scoped_to_one_shard(collection):
+    store = ShardedVectorStore(collection)
+    results = store.search([1.0, 0.0, 0.0], top_k=5, threshold=0.5, shards=[DOCUMENTS_SHARD])
+    assert [r["query"] for r in results] == ["manual.txt"]
+
+def test_reindex_one_shard_leaves_others(collection):
+    store = ShardedVectorStore(collection)
+    research_index = store.get_shard(RESEARCH_SHARD).index
+    collection.insert_one({
+        "_id": 4,
+        "query": "guide.txt",
+        "chunk": "Guiden",
+        "embedding": [0.0, 0.0, 1.0],
+        "metadata": {"document_type": "uploaded_file"}
+    })
+    store.reindex(DOCUMENTS_SHARD)
+    assert store.get_shard(DOCUMENTS_SHARD).index.ntotal == 2
+    assert store.get_shard(RESEARCH_SHARD).index is research_index
+
+def test_snapshot_is_reused(collection, tmp_path):
+    store = ShardedVectorStore(collection, snapshot_dir=str(tmp_path))
+    store.save_snapshots()
+    reloaded = ShardedVectorStore(collection, snapshot_dir=str(tmp_path))
+    assert reloaded.get_shard(RESEARCH_SHARD).mapping == store.get_shard(RESEARCH_SHARD).mapping
+
+def test_snapshot_with_same_count_but_other_documents_is_rebuilt(collection, tmp_path):
+    store = ShardedVectorStore(collection, snapshot_dir=str(tmp_path))
+    store.save_snapshots()
+    # En post tas bort och en annan läggs till: antalet är detsamma
+    collection.docs = [doc for doc in collection.docs if doc["_id"] != 1]
+    collection.insert_one({"_id": 4, "query": "fåglar", "chunk": "Fåglar flyger", "embedding": [0.0, 0.0, 1.0]})
+
+    reloaded = ShardedVectorStore(collection, snapshot_dir=str(tmp_path))
+
+    queries = [entry["query"] for entry in reloaded.get_shard(RESEARCH_SHARD).mapping.values()]
+    assert sorted(queries) == ["fåglar", "python"]
+
+def test_add_entry_publishes_new_generation(collection):
+    store = ShardedVectorStore(collection)
+    shard = store.get_shard(RESEARCH_SHARD)
+    before = shard.generation
+    old_index = shard.index
+    store.add_entry("ny fråga", [0.0, 0.0, 1.0]).result(timeout=5)
+    assert shard.generation > before
+    assert shard.index.ntotal == 3
+    # Den gamla generationen får aldrig ändras under en pågående läsning
+    assert old_index.ntotal == 2
+
+def test_add_entries_builds_one_generation(collection):
+    store = ShardedVectorStore(collection)
+    shard = store.get_shard(RESEARCH_SHARD)
+    before = shard.generation
+    store.add_entries([
+        {"query": "a", "embedding": [0.0, 0.0, 1.0], "doc_id": "10"},
+        {"query": "b", "embedding": [0.0, 1.0, 1.0], "doc_id": "11"}
+    ], shard=RESEARCH_SHARD).result(timeout=5)
+
+    assert shard.generation == before + 1
+    assert [entry["doc_id"] for entry in list(shard.mapping.values())[-2:]] == ["10", "11"]
+
+def test_searches_during_reindex_are_consistent(collection):
+    store = ShardedVectorStore(collection)
+    shard = store.get_shard(RESEARCH_SHARD)
+    errors = []
+    stop = threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            results = shard.search([0.0, 1.0, 0.0], top_k=2, threshold=0.5)
+            if [r["query"] for r in results] != ["python"]:
+                errors.append(results)
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for _ in range(20):
+        shard.reindex()
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+
+def test_write_queue_is_bounded(collection):
+    store = VectorStore(collection, max_pending_writes=1, write_timeout=0.05)
+    blocker = threading.Event()
+    store._apply = lambda batch: blocker.wait()
+    store.add_entry("a", [1.0, 0.0, 0.0])
+    with pytest.raises(RuntimeError):
+        for _ in range(3):
+            store.add_entry("b", [1.0, 0.0, 0.0])
+    blocker.set()